@@ -0,0 +1,310 @@
+"""Strategic AI: cached threat/opportunity maps and an anytime planner.
+
+Each country at war has two heat maps over the province graph:
+
+* *threat* -- enemy provinces on the enemy's side of a front with the
+  country, weighted by that enemy's military factories;
+* *opportunity* -- the same provinces weighted by victory points (plus one)
+  and by the country's share of the two sides' factories.
+
+Both are spread by vectorized diffusion over land edges,
+``h = source + DECAY * mean(h over neighbours)``, one ``bincount`` per hop
+and :data:`HOPS` hops.  A country's maps are cached with the front version
+(:attr:`fronts.FrontEngine.version`) they were computed for and only
+recomputed after one of its fronts moved.  Stale maps are built in batches
+of up to :data:`MAPS_PER_TICK` countries by :func:`heat_kernel`, on the
+partitions of the world's :class:`parallel.ParallelStepper`.
+
+Plans are acted on at the start of every day.  Each segment of a
+country's fronts gets divisions in proportion to its planned threat
+(:meth:`StrategicAI.segment_weights`, used by :func:`fronts.front_system`),
+and the divisions next to the planned attack target go for it
+(:meth:`StrategicAI.attack`): against the divisions holding it, in a
+battle, or, if nobody does, by marching in.  The province changes hands only
+when they get there (:func:`combat.invade`), and is fought for if defenders
+arrived first.
+
+Planning runs as generator tasks, one per country, that yield after every
+unit of work (a decision, a factory assignment).  :meth:`StrategicAI.tick` steps
+the queued tasks until its per-tick budget is spent and resumes them next
+tick, so 60 AIs replanning at once spread over several ticks instead of
+stalling one.  The budget is either wall-clock (``budget_ms``, for
+interactive play) or a fixed number of steps (``budget_ms=None``), which
+keeps headless runs and replays deterministic.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
+
+import numpy as np
+
+from combat import engage
+from fronts import apportion
+from production import MAX_FACTORIES_PER_LINE, Equipment
+from profiling import AI, span
+from provinces import EDGE_RIVER, EDGE_STRAIT
+from scheduler import Cadence
+
+if TYPE_CHECKING:
+    from world import World
+
+HOPS = 6
+DECAY = 0.5
+STEPS_PER_TICK = 8
+MAPS_PER_TICK = 8
+REPLAN_HOURS = 24 * 7
+_DONE = object()
+
+# What a threatened country builds first, and what it builds otherwise.
+DEFENSIVE_EQUIPMENT = (Equipment.INFANTRY_EQUIPMENT, Equipment.ANTI_TANK, Equipment.ARTILLERY)
+OFFENSIVE_EQUIPMENT = (Equipment.MEDIUM_TANK, Equipment.CAS, Equipment.MOTORIZED)
+
+
+@dataclass(slots=True)
+class Plan:
+    country: int
+    hour: int
+    threat: float  # diffused threat summed over the country's front provinces
+    defend: list[tuple[int, float]]  # (first province of segment, threat), most threatened first
+    attack: int  # enemy province with the best opportunity, or -1
+
+
+class StrategicAI:
+    def __init__(self, world: World, budget_ms: float | None = None) -> None:
+        self.world = world
+        self.budget_ms = budget_ms
+        provinces = world.provinces
+        n = len(provinces)
+        src, dst = provinces.adj_sources, provinces.adj_targets
+        land = ~provinces.is_sea
+        keep = land[src] & land[dst] & ((provinces.adj_flags & EDGE_STRAIT) == 0)
+        self._src = src[keep]
+        self._dst = dst[keep]
+        self._river = (provinces.adj_flags[keep] & EDGE_RIVER) != 0
+        self._degree = np.maximum(np.bincount(self._src, minlength=n), 1).astype(np.float64)
+        self.threat: dict[int, np.ndarray] = {}
+        self.opportunity: dict[int, np.ndarray] = {}
+        self.plans: dict[int, Plan] = {}
+        self._map_version = np.full(world.n_countries, -1, dtype=np.int64)
+        self._queue: deque[int] = deque()
+        self._queued = np.zeros(world.n_countries, dtype=bool)
+        self._task: Iterator[None] | None = None
+        self._planned_at = np.full(world.n_countries, -REPLAN_HOURS, dtype=np.int64)
+        self.steps = 0
+        self.maps_built = 0
+        self.interrupted = 0
+
+    # -- heat maps ---------------------------------------------------------
+
+    def _sources(self, country: int) -> tuple[np.ndarray, np.ndarray]:
+        world = self.world
+        fronts = world.fronts
+        factories = world.production.military_factories.astype(np.float64)
+        n = len(world.provinces)
+        threat = np.zeros(n, dtype=np.float64)
+        opportunity = np.zeros(n, dtype=np.float64)
+        own = factories[country]
+        for enemy in fronts.at_war(country).tolist():
+            ids = fronts.front_provinces(enemy, country)
+            threat[ids] += factories[enemy]
+            share = own / max(own + factories[enemy], 1.0)
+            opportunity[ids] += (world.provinces.victory_points[ids] + 1.0) * share
+        return threat, opportunity
+
+    def _build_maps(self) -> None:
+        """Rebuild the stale maps of the first :data:`MAPS_PER_TICK` queued countries."""
+        world = self.world
+        version = world.fronts.version
+        batch = [c for c in self._queue if self._map_version[c] != version[c]][:MAPS_PER_TICK]
+        if not batch:
+            return
+        sources = np.stack([np.stack(self._sources(country)) for country in batch])
+        arrays = {
+            "batch": np.array(batch, dtype=np.intp),
+            "sources": sources,
+            "src": self._src,
+            "dst": self._dst,
+            "degree": self._degree,
+        }
+        for countries, heat in world.stepper.run(world, "ai", heat_kernel, arrays):
+            for country, (threat, opportunity) in zip(countries.tolist(), heat):
+                self.threat[country] = threat.astype(np.float32)
+                self.opportunity[country] = opportunity.astype(np.float32)
+                self._map_version[country] = version[country]
+                self.maps_built += 1
+
+    # -- decisions ---------------------------------------------------------
+
+    def _plan(self, country: int) -> Iterator[None]:
+        world = self.world
+        threat = self.threat.get(country)
+        if threat is None:
+            return
+        defend = sorted(
+            (
+                (int(s.provinces[0]), float(threat[s.provinces].sum()))
+                for s in world.fronts.segments(country)
+            ),
+            key=lambda item: -item[1],
+        )
+        attack = -1
+        targets = [world.fronts.front_provinces(e, country) for e in world.fronts.at_war(country)]
+        targets = np.concatenate(targets) if targets else np.zeros(0, dtype=np.int32)
+        if len(targets):
+            attack = int(targets[np.argmax(self.opportunity[country][targets])])
+        plan = Plan(country, world.clock.hour, sum(t for _, t in defend), defend, attack)
+        self.plans[country] = plan
+        yield
+        self._assign_factories(plan)
+
+    def _assign_factories(self, plan: Plan) -> None:
+        """Put free military factories on lines that suit the situation."""
+        production = self.world.production
+        country = plan.country
+        free = int(production.free_factories()[country])
+        if free <= 0:
+            return
+        strength = float(production.military_factories[country])
+        wanted = DEFENSIVE_EQUIPMENT if plan.threat > strength else OFFENSIVE_EQUIPMENT
+        shares = apportion(np.ones(len(wanted)), free)
+        for equipment, share in zip(wanted, shares.tolist()):
+            rows = production.lines_of(country)
+            rows = rows[production.equipment[rows] == equipment].tolist()
+            while share > 0:
+                open_rows = [r for r in rows if production.factories[r] < MAX_FACTORIES_PER_LINE]
+                if open_rows:
+                    row = open_rows[0]
+                else:
+                    row = production.add_line(country, equipment)
+                    rows.append(row)
+                added = min(share, MAX_FACTORIES_PER_LINE - int(production.factories[row]))
+                production.assign(row, int(production.factories[row]) + added)
+                share -= added
+
+    # -- operations --------------------------------------------------------
+
+    def segment_weights(self, country: int) -> np.ndarray | None:
+        """Deployment weight of each of ``country``'s segments: its planned threat.
+
+        Segments formed since the plan get the least planned threat; ``None``
+        (deploy by front length) without a plan or any threat.
+        """
+        plan = self.plans.get(country)
+        if plan is None or not plan.defend:
+            return None
+        threat = dict(plan.defend)
+        least = min(threat.values())
+        segments = self.world.fronts.segments(country)
+        weights = np.array([threat.get(int(s.provinces[0]), least) for s in segments])
+        return weights if weights.sum() > 0 else None
+
+    def attack(self, plan: Plan) -> int:
+        """Send the idle divisions next to ``plan.attack`` in; return how many went."""
+        world = self.world
+        target, country = plan.attack, plan.country
+        if target < 0:
+            return 0
+        enemy = int(world.provinces.controller[target])
+        battles = world.battles
+        if not world.fronts.hostile[country, enemy] or (
+            battles.province[: battles.count] == target
+        ).any():
+            return 0
+        divisions = world.divisions
+        edges = np.flatnonzero(self._dst == target)
+        ids = divisions.ids_of(country)
+        ids = ids[divisions.battle[ids] < 0]
+        attackers = ids[np.isin(divisions.location[ids], self._src[edges])]
+        if not len(attackers):
+            return 0
+        defenders = divisions.at(target)
+        defenders = defenders[
+            (divisions.country[defenders] == enemy) & (divisions.battle[defenders] < 0)
+        ]
+        if len(defenders):
+            # Attacking across a river only if every attacker has to.
+            used = edges[np.isin(self._src[edges], divisions.location[attackers])]
+            engage(world, target, attackers, defenders, river=bool(self._river[used].all()))
+        else:
+            divisions.move(attackers, target)
+        return len(attackers)
+
+    # -- scheduling --------------------------------------------------------
+
+    def _enqueue_stale(self) -> None:
+        world = self.world
+        hour = world.clock.hour
+        at_war = world.fronts.hostile.any(axis=1)
+        stale = (self._map_version != world.fronts.version) | (
+            hour - self._planned_at >= REPLAN_HOURS
+        )
+        for country in np.flatnonzero(stale & at_war & ~self._queued).tolist():
+            self._queue.append(country)
+            self._queued[country] = True
+
+    def tick(self) -> None:
+        """Build stale maps, then advance queued planning tasks until the budget is spent."""
+        self._enqueue_stale()
+        if not self._queue:
+            return
+        self._build_maps()
+        perf = time.perf_counter
+        deadline = None if self.budget_ms is None else perf() + self.budget_ms / 1000.0
+        steps = 0
+        while self._queue:
+            if deadline is None and steps == STEPS_PER_TICK:
+                break
+            if deadline is not None and perf() >= deadline:
+                break
+            country = self._queue[0]
+            if self._task is None:
+                self._task = self._plan(country)
+            with span(f"ai/{country}", AI):
+                finished = next(self._task, _DONE) is _DONE
+            steps += 1
+            if finished:
+                self._task = None
+                self._queue.popleft()
+                self._queued[country] = False
+                self._planned_at[country] = self.world.clock.hour
+        self.steps += steps
+        if self._queue:
+            self.interrupted += 1
+
+
+def heat_kernel(
+    arrays: dict[str, np.ndarray], countries: np.ndarray, rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray]:
+    """Diffused threat and opportunity maps of the batched ``countries``.
+
+    Returns those countries and their ``(countries, 2, provinces)`` maps.
+    """
+    batch, sources = arrays["batch"], arrays["sources"]
+    src, dst, degree = arrays["src"], arrays["dst"], arrays["degree"]
+    mine = np.flatnonzero(np.isin(batch, countries))
+    n = sources.shape[-1]
+    source = heat = sources[mine].reshape(-1, n)
+    for _ in range(HOPS):
+        spread = np.empty_like(heat)
+        for i, h in enumerate(heat):
+            spread[i] = np.bincount(src, weights=h[dst], minlength=n) / degree
+        heat = source + DECAY * spread
+    return batch[mine], heat.reshape(len(mine), 2, n)
+
+
+def ai_system(world: World) -> None:
+    """Hourly system: spend the AI's per-tick budget on planning.
+
+    At the start of every day each country at war also attacks as planned.
+    """
+    ai = world.ai
+    ai.tick()
+    if not world.clock.due()[Cadence.DAILY]:
+        return
+    for country in sorted(ai.plans):
+        if world.fronts.hostile[country].any():
+            ai.attack(ai.plans[country])
@@ -0,0 +1,397 @@
+"""Air war: wings, missions and air superiority per strategic region.
+
+Planes are never simulated one by one.  Every wing of every country is a row
+of one :class:`AirTable` (country, strategic region, mission, wing type,
+planes), and an hour of air war for the whole world is one pass of array
+operations in :meth:`AirTable.step`.  One flat ``bincount`` per quantity
+sums the wings into ``(region, country)`` cells, and hostility is applied as
+a ``(countries, countries)`` matrix product:
+
+* detection: :data:`BASE_DETECTION` plus radar over the country's own
+  ground, in proportion to the share of the region it controls, plus
+  :data:`RADAR_STATION` per level of radar stations it has built there;
+* superiority: a country's detected fighter power on superiority missions
+  over that plus the hostile fighter power in the region;
+* losses: superiority fighters shoot at every hostile plane in the region,
+  interceptors only at hostile CAS and bombers.  Each country's fire is
+  split over the hostile planes facing it pro rata, so a wing loses
+  ``planes * sum(hostile fire / planes facing that enemy) / toughness``.
+
+The results are two ``(regions, countries)`` modifier tables, looked up by
+``[region, country]`` in O(1):
+
+* :attr:`AirTable.combat_modifier` scales a side's land attacks: up to
+  ``SUPERIORITY_BONUS`` either way for superiority, up to :data:`CAS_BONUS`
+  for close air support (which needs superiority to get through);
+* :attr:`AirTable.supply_modifier` is the share of supply that survives
+  hostile strategic bombing that the country's fighters and anti-air
+  (:data:`ANTI_AIR`) fail to stop.  :func:`supply.supply_system` scales the
+  supply sources in each region by it once a day.
+
+Wings fly from their country's capital, out to :data:`RANGE_KM` for their
+type.  The regions in range of each country's base are listed once, through
+:meth:`spatial.SpatialIndex.regions_within`, into the ``(countries, wing
+types, regions)`` table :attr:`AirTable.reach`, so the hourly range check is
+one lookup per wing: a wing over a region out of its range stays grounded,
+neither flying its mission nor being shot at.
+
+Once a day :func:`air_logistics_system` replaces lost planes from the
+production stockpile and moves wings: superiority and CAS go over the
+country's busiest front, bombers over the enemy capital, and interceptors
+stay over the country's own capital, each only if the wing can reach it.
+"""
+
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from production import Equipment
+from provinces import ProvinceStore
+
+if TYPE_CHECKING:
+    from spatial import SpatialIndex
+    from world import World
+
+
+class AirMission(IntEnum):
+    SUPERIORITY = 0
+    CAS = 1
+    STRATEGIC_BOMBING = 2
+    INTERCEPTION = 3
+
+
+class WingType(IntEnum):
+    FIGHTER = 0
+    CAS = 1
+    BOMBER = 2
+
+
+WING_SIZE = 100
+# Stockpiled equipment a wing type draws replacements from.
+WING_EQUIPMENT = np.array([Equipment.FIGHTER, Equipment.CAS, Equipment.BOMBER])
+# Per plane, indexed by WingType.
+AGILITY = np.array([1.0, 0.3, 0.2])
+GROUND_ATTACK = np.array([0.1, 1.0, 0.3])
+BOMBING = np.array([0.0, 0.2, 1.0])
+TOUGHNESS = np.array([1.0, 0.8, 1.5])
+# How well each wing type flies each mission, WingType × AirMission.
+MISSION_FIT = np.array(
+    [
+        [1.0, 0.2, 0.1, 1.0],
+        [0.3, 1.0, 0.3, 0.3],
+        [0.1, 0.4, 1.0, 0.1],
+    ]
+)
+# Operational radius from the home base, km, indexed by WingType.
+RANGE_KM = np.array([800.0, 500.0, 1500.0])
+assert len(WING_EQUIPMENT) == len(AGILITY) == len(GROUND_ATTACK) == len(RANGE_KM) == len(WingType)
+assert MISSION_FIT.shape == (len(WingType), len(AirMission))
+
+BASE_DETECTION = 0.4
+RADAR = 0.6  # extra detection over a region the country holds entirely
+RADAR_STATION = 0.1  # extra detection per level of radar built in the region
+ANTI_AIR = 0.15  # bombing raids are divided by 1 + ANTI_AIR * anti-air levels
+KILL_RATE = 0.01  # planes shot down per hour per point of detected air power
+SUPERIORITY_BONUS = 0.1
+CAS_BONUS = 0.25
+CAS_SATURATION = 200.0  # CAS power that gives the full bonus
+BOMBING_PENALTY = 0.4
+BOMBING_SATURATION = 200.0
+
+ROW_FIELDS = ("country", "region", "mission", "wing_type", "planes")
+COUNTRY_FIELDS = ("planes_lost",)
+
+
+class AirTable:
+    """Dense array table of every country's air wings.
+
+    Wings are packed into rows ``[0, count)``; removing one moves the last row
+    into the freed slot, so row indices are not stable across :meth:`remove`.
+    """
+
+    def __init__(
+        self,
+        provinces: ProvinceStore,
+        spatial: SpatialIndex,
+        capitals: np.ndarray,
+        capacity: int = 256,
+    ) -> None:
+        self.count = 0
+        self.country = np.zeros(capacity, dtype=np.int16)
+        self.region = np.zeros(capacity, dtype=np.int32)
+        self.mission = np.zeros(capacity, dtype=np.uint8)
+        self.wing_type = np.zeros(capacity, dtype=np.uint8)
+        self.planes = np.zeros(capacity, dtype=np.float64)
+
+        n_countries = len(capitals)
+        self.n_countries = n_countries
+        self.planes_lost = np.zeros(n_countries, dtype=np.float64)
+
+        self.provinces = provinces
+        self.n_regions = int(provinces.region.max()) + 1
+        shape = (self.n_regions, n_countries)
+        self.superiority = np.zeros(shape, dtype=np.float64)
+        self.combat_modifier = np.ones(shape, dtype=np.float64)
+        self.supply_modifier = np.ones(shape, dtype=np.float64)
+        # Built radar and anti-air levels per (region, controller); kept by buildings.
+        self.radar_stations = np.zeros(shape, dtype=np.float64)
+        self.anti_air = np.zeros(shape, dtype=np.float64)
+        # Provinces per region, and per (region, controller) for radar coverage.
+        self._region_size = np.bincount(provinces.region, minlength=self.n_regions)
+        self._held = np.zeros(shape, dtype=np.int64)
+        self._controller = provinces.controller.copy()
+        self._count_held(self._controller, np.arange(len(provinces)), 1)
+        provinces.subscribe("controller", self._on_control_changed)
+        # Regions each country's wings of each type reach from its capital.
+        self.reach = np.zeros((n_countries, len(WingType), self.n_regions), dtype=np.bool_)
+        for country, capital in enumerate(capitals.tolist()):
+            x, y = float(spatial.x[capital]), float(spatial.y[capital])
+            for wing_type in WingType:
+                regions = spatial.regions_within(x, y, float(RANGE_KM[wing_type]))
+                self.reach[country, wing_type, regions] = True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        return len(self.country)
+
+    @classmethod
+    def starting(
+        cls,
+        provinces: ProvinceStore,
+        spatial: SpatialIndex,
+        capitals: np.ndarray,
+        military_factories: np.ndarray,
+    ) -> AirTable:
+        """Fighters, CAS and, for the larger powers, bombers over each capital."""
+        table = cls(provinces, spatial, capitals)
+        for country, capital in enumerate(capitals.tolist()):
+            region = int(provinces.region[capital])
+            factories = int(military_factories[country])
+            for _ in range(1 + factories // 8):
+                table.add(country, region, AirMission.SUPERIORITY, WingType.FIGHTER)
+            table.add(country, region, AirMission.INTERCEPTION, WingType.FIGHTER)
+            table.add(country, region, AirMission.CAS, WingType.CAS)
+            if factories >= 12:
+                table.add(country, region, AirMission.STRATEGIC_BOMBING, WingType.BOMBER)
+        return table
+
+    # -- wings -------------------------------------------------------------
+
+    def _grow(self) -> None:
+        new = self.capacity * 2
+        for name in ROW_FIELDS:
+            old = getattr(self, name)
+            grown = np.zeros(new, dtype=old.dtype)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+
+    def add(
+        self, country: int, region: int, mission: int, wing_type: int, planes: float = WING_SIZE
+    ) -> int:
+        if not 0 <= region < self.n_regions:
+            raise ValueError(f"region {region} is not in 0..{self.n_regions - 1}")
+        if not 0 < planes <= WING_SIZE:
+            raise ValueError(f"a wing holds 1..{WING_SIZE} planes, not {planes}")
+        if self.count == self.capacity:
+            self._grow()
+        row = self.count
+        self.count += 1
+        self.country[row] = country
+        self.region[row] = region
+        self.mission[row] = mission
+        self.wing_type[row] = wing_type
+        self.planes[row] = planes
+        return row
+
+    def assign(self, row: int, mission: int, region: int | None = None) -> None:
+        self.mission[row] = mission
+        if region is not None:
+            self.region[row] = region
+
+    def remove(self, row: int) -> None:
+        last = self.count - 1
+        if row != last:
+            for name in ROW_FIELDS:
+                column = getattr(self, name)
+                column[row] = column[last]
+        self.count = last
+
+    def wings_of(self, country: int) -> np.ndarray:
+        return np.flatnonzero(self.country[: self.count] == country)
+
+    # -- radar coverage ----------------------------------------------------
+
+    def _count_held(self, controller: np.ndarray, ids: np.ndarray, sign: int) -> None:
+        held = controller[ids] >= 0
+        cells = self.provinces.region[ids[held]].astype(np.intp) * self.n_countries
+        cells += controller[ids[held]]
+        self._held += sign * np.bincount(cells, minlength=self._held.size).reshape(
+            self._held.shape
+        )
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        self._count_held(self._controller, ids, -1)
+        self._controller[ids] = self.provinces.controller[ids]
+        self._count_held(self._controller, ids, 1)
+
+    # -- modifiers ---------------------------------------------------------
+
+    def modifiers_at(self, provinces: np.ndarray, countries: np.ndarray) -> np.ndarray:
+        """Land combat modifier of each country over the matching province."""
+        return self.combat_modifier[self.provinces.region[provinces], countries]
+
+    def supply_at(self, provinces: np.ndarray) -> np.ndarray:
+        """Share of supply that survives bombing, for each province's controller."""
+        controller = self.provinces.controller[provinces]
+        held = controller >= 0
+        out = np.ones(len(provinces), dtype=np.float64)
+        out[held] = self.supply_modifier[self.provinces.region[provinces[held]], controller[held]]
+        return out
+
+    # -- hourly step -------------------------------------------------------
+
+    def step(self, hostile: np.ndarray) -> None:
+        """One hour of air war over every region: modifiers first, then losses."""
+        n = self.count
+        c, r = self.n_countries, self.n_regions
+        war = hostile.astype(np.float64)
+        country = self.country[:n].astype(np.intp)
+        cell = self.region[:n].astype(np.intp) * c + country
+        wing_type = self.wing_type[:n]
+        mission = self.mission[:n]
+        planes = self.planes[:n]
+        in_range = self.reach[country, wing_type, self.region[:n]]
+        flying = np.where(in_range, planes, 0.0)
+        fit = MISSION_FIT[wing_type, mission]
+
+        def per_cell(weights: np.ndarray) -> np.ndarray:
+            return np.bincount(cell, weights=weights, minlength=r * c).reshape(r, c)
+
+        def on(wanted: AirMission, stat: np.ndarray) -> np.ndarray:
+            return per_cell(np.where(mission == wanted, flying * stat[wing_type] * fit, 0.0))
+
+        detection = BASE_DETECTION + RADAR * self._held / np.maximum(self._region_size, 1)[:, None]
+        detection += RADAR_STATION * self.radar_stations
+        fighters = on(AirMission.SUPERIORITY, AGILITY) * detection
+        interceptors = on(AirMission.INTERCEPTION, AGILITY) * detection
+        cas = on(AirMission.CAS, GROUND_ATTACK)
+        bombing = on(AirMission.STRATEGIC_BOMBING, BOMBING)
+
+        hostile_fighters = fighters @ war
+        contested = fighters + hostile_fighters
+        superiority = np.divide(
+            fighters, contested, out=np.zeros_like(contested), where=contested > 0
+        )
+        self.superiority = superiority
+        balance = np.where(contested > 0, 2.0 * superiority - 1.0, 0.0)
+        support = np.minimum(cas * superiority / CAS_SATURATION, 1.0)
+        self.combat_modifier = 1.0 + SUPERIORITY_BONUS * balance + CAS_BONUS * support
+        raids = (bombing @ war) * (1.0 - superiority) / (1.0 + ANTI_AIR * self.anti_air)
+        self.supply_modifier = 1.0 - BOMBING_PENALTY * np.minimum(raids / BOMBING_SATURATION, 1.0)
+
+        if n == 0 or not hostile.any():
+            return
+        strike = (mission == AirMission.CAS) | (mission == AirMission.STRATEGIC_BOMBING)
+        facing_all = per_cell(flying) @ war
+        facing_strike = per_cell(np.where(strike, flying, 0.0)) @ war
+        shot = np.divide(
+            KILL_RATE * fighters, facing_all, out=np.zeros_like(fighters), where=facing_all > 0
+        ) @ war
+        intercepted = np.divide(
+            KILL_RATE * interceptors,
+            facing_strike,
+            out=np.zeros_like(interceptors),
+            where=facing_strike > 0,
+        ) @ war
+        rate = shot.reshape(-1)[cell] + np.where(strike, intercepted.reshape(-1)[cell], 0.0)
+        rate *= in_range
+        if not rate.any():
+            return
+        lost = np.minimum(planes * rate / TOUGHNESS[wing_type], planes)
+        planes -= lost
+        self.planes_lost += np.bincount(country, weights=lost, minlength=c)
+        # Wings with less than one plane left are disbanded, highest row first.
+        for row in np.flatnonzero(planes < 1.0)[::-1].tolist():
+            self.remove(row)
+
+    # -- daily logistics ---------------------------------------------------
+
+    def reinforce(self, stockpile: np.ndarray) -> None:
+        """Top wings up from the ``(countries, equipment)`` stockpile, pro rata to need."""
+        n = self.count
+        if n == 0:
+            return
+        need = WING_SIZE - np.floor(self.planes[:n])
+        kind = self.country[:n].astype(np.intp) * stockpile.shape[1]
+        kind += WING_EQUIPMENT[self.wing_type[:n]]
+        wanted = np.bincount(kind, weights=need, minlength=stockpile.size)
+        available = np.floor(stockpile.reshape(-1))
+        fill = np.divide(
+            np.minimum(available, wanted), wanted, out=np.zeros_like(wanted), where=wanted > 0
+        )
+        given = np.floor(need * fill[kind])
+        self.planes[:n] += given
+        stockpile.reshape(-1)[:] -= np.bincount(kind, weights=given, minlength=stockpile.size)
+
+    def deploy(self, world: World) -> None:
+        """Move each warring country's wings to where their missions are, if in range."""
+        fronts = world.fronts
+        region = self.provinces.region
+        for country in np.flatnonzero(fronts.hostile.any(axis=1)).tolist():
+            enemies = fronts.at_war(country)
+            rows = self.wings_of(country)
+            reach = self.reach[country, self.wing_type[rows]]
+            mission = self.mission[rows]
+            front = np.concatenate(
+                [fronts.front_provinces(country, e) for e in enemies.tolist()]
+            )
+            if len(front):
+                busiest = int(np.argmax(np.bincount(region[front])))
+                tactical = (mission == AirMission.SUPERIORITY) | (mission == AirMission.CAS)
+                self.region[rows[tactical & reach[:, busiest]]] = busiest
+            target = int(region[world.capitals[enemies[0]]])
+            bombers = (mission == AirMission.STRATEGIC_BOMBING) & reach[:, target]
+            self.region[rows[bombers]] = target
+            home = int(region[world.capitals[country]])
+            self.region[rows[mission == AirMission.INTERCEPTION]] = home
+
+    # -- persistence -------------------------------------------------------
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Active wing rows and per-country loss totals, by name."""
+        columns = {name: getattr(self, name)[: self.count] for name in ROW_FIELDS}
+        for name in COUNTRY_FIELDS:
+            columns[name] = getattr(self, name)
+        return columns
+
+    def restore(self, columns: dict[str, np.ndarray]) -> None:
+        """Replace every wing and country array with saved ``columns``."""
+        count = len(columns["country"])
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        for name in ROW_FIELDS:
+            column = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            column[:count] = columns[name]
+            setattr(self, name, column)
+        for name in COUNTRY_FIELDS:
+            getattr(self, name)[:] = columns[name]
+        self.count = count
+
+
+def air_system(world: World) -> None:
+    """Hourly system, before combat: air superiority, modifiers and losses."""
+    world.air.step(world.fronts.hostile)
+
+
+def air_logistics_system(world: World) -> None:
+    """Daily system: replace lost planes from the stockpile and redeploy wings."""
+    air = world.air
+    air.reinforce(world.production.stockpile)
+    air.deploy(world)
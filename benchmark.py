@@ -0,0 +1,361 @@
+"""Benchmark scenarios and regression tracking.
+
+Each scenario builds a fixed-seed world, puts it at a historical date and
+war situation, and runs the full scheduler for a fixed number of in-game
+hours.  The measurements are what the scheduler already keeps (tick time and
+per-system call statistics) plus the peak resident set size.  Every run
+happens in a fresh process, so peak RSS belongs to that scenario alone; of
+``repeat`` runs, the fastest is kept, which filters out most machine noise.
+
+Wars are between generated countries picked by their geography, so a
+scenario means the same thing for any seed:
+
+* ``1936-peacetime`` -- no wars, the daily economy and AI idle loops only;
+* ``1939-poland`` -- the largest country attacks its neighbour with the
+  longest common border, 100 divisions against 60;
+* ``1942-eastern-front`` -- the two countries sharing the longest border
+  fight with 1,500 divisions between them.
+
+Both armies are raised through the world's
+:class:`divisions.DivisionStore`, so battles run on the same division
+stats, losses and retreats as a game.  An :class:`Offensive` keeps the
+attacker's idle divisions committed to battles along the front, and
+replaces the divisions either side loses, so the combat load stays at the
+scenario's size as provinces change hands.
+
+Results are JSON.  :func:`compare` checks them against a baseline and
+lists every scenario whose throughput dropped, or whose peak memory grew, by
+more than the tolerance; ``main.py --bench`` exits non-zero when it finds
+any.  Absolute ticks per second only compare between runs on the same kind
+of machine, so CI (``.github/workflows/bench.yml``) benchmarks the merge
+base and the change in the same job and gates on the difference.  Repeats of
+one scenario still vary, so a scenario's speed tolerance is widened to the
+run-to-run spread measured on either side (:func:`spread`): a slowdown only
+counts when it is larger than the noise.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from combat import engage
+from provinces import EDGE_RIVER, EDGE_STRAIT
+from scheduler import Cadence, GameClock
+from simulation import build_scheduler
+from world import World
+
+FORMAT_VERSION = 1
+DEFAULT_TOLERANCE = 0.05
+# Divisions per side of one battle; a province holds one battle at a time.
+MAX_STACK = 5
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    start: datetime
+    hours: int
+    # "none", "neighbour" (largest country and its main neighbour) or "border"
+    # (the two countries sharing the longest border).
+    war: str = "none"
+    attackers: int = 0
+    defenders: int = 0
+    seed: int = 1936
+    width: int = 150
+    height: int = 100
+    countries: int = 60
+
+
+SCENARIOS: dict[str, Scenario] = {
+    s.name: s
+    for s in (
+        Scenario("1936-peacetime", datetime(1936, 1, 1), hours=24 * 365),
+        Scenario(
+            "1939-poland", datetime(1939, 9, 1), hours=24 * 61,
+            war="neighbour", attackers=100, defenders=60,
+        ),
+        Scenario(
+            "1942-eastern-front", datetime(1942, 6, 22), hours=24 * 30,
+            war="border", attackers=800, defenders=700,
+        ),
+    )
+}
+
+
+def _border_lengths(world: World) -> dict[tuple[int, int], int]:
+    """Land edges between each pair of countries ``a < b``."""
+    provinces = world.provinces
+    src, dst = provinces.adj_sources, provinces.adj_targets
+    ctrl = provinces.controller.astype(np.int64)
+    land = (provinces.adj_flags & EDGE_STRAIT) == 0
+    mask = provinces.contested_edges() & land & (ctrl[src] < ctrl[dst])
+    pairs, counts = np.unique(
+        ctrl[src[mask]] * world.n_countries + ctrl[dst[mask]], return_counts=True
+    )
+    n = world.n_countries
+    return {(int(p) // n, int(p) % n): int(c) for p, c in zip(pairs, counts)}
+
+
+def belligerents(world: World, war: str) -> tuple[int, int] | None:
+    """``(attacker, defender)`` for a scenario's kind of war, or None in peacetime."""
+    if war == "none":
+        return None
+    borders = _border_lengths(world)
+    if war == "border":
+        # Ties go to the lowest pair, so the choice is deterministic.
+        (a, b), _ = max(sorted(borders.items()), key=lambda item: item[1])
+        return a, b
+    if war == "neighbour":
+        sizes = world.provinces.province_counts(world.n_countries, controlled=True)
+        attacker = int(np.argmax(sizes))
+        neighbours = sorted(
+            (length, b if a == attacker else a)
+            for (a, b), length in borders.items()
+            if attacker in (a, b)
+        )
+        return attacker, neighbours[-1][1]
+    raise ValueError(f"unknown war kind {war!r}")
+
+
+class Offensive:
+    """Daily system: commit the attacker's idle divisions to battles on the front."""
+
+    def __init__(
+        self,
+        world: World,
+        attacker: int,
+        defender: int,
+        attackers: int,
+        defenders: int,
+        seed: int,
+    ) -> None:
+        self.attacker = attacker
+        self.defender = defender
+        self.attackers = attackers
+        self.defenders = defenders
+        self.rng = np.random.default_rng(seed)
+        self.started = 0
+        # Divisions each side keeps: what it had before the war plus its army.
+        counts = world.divisions.counts(world.n_countries)
+        self.strength = {
+            attacker: int(counts[attacker]) + attackers,
+            defender: int(counts[defender]) + defenders,
+        }
+        self._replace(world)
+
+    def _replace(self, world: World) -> None:
+        """Raise divisions of random templates at each side's capital up to its strength."""
+        divisions = world.divisions
+        counts = divisions.counts(world.n_countries)
+        for country, strength in self.strength.items():
+            short = strength - int(counts[country])
+            if short <= 0:
+                continue
+            templates = self.rng.integers(len(divisions.templates), size=short)
+            for template in np.unique(templates).tolist():
+                locations = np.full(
+                    int((templates == template).sum()), world.capitals[country], dtype=np.int32
+                )
+                divisions.spawn_many(country, template, locations)
+
+    def committed(self, world: World) -> int:
+        """Attacker divisions in battle now."""
+        divisions = world.divisions
+        fighting = divisions.in_battle()
+        return int((divisions.country[fighting] == self.attacker).sum())
+
+    def _idle(self, world: World, country: int) -> np.ndarray:
+        divisions = world.divisions
+        ids = divisions.ids_of(country)
+        return ids[divisions.battle[ids] < 0]
+
+    def __call__(self, world: World) -> None:
+        self._replace(world)
+        if self.committed(world) >= self.attackers:
+            return
+        provinces = world.provinces
+        src, dst = provinces.adj_sources, provinces.adj_targets
+        ctrl = provinces.controller
+        edges = np.flatnonzero(
+            (ctrl[src] == self.attacker)
+            & (ctrl[dst] == self.defender)
+            & ((provinces.adj_flags & EDGE_STRAIT) == 0)
+        )
+        if not len(edges):
+            return
+        self.rng.shuffle(edges)
+        # The defender spreads its army evenly over the provinces under attack.
+        targets = len(np.unique(dst[edges]))
+        per_defence = max(1, min(MAX_STACK, self.defenders // targets))
+        divisions = world.divisions
+        idle = self._idle(world, self.attacker)
+        idle = idle[: max(self.attackers - self.committed(world), 0)]
+        reserves = self._idle(world, self.defender)
+        for edge in edges.tolist():
+            if not len(idle) or not len(reserves):
+                break
+            target = int(dst[edge])
+            if target in world.battles.by_province:
+                continue
+            stack, idle = idle[:MAX_STACK], idle[MAX_STACK:]
+            defence, reserves = reserves[:per_defence], reserves[per_defence:]
+            # Both sides are brought up to the front at once.
+            divisions.location[stack] = src[edge]
+            divisions.location[defence] = target
+            engage(
+                world, target, stack, defence, river=bool(provinces.adj_flags[edge] & EDGE_RIVER)
+            )
+            self.started += 1
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def run_scenario(scenario: Scenario) -> dict[str, Any]:
+    """Run ``scenario`` in this process and return its measurements."""
+    world = World.generate(scenario.width, scenario.height, scenario.countries, scenario.seed)
+    world.clock.hour = GameClock.hours_until(scenario.start)
+    world.ai.budget_ms = None  # fixed work per tick, so runs are comparable
+    scheduler = build_scheduler(world)
+    offensive = None
+    sides = belligerents(world, scenario.war)
+    if sides is not None:
+        attacker, defender = sides
+        world.fronts.declare_war(attacker, defender)
+        offensive = Offensive(
+            world, attacker, defender, scenario.attackers, scenario.defenders, scenario.seed
+        )
+        scheduler.register("offensive", offensive, Cadence.DAILY)
+        offensive(world)
+    started = time.perf_counter()
+    scheduler.run(scenario.hours)
+    wall = time.perf_counter() - started
+    return {
+        "hours": scenario.hours,
+        "reached": world.clock.now.isoformat(),
+        "wall_seconds": round(wall, 3),
+        "ticks_per_second": round(scheduler.hours_per_second(), 1),
+        "max_tick_ms": round(scheduler.tick_stats.max_s * 1000.0, 3),
+        "ticks_over_budget": scheduler.tick_stats.overruns,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "belligerents": list(sides) if sides is not None else [],
+        "battles_started": offensive.started if offensive is not None else 0,
+        "digest": world.digest(),
+        "systems": {
+            system.name: {
+                "calls": system.stats.calls,
+                "mean_ms": round(system.stats.mean_ms, 4),
+                "max_ms": round(system.stats.max_s * 1000.0, 3),
+                "total_s": round(system.stats.total_s, 4),
+            }
+            for system in scheduler.systems
+        },
+    }
+
+
+def run_suite(names: list[str] | None = None, repeat: int = 3) -> dict[str, Any]:
+    """Run the named scenarios (default all), each ``repeat`` times in fresh processes."""
+    names = names or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise KeyError(f"unknown scenarios {unknown}; expected some of {list(SCENARIOS)}")
+    context = multiprocessing.get_context("spawn")
+    scenarios = {}
+    for name in names:
+        runs = []
+        # One worker per run: peak RSS is per process and must not carry over.
+        for _ in range(max(1, repeat)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(run_scenario, SCENARIOS[name]).result())
+        best = max(runs, key=lambda run: run["ticks_per_second"])
+        best["runs"] = [run["ticks_per_second"] for run in runs]
+        scenarios[name] = best
+    return {
+        "format": FORMAT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scenarios": scenarios,
+    }
+
+
+def spread(run: dict[str, Any]) -> float:
+    """How much slower the slowest of a scenario's repeats was than the fastest."""
+    runs = run.get("runs") or [run["ticks_per_second"]]
+    return 1.0 - min(runs) / max(runs)
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """Regressions of ``results`` against ``baseline`` beyond ``tolerance``, as messages.
+
+    The speed tolerance of each scenario is at least the run-to-run spread of
+    either side, so noise between repeats is never reported as a regression.
+    """
+    regressions = []
+    for name, run in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        allowed = max(tolerance, spread(run), spread(base))
+        speed = run["ticks_per_second"] / base["ticks_per_second"] - 1.0
+        if speed < -allowed:
+            regressions.append(
+                f"{name}: {run['ticks_per_second']:.0f} ticks/s, "
+                f"{-speed:.1%} slower than the baseline {base['ticks_per_second']:.0f} "
+                f"(allowed {allowed:.1%})"
+            )
+        memory = run["peak_rss_mb"] / base["peak_rss_mb"] - 1.0
+        if memory > tolerance:
+            regressions.append(
+                f"{name}: peak RSS {run['peak_rss_mb']:.0f} MB, "
+                f"{memory:.1%} above the baseline {base['peak_rss_mb']:.0f} MB"
+            )
+    return regressions
+
+
+def report(results: dict[str, Any], baseline: dict[str, Any] | None = None) -> str:
+    """Per-scenario summary with per-system mean times, against ``baseline`` if given."""
+    lines = []
+    for name, run in results["scenarios"].items():
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        lines.append(
+            f"{name}: {run['ticks_per_second']:.0f} ticks/s over {run['hours']} h, "
+            f"max tick {run['max_tick_ms']:.1f} ms, peak RSS {run['peak_rss_mb']:.0f} MB"
+        )
+        if base is not None and base.get("digest") != run["digest"]:
+            lines.append("  (end state differs from the baseline's; the scenario changed)")
+        for system, stats in run["systems"].items():
+            line = f"  {system:<16}{stats['mean_ms']:>10.4f} ms{stats['max_ms']:>10.3f} max"
+            before = base["systems"].get(system) if base is not None else None
+            if before is not None and before["mean_ms"] > 0:
+                line += f"{stats['mean_ms'] / before['mean_ms'] - 1.0:>+9.1%}"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def load_results(path: Path) -> dict[str, Any]:
+    return json.loads(path.read_text())
+
+
+def write_results(path: Path, results: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=1))
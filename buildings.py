@@ -0,0 +1,540 @@
+"""State buildings and every country's construction queue, as arrays.
+
+Each state has a level per :class:`Building` in one ``(states, buildings)``
+array.  Factories and dockyards share the state's building slots;
+infrastructure, railways, forts, anti-air and radar each have their own
+maximum level.  A state's buildings work for whoever controls its *seat*,
+the province with the most victory points.
+
+Construction projects of all countries are rows of one
+:class:`BuildingTable` (country, state, building, progress and a queue
+position), and a day of construction for the whole world is one array step
+in :meth:`BuildingTable.step`: queues are ranked with one ``lexsort``, each
+project gets up to :data:`MAX_FACTORIES_PER_PROJECT` of its country's
+civilian factories in queue order, and gains ``factories *``
+:data:`OUTPUT_PER_FACTORY` IC times ``1 + CONSTRUCTION_SPEED`` from the
+country's and the state's modifier totals (occupied states build at half
+speed).  Civilian factories spent on trade are not available.  A country's
+projects depend on nothing but its own factories, so that arithmetic is
+:func:`construction_kernel`, run on the partitions of a
+:class:`parallel.ParallelStepper`; finished levels are applied afterwards.
+
+What buildings change is kept up to date incrementally, for the states
+that finished a level or changed hands only:
+
+* factory counts: :attr:`production.ProductionTable.civilian_factories`,
+  ``military_factories`` and :attr:`BuildingTable.dockyards`, per country;
+* supply: infrastructure raises the provinces' ``infrastructure`` column
+  (which :class:`supply.SupplyNetwork` follows) and gives the state
+  :data:`INFRASTRUCTURE_CONSTRUCTION` construction speed per level through
+  the modifier engine; railways scale capital and hub output
+  (:meth:`supply.SupplyNetwork.set_throughput`);
+* the air war: radar and anti-air levels per (region, controller) in
+  :class:`air.AirTable`;
+* land combat: forts divide the attacker's attacks
+  (:meth:`BuildingTable.fort_modifier`).
+
+Countries keep enough projects queued to use all their civilian factories:
+factories in the state with the most free slots while there are any (a
+civilian factory while they have fewer than :data:`CIVILIAN_RATIO` times
+their military factories), then the lowest level of any of
+:data:`SUPPORT` -- forts only in states on a front -- lowest level first,
+then in that order, then lowest state.  Each remaining level of each
+building in each state is one candidate, so picking a country's next
+projects is one ``lexsort`` over its candidates.  A queue is only topped up
+after something that could change the pick -- a finished or cancelled
+project, a state changing hands, a front moving -- or when the country can
+spend more factories than last time; otherwise a queue that could not be
+filled would be searched again every day.
+"""
+
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from air import AirTable
+from fronts import apportion
+from modifiers import Modifier, ModifierEngine, Scope
+from parallel import Runner, serial
+from production import ProductionTable
+from provinces import ProvinceStore
+from supply import SupplyNetwork
+
+if TYPE_CHECKING:
+    from world import World
+
+
+class Building(IntEnum):
+    CIVILIAN_FACTORY = 0
+    MILITARY_FACTORY = 1
+    DOCKYARD = 2
+    INFRASTRUCTURE = 3
+    RAILWAY = 4
+    LAND_FORT = 5
+    ANTI_AIR = 6
+    RADAR = 7
+
+
+# IC per level, indexed by Building.
+COST = np.array([10800, 7200, 6400, 3000, 1600, 500, 1250, 2600], dtype=np.float64)
+# Buildings that take one of the state's shared slots per level.
+SHARED = np.array([True, True, True, False, False, False, False, False])
+# Most levels per state of the other buildings.
+MAX_LEVEL = np.array([0, 0, 0, 5, 5, 10, 5, 6], dtype=np.int16)
+assert len(COST) == len(SHARED) == len(MAX_LEVEL) == len(Building)
+
+OUTPUT_PER_FACTORY = 5.0  # construction IC per civilian factory-day
+MAX_FACTORIES_PER_PROJECT = 15
+BASE_SLOTS = 2
+PROVINCES_PER_SLOT = 4
+VICTORY_POINTS_PER_SLOT = 5
+RAILWAY_THROUGHPUT = 0.2  # capital and hub supply per railway level
+FORT_DEFENSE = 0.15  # attacks on a fortified province are divided by 1 + this per level
+INFRASTRUCTURE_CONSTRUCTION = 0.05  # state construction speed per infrastructure level
+CIVILIAN_RATIO = 1.2
+# Buildings queued once the shared slots are taken, in order of preference.
+SUPPORT = (
+    Building.LAND_FORT,
+    Building.INFRASTRUCTURE,
+    Building.RAILWAY,
+    Building.ANTI_AIR,
+    Building.RADAR,
+)
+
+ROW_FIELDS = ("country", "state", "building", "progress", "order")
+STATE_FIELDS = ("levels", "slots")
+
+
+class BuildingTable:
+    """Per-state building levels and one dense table of construction projects.
+
+    Projects are packed into rows ``[0, count)``; finishing or cancelling a
+    project moves the last row into the freed slot, so row indices are not
+    stable.
+    """
+
+    def __init__(
+        self,
+        provinces: ProvinceStore,
+        n_countries: int,
+        modifiers: ModifierEngine,
+        production: ProductionTable,
+        supply: SupplyNetwork,
+        air: AirTable,
+        capacity: int = 256,
+    ) -> None:
+        self.count = 0
+        self.country = np.zeros(capacity, dtype=np.int16)
+        self.state = np.zeros(capacity, dtype=np.int32)
+        self.building = np.zeros(capacity, dtype=np.uint8)
+        self.progress = np.zeros(capacity, dtype=np.float64)
+        self.order = np.zeros(capacity, dtype=np.int64)
+        self.next_order = 0
+
+        self.provinces = provinces
+        self.n_countries = n_countries
+        self.modifiers = modifiers
+        self.production = production
+        self.supply = supply
+        self.air = air
+
+        land = np.flatnonzero(provinces.state >= 0)
+        state = provinces.state[land]
+        n_states = int(state.max()) + 1
+        self.levels = np.zeros((n_states, len(Building)), dtype=np.int16)
+        self.queued = np.zeros((n_states, len(Building)), dtype=np.int16)
+        self.slots = np.zeros(n_states, dtype=np.int16)
+        self.dockyards = np.zeros(n_countries, dtype=np.int32)
+        self.state_size = np.bincount(state, minlength=n_states)
+        # Seat: the state's province with the most victory points, lowest ID on ties.
+        by_seat = np.lexsort((land, -provinces.victory_points[land], state))
+        first = np.r_[True, state[by_seat][1:] != state[by_seat][:-1]]
+        self.seat = land[by_seat[first]]
+        self.controller = provinces.controller[self.seat].astype(np.int16)
+        self._seat_state = np.full(len(provinces), -1, dtype=np.int32)
+        self._seat_state[self.seat] = np.arange(n_states, dtype=np.int32)
+        # Countries whose queue may be fillable again, what they could use when
+        # last filled, and the states on a front then.
+        self._stale = np.ones(n_countries, dtype=bool)
+        self._wanted = np.zeros(n_countries, dtype=np.int64)
+        self._front_states = np.zeros(n_states, dtype=bool)
+        self.refills = 0
+        provinces.subscribe("controller", self._on_control_changed)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        return len(self.country)
+
+    @property
+    def n_states(self) -> int:
+        return len(self.levels)
+
+    @classmethod
+    def starting(
+        cls,
+        provinces: ProvinceStore,
+        n_countries: int,
+        modifiers: ModifierEngine,
+        production: ProductionTable,
+        supply: SupplyNetwork,
+        air: AirTable,
+    ) -> BuildingTable:
+        """Each country's starting factories spread over its states by free slots.
+
+        Dockyards follow naval bases, and a state's infrastructure level is
+        that of its least developed province.  Queues start full.
+        """
+        table = cls(provinces, n_countries, modifiers, production, supply, air)
+        land = np.flatnonzero(provinces.state >= 0)
+        state = provinces.state[land]
+        n = table.n_states
+        victory_points = np.bincount(state, weights=provinces.victory_points[land], minlength=n)
+        table.slots[:] = (
+            BASE_SLOTS
+            + table.state_size // PROVINCES_PER_SLOT
+            + victory_points.astype(np.int64) // VICTORY_POINTS_PER_SLOT
+        )
+        levels = table.levels
+        naval = np.bincount(state, weights=provinces.naval_base[land], minlength=n)
+        levels[:, Building.DOCKYARD] = naval.astype(np.int64) // 2
+        table.slots += levels[:, Building.DOCKYARD]
+        infrastructure = np.full(n, MAX_LEVEL[Building.INFRASTRUCTURE], dtype=np.int16)
+        np.minimum.at(infrastructure, state, provinces.infrastructure[land])
+        levels[:, Building.INFRASTRUCTURE] = infrastructure
+
+        free = table.slots - levels[:, SHARED].sum(axis=1)
+        for country in range(n_countries):
+            mine = np.flatnonzero(table.controller == country)
+            military = int(production.military_factories[country])
+            civilian = int(production.civilian_factories[country])
+            short = military + civilian - int(free[mine].sum())
+            if short > 0:
+                largest = mine[np.argmax(table.slots[mine])]
+                table.slots[largest] += short
+                free[largest] += short
+            placed = apportion(free[mine], military)
+            levels[mine, Building.MILITARY_FACTORY] = placed
+            free[mine] -= placed.astype(free.dtype)
+            levels[mine, Building.CIVILIAN_FACTORY] = apportion(free[mine], civilian)
+        table.recount()
+        everything = np.arange(n)
+        table._lay_infrastructure(everything)
+        table._set_throughput(everything)
+        table.fill_queues()
+        return table
+
+    # -- derived values ----------------------------------------------------
+
+    def recount(self) -> None:
+        """Rebuild every per-country and per-region total from the levels."""
+        self.production.civilian_factories[:] = 0
+        self.production.military_factories[:] = 0
+        self.dockyards[:] = 0
+        self.air.radar_stations[:] = 0.0
+        self.air.anti_air[:] = 0.0
+        self._count(np.arange(self.n_states), 1)
+
+    def _count(self, states: np.ndarray, sign: int) -> None:
+        """Add (``sign=1``) or take away the states' buildings from their controllers."""
+        controller = self.controller[states].astype(np.intp)
+        held = controller >= 0
+        states, controller = states[held], controller[held]
+        if not len(states):
+            return
+        self._stale[controller] = True
+        levels = self.levels[states].astype(np.int64) * sign
+        c = self.n_countries
+        production = self.production
+        production.civilian_factories += np.bincount(
+            controller, weights=levels[:, Building.CIVILIAN_FACTORY], minlength=c
+        ).astype(np.int32)
+        production.military_factories += np.bincount(
+            controller, weights=levels[:, Building.MILITARY_FACTORY], minlength=c
+        ).astype(np.int32)
+        self.dockyards += np.bincount(
+            controller, weights=levels[:, Building.DOCKYARD], minlength=c
+        ).astype(np.int32)
+        cell = (self.provinces.region[self.seat[states]], controller)
+        np.add.at(self.air.radar_stations, cell, levels[:, Building.RADAR])
+        np.add.at(self.air.anti_air, cell, levels[:, Building.ANTI_AIR])
+
+    def _lay_infrastructure(self, states: np.ndarray) -> None:
+        """Lift the states' provinces to the state's infrastructure level."""
+        level = self.levels[states, Building.INFRASTRUCTURE]
+        ids = self.modifiers.state_provinces(states)
+        target = np.repeat(level, self.state_size[states]).astype(np.uint8)
+        self.provinces.update(
+            "infrastructure", ids, np.maximum(self.provinces.infrastructure[ids], target)
+        )
+        for value in np.unique(level).tolist():
+            self.modifiers.add(
+                Scope.STATE,
+                states[level == value],
+                "building:infrastructure",
+                {Modifier.CONSTRUCTION_SPEED: INFRASTRUCTURE_CONSTRUCTION * value},
+            )
+
+    def _set_throughput(self, states: np.ndarray) -> None:
+        level = self.levels[states, Building.RAILWAY]
+        ids = self.modifiers.state_provinces(states)
+        throughput = 1.0 + RAILWAY_THROUGHPUT * np.repeat(level, self.state_size[states])
+        self.supply.set_throughput(ids, throughput)
+
+    def fort_modifier(self, provinces: np.ndarray) -> np.ndarray:
+        """Multiplier on attacks into each province from its state's forts."""
+        state = self.provinces.state[provinces]
+        level = np.where(state >= 0, self.levels[np.maximum(state, 0), Building.LAND_FORT], 0)
+        return 1.0 / (1.0 + FORT_DEFENSE * level)
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        states = self._seat_state[ids]
+        states = states[states >= 0].astype(np.int64)
+        if not len(states):
+            return
+        self._count(states, -1)
+        self.controller[states] = self.provinces.controller[self.seat[states]]
+        self._count(states, 1)
+        # Projects in states their country no longer controls are lost.
+        n = self.count
+        lost = np.flatnonzero(
+            np.isin(self.state[:n], states)
+            & (self.country[:n] != self.controller[self.state[:n]])
+        )
+        for row in lost[::-1].tolist():
+            self.cancel(row)
+        self.production.shed()
+
+    # -- queue -------------------------------------------------------------
+
+    def _grow(self) -> None:
+        new = self.capacity * 2
+        for name in ROW_FIELDS:
+            old = getattr(self, name)
+            grown = np.zeros(new, dtype=old.dtype)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+
+    def free_slots(self, states: np.ndarray | int) -> np.ndarray:
+        """Shared slots neither built on nor queued for."""
+        used = self.levels[states][..., SHARED].sum(axis=-1)
+        used += self.queued[states][..., SHARED].sum(axis=-1)
+        return self.slots[states] - used
+
+    def can_build(self, state: int, building: int) -> bool:
+        if SHARED[building]:
+            return bool(self.free_slots(state) > 0)
+        return int(self.levels[state, building] + self.queued[state, building]) < int(
+            MAX_LEVEL[building]
+        )
+
+    def enqueue(self, country: int, state: int, building: int) -> int:
+        """Queue one level of ``building`` in ``state`` at the end of the country's queue."""
+        if self.controller[state] != country:
+            raise ValueError(f"country {country} does not control state {state}")
+        if not self.can_build(state, building):
+            raise ValueError(f"state {state} has no room for {Building(building).name}")
+        if self.count == self.capacity:
+            self._grow()
+        row = self.count
+        self.count += 1
+        self.country[row] = country
+        self.state[row] = state
+        self.building[row] = building
+        self.progress[row] = 0.0
+        self.order[row] = self.next_order
+        self.next_order += 1
+        self.queued[state, building] += 1
+        return row
+
+    def cancel(self, row: int) -> None:
+        self.queued[self.state[row], self.building[row]] -= 1
+        self._stale[self.country[row]] = True
+        last = self.count - 1
+        if row != last:
+            for name in ROW_FIELDS:
+                column = getattr(self, name)
+                column[row] = column[last]
+        self.count = last
+
+    def queue_of(self, country: int) -> np.ndarray:
+        """The country's project rows, first in line first."""
+        rows = np.flatnonzero(self.country[: self.count] == country)
+        return rows[np.argsort(self.order[rows], kind="stable")]
+
+    def construction_factories(self) -> np.ndarray:
+        """Civilian factories each country can put on construction today."""
+        production = self.production
+        return np.maximum(production.civilian_factories + production.trade_factories, 0.0)
+
+    def fill_queues(self, front: np.ndarray | None = None) -> None:
+        """Queue projects for the countries that have civilian factories left idle.
+
+        ``front`` marks the provinces on a front; their states get forts.
+        """
+        front_states = np.zeros(self.n_states, dtype=bool)
+        if front is not None:
+            state = self.provinces.state[front]
+            front_states[state[state >= 0]] = True
+        moved = self.controller[front_states != self._front_states]
+        self._stale[moved[moved >= 0]] = True
+        self._front_states = front_states
+        queued = np.bincount(self.country[: self.count], minlength=self.n_countries)
+        wanted = np.ceil(self.construction_factories() / MAX_FACTORIES_PER_PROJECT)
+        wanted = wanted.astype(np.int64)
+        short = (queued < wanted) & (self._stale | (wanted > self._wanted))
+        for country in np.flatnonzero(short).tolist():
+            self._fill(country, int(wanted[country]) - int(queued[country]))
+        self._stale[:] = False
+        self._wanted = wanted
+
+    def _fill(self, country: int, projects: int) -> None:
+        """Queue up to ``projects`` of the country's best candidates."""
+        self.refills += 1
+        mine = np.flatnonzero(self.controller == country)
+        # One candidate per remaining level: factories by free slots, most first...
+        free = np.maximum(self.free_slots(mine), 0)
+        first = np.repeat(np.cumsum(free) - free, free)
+        states = [np.repeat(mine, free)]
+        rank = [np.arange(len(states[0])) - first - np.repeat(free, free)]
+        kind = [np.full(len(states[0]), -1)]
+        # ... then support buildings by level, lowest first.
+        for i, building in enumerate(SUPPORT):
+            where = mine[self._front_states[mine]] if building == Building.LAND_FORT else mine
+            level = self.levels[where, building] + self.queued[where, building]
+            room = np.maximum(MAX_LEVEL[building] - level, 0).astype(np.int64)
+            start = np.repeat(np.cumsum(room) - room, room)
+            states.append(np.repeat(where, room))
+            rank.append(np.arange(len(start)) - start + np.repeat(level, room))
+            kind.append(np.full(len(start), i))
+        states, rank, kind = (np.concatenate(column) for column in (states, rank, kind))
+        factory = kind < 0
+        picked = np.lexsort((states, kind, rank, ~factory))[:projects]
+
+        production = self.production
+        civilian = int(production.civilian_factories[country])
+        civilian += int(self.queued[mine, Building.CIVILIAN_FACTORY].sum())
+        military = int(production.military_factories[country])
+        military += int(self.queued[mine, Building.MILITARY_FACTORY].sum())
+        for row in picked.tolist():
+            if factory[row]:
+                if civilian < CIVILIAN_RATIO * military:
+                    building = Building.CIVILIAN_FACTORY
+                    civilian += 1
+                else:
+                    building = Building.MILITARY_FACTORY
+                    military += 1
+            else:
+                building = SUPPORT[kind[row]]
+            self.enqueue(country, int(states[row]), building)
+
+    # -- daily step --------------------------------------------------------
+
+    def step(self, run: Runner | None = None) -> int:
+        """One day of construction on every queued project; returns levels finished."""
+        n = self.count
+        if n == 0:
+            return 0
+        arrays = {
+            "country": self.country[:n],
+            "state": self.state[:n],
+            "order": self.order[:n],
+            "progress": self.progress[:n],
+            "available": self.construction_factories(),
+            "country_speed": self.modifiers.column(Scope.COUNTRY, Modifier.CONSTRUCTION_SPEED),
+            "state_speed": self.modifiers.column(Scope.STATE, Modifier.CONSTRUCTION_SPEED),
+        }
+        run = run or serial(self.n_countries)
+        for rows, progress in run("construction", construction_kernel, arrays):
+            self.progress[rows] = progress
+        done = np.flatnonzero(self.progress[:n] >= COST[self.building[:n]])
+        if len(done):
+            self._finish(done)
+        return len(done)
+
+    def _finish(self, rows: np.ndarray) -> None:
+        states = self.state[rows].astype(np.int64)
+        buildings = self.building[rows].astype(np.intp)
+        changed = np.unique(states)
+        self._count(changed, -1)
+        np.add.at(self.levels, (states, buildings), 1)
+        self._count(changed, 1)
+        infrastructure = np.unique(states[buildings == Building.INFRASTRUCTURE])
+        if len(infrastructure):
+            self._lay_infrastructure(infrastructure)
+        railway = np.unique(states[buildings == Building.RAILWAY])
+        if len(railway):
+            self._set_throughput(railway)
+        for row in np.sort(rows)[::-1].tolist():
+            self.cancel(row)
+
+    # -- persistence -------------------------------------------------------
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Active project rows and per-state levels and slots, by name."""
+        columns = {name: getattr(self, name)[: self.count] for name in ROW_FIELDS}
+        for name in STATE_FIELDS:
+            columns[name] = getattr(self, name)
+        columns["next_order"] = np.array([self.next_order], dtype=np.int64)
+        return columns
+
+    def restore(self, columns: dict[str, np.ndarray]) -> None:
+        """Replace every project and level with saved ``columns``; rederive the rest.
+
+        Province infrastructure and the engine's infrastructure sources are
+        saved with the provinces and the modifier engine, so only the totals
+        and supply throughput are rebuilt.
+        """
+        count = len(columns["country"])
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        for name in ROW_FIELDS:
+            column = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            column[:count] = columns[name]
+            setattr(self, name, column)
+        self.count = count
+        self.next_order = int(columns["next_order"][0])
+        for name in STATE_FIELDS:
+            getattr(self, name)[:] = columns[name]
+        self.queued[:] = 0
+        np.add.at(self.queued, (self.state[:count], self.building[:count]), 1)
+        self.recount()
+        self._set_throughput(np.arange(self.n_states))
+
+
+def construction_kernel(
+    arrays: dict[str, np.ndarray], countries: np.ndarray, rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray]:
+    """A day of work on the projects of ``countries``: their rows and new progress."""
+    rows = np.flatnonzero(np.isin(arrays["country"], countries))
+    country = arrays["country"][rows].astype(np.intp)
+    ranked = np.lexsort((arrays["order"][rows], country))
+    ranked_country = country[ranked]
+    rank = np.arange(len(rows)) - np.searchsorted(ranked_country, ranked_country)
+    factories = np.clip(
+        arrays["available"][ranked_country] - MAX_FACTORIES_PER_PROJECT * rank,
+        0.0,
+        MAX_FACTORIES_PER_PROJECT,
+    )
+    speed = (
+        1.0
+        + arrays["country_speed"][ranked_country]
+        + arrays["state_speed"][arrays["state"][rows[ranked]]]
+    )
+    rows = rows[ranked]
+    return rows, arrays["progress"][rows] + factories * OUTPUT_PER_FACTORY * np.maximum(
+        speed, 0.0
+    )
+
+
+def construction_system(world: World) -> None:
+    """Daily system: build on every queue, then top up the idle ones."""
+    buildings = world.buildings
+    buildings.step(world.stepper.runner(world))
+    buildings.fill_queues(world.fronts.front_mask())
@@ -0,0 +1,455 @@
+"""Batched land combat.
+
+All active battles live in one :class:`BattleTable`; per-side columns have
+shape ``(capacity, 2)`` with the attacker in column 0 and the defender in
+column 1, so one hour of every battle is resolved with a fixed sequence of
+array operations.  :func:`resolve_battle` is the scalar reference for the
+same formula and produces bit-identical results for a single battle.
+
+Hourly model, per side ``s`` facing enemy ``o``:
+
+* attacks = soft * (1 - hardness_o) + hard * hardness_o, scaled by frontage
+  (combat width / deployed width, capped at 1), the attacker's terrain and
+  river-crossing modifiers, halved when piercing_s < armor_o, and scaled
+  by the side's air modifier (:attr:`air.AirTable.combat_modifier`);
+* the attacker absorbs enemy attacks with breakthrough, the defender with
+  defense (both scaled by frontage);
+* attacks up to the absorbing stat hit 10% of the time, the excess 40%;
+* each hit removes :data:`ORG_PER_HIT` organisation and
+  :data:`STRENGTH_PER_HIT` strength.
+
+A side at zero organisation or strength loses; if both break in the same
+hour the defender holds.
+
+Battles are fought by divisions: :func:`engage` sums each side's effective
+stats (:meth:`unitstats.DivisionStatCache.side`) into the table row and
+holds the divisions in the battle until it ends.  Every hour each side's
+share of organisation and strength lost is written back to its divisions
+(equipment goes with the men), and when a battle ends the winning attackers
+advance into the province, beaten defenders fall back to a neighbouring
+province their country holds (or are destroyed if there is none), and
+divisions left without strength are disbanded.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from provinces import EDGE_RIVER, Terrain
+
+if TYPE_CHECKING:
+    from world import World
+
+ONGOING = 0
+ATTACKER_WON = 1
+DEFENDER_WON = 2
+
+ORG_PER_HIT = 0.125
+STRENGTH_PER_HIT = 0.075
+SHIELDED_HIT_CHANCE = 0.1
+UNSHIELDED_HIT_CHANCE = 0.4
+RIVER_PENALTY = 0.3
+UNPIERCED_PENALTY = 0.5
+
+# Indexed by Terrain.  Ocean entries only matter for amphibious assaults.
+COMBAT_WIDTH = np.array([90, 84, 80, 75, 84, 78, 90, 96, 70], dtype=np.float64)
+TERRAIN_ATTACK = np.array(
+    [0.0, -0.15, -0.25, -0.5, -0.3, -0.4, 0.0, -0.3, -0.5], dtype=np.float64
+)
+assert len(COMBAT_WIDTH) == len(TERRAIN_ATTACK) == len(Terrain)
+
+SIDE_FIELDS = (
+    "soft_attack", "hard_attack", "defense", "breakthrough", "hardness",
+    "armor", "piercing", "width", "org", "strength",
+)
+ROW_FIELDS = (
+    "province", "attacker_country", "defender_country", "terrain", "river", *SIDE_FIELDS
+)
+
+
+@dataclass(slots=True)
+class BattleSide:
+    """Summed stats of every division on one side of a battle."""
+
+    soft_attack: float
+    hard_attack: float
+    defense: float
+    breakthrough: float
+    hardness: float
+    armor: float
+    piercing: float
+    width: float
+    org: float
+    strength: float
+
+
+def _hits(attacks: float, shield: float) -> float:
+    return SHIELDED_HIT_CHANCE * min(attacks, shield) + UNSHIELDED_HIT_CHANCE * max(
+        attacks - shield, 0.0
+    )
+
+
+def resolve_battle(
+    attacker: BattleSide,
+    defender: BattleSide,
+    terrain: int,
+    river: bool,
+    air: tuple[float, float] = (1.0, 1.0),
+) -> int:
+    """Scalar reference: apply one hour of combat in place, return the outcome."""
+    width = COMBAT_WIDTH[terrain]
+    sides = (attacker, defender)
+    attacks = []
+    shields = []
+    for s, side in enumerate(sides):
+        enemy = sides[1 - s]
+        frontage = min(1.0, width / side.width)
+        atk = side.soft_attack * (1.0 - enemy.hardness) + side.hard_attack * enemy.hardness
+        atk = atk * frontage
+        if s == 0:
+            atk = atk * (1.0 + TERRAIN_ATTACK[terrain] - (RIVER_PENALTY if river else 0.0))
+        if side.piercing < enemy.armor:
+            atk = atk * UNPIERCED_PENALTY
+        atk = atk * air[s]
+        attacks.append(atk)
+        shields.append((side.breakthrough if s == 0 else side.defense) * frontage)
+    for s, side in enumerate(sides):
+        hits = _hits(attacks[1 - s], shields[s])
+        side.org = max(side.org - hits * ORG_PER_HIT, 0.0)
+        side.strength = max(side.strength - hits * STRENGTH_PER_HIT, 0.0)
+    if defender.org <= 0.0 or defender.strength <= 0.0:
+        if attacker.org > 0.0 and attacker.strength > 0.0:
+            return ATTACKER_WON
+    if attacker.org <= 0.0 or attacker.strength <= 0.0:
+        return DEFENDER_WON
+    return ONGOING
+
+
+class BattleTable:
+    """Dense array table of active battles, at most one per province.
+
+    Battles are packed into rows ``[0, count)``; ending a battle moves the
+    last row into the freed slot, so row indices are not stable across
+    :meth:`end`.  Use :attr:`by_province` to look a battle up.
+    """
+
+    def __init__(self, capacity: int = 256) -> None:
+        self.count = 0
+        self.province = np.zeros(capacity, dtype=np.int32)
+        self.attacker_country = np.zeros(capacity, dtype=np.int16)
+        self.defender_country = np.zeros(capacity, dtype=np.int16)
+        self.terrain = np.zeros(capacity, dtype=np.uint8)
+        self.river = np.zeros(capacity, dtype=np.bool_)
+        for name in SIDE_FIELDS:
+            setattr(self, name, np.zeros((capacity, 2), dtype=np.float64))
+        self.by_province: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        return len(self.province)
+
+    def _grow(self) -> None:
+        new = self.capacity * 2
+        for name in ROW_FIELDS:
+            old = getattr(self, name)
+            grown = np.zeros((new, *old.shape[1:]), dtype=old.dtype)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+
+    def start(
+        self,
+        province: int,
+        attacker_country: int,
+        defender_country: int,
+        attacker: BattleSide,
+        defender: BattleSide,
+        terrain: int,
+        river: bool = False,
+    ) -> int:
+        if province in self.by_province:
+            raise ValueError(f"province {province} already has a battle")
+        if self.count == self.capacity:
+            self._grow()
+        row = self.count
+        self.count += 1
+        self.province[row] = province
+        self.attacker_country[row] = attacker_country
+        self.defender_country[row] = defender_country
+        self.terrain[row] = terrain
+        self.river[row] = river
+        for name in SIDE_FIELDS:
+            column = getattr(self, name)
+            column[row, 0] = getattr(attacker, name)
+            column[row, 1] = getattr(defender, name)
+        self.by_province[province] = row
+        return row
+
+    def side(self, row: int, s: int) -> BattleSide:
+        return BattleSide(*(float(getattr(self, name)[row, s]) for name in SIDE_FIELDS))
+
+    def end(self, row: int) -> None:
+        last = self.count - 1
+        del self.by_province[int(self.province[row])]
+        if row != last:
+            for name in ROW_FIELDS:
+                column = getattr(self, name)
+                column[row] = column[last]
+            self.by_province[int(self.province[row])] = row
+        self.count = last
+
+    def rows_of(self, provinces: np.ndarray) -> np.ndarray:
+        """Row of the battle in each of ``provinces``, every one of which must have one."""
+        active = self.province[: self.count]
+        order = np.argsort(active, kind="stable")
+        return order[np.searchsorted(active, provinces, sorter=order)]
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """The active rows of every column, by name."""
+        return {name: getattr(self, name)[: self.count] for name in ROW_FIELDS}
+
+    @classmethod
+    def from_columns(cls, columns: dict[str, np.ndarray]) -> BattleTable:
+        count = len(columns["province"])
+        table = cls(max(count, 256))
+        for name in ROW_FIELDS:
+            getattr(table, name)[:count] = columns[name]
+        table.count = count
+        table.by_province = {int(p): row for row, p in enumerate(table.province[:count])}
+        return table
+
+    def resolve_hour(self, air: np.ndarray | None = None) -> np.ndarray:
+        """Apply one hour to every active battle; return per-row outcomes.
+
+        ``air`` holds each side's attack multiplier per row from the air war
+        (and, for the attacker, forts), shape ``(count, 2)``.
+        """
+        n = self.count
+        if n == 0:
+            return np.zeros(0, dtype=np.int8)
+        terrain = self.terrain[:n]
+        enemy = slice(None, None, -1)
+        hardness = self.hardness[:n]
+        width = COMBAT_WIDTH[terrain][:, None]
+        frontage = np.minimum(1.0, width / self.width[:n])
+
+        attacks = (
+            self.soft_attack[:n] * (1.0 - hardness[:, enemy])
+            + self.hard_attack[:n] * hardness[:, enemy]
+        )
+        attacks = attacks * frontage
+        attacks[:, 0] = attacks[:, 0] * (
+            1.0 + TERRAIN_ATTACK[terrain] - np.where(self.river[:n], RIVER_PENALTY, 0.0)
+        )
+        unpierced = self.piercing[:n] < self.armor[:n, enemy]
+        attacks = np.where(unpierced, attacks * UNPIERCED_PENALTY, attacks)
+        if air is not None:
+            attacks = attacks * air
+
+        shields = np.empty((n, 2), dtype=np.float64)
+        shields[:, 0] = self.breakthrough[:n, 0]
+        shields[:, 1] = self.defense[:n, 1]
+        shields = shields * frontage
+
+        incoming = attacks[:, enemy]
+        hits = SHIELDED_HIT_CHANCE * np.minimum(incoming, shields) + UNSHIELDED_HIT_CHANCE * (
+            np.maximum(incoming - shields, 0.0)
+        )
+        org = self.org[:n]
+        strength = self.strength[:n]
+        np.maximum(org - hits * ORG_PER_HIT, 0.0, out=org)
+        np.maximum(strength - hits * STRENGTH_PER_HIT, 0.0, out=strength)
+
+        broken = (org <= 0.0) | (strength <= 0.0)
+        outcome = np.zeros(n, dtype=np.int8)
+        outcome[broken[:, 0]] = DEFENDER_WON
+        outcome[broken[:, 1] & ~broken[:, 0]] = ATTACKER_WON
+        return outcome
+
+
+def engage(
+    world: World,
+    province: int,
+    attackers: np.ndarray,
+    defenders: np.ndarray,
+    river: bool = False,
+) -> int:
+    """Start the battle for ``province`` between two groups of division IDs; return its row.
+
+    The attackers stop marching, and both sides are held in the battle
+    (:attr:`divisions.DivisionStore.battle`) until it ends.
+    """
+    attackers = np.asarray(attackers, dtype=np.int32)
+    defenders = np.asarray(defenders, dtype=np.int32)
+    if not len(attackers) or not len(defenders):
+        raise ValueError("a battle needs divisions on both sides")
+    divisions = world.divisions
+    stats = world.division_stats
+    row = world.battles.start(
+        province,
+        int(divisions.country[attackers[0]]),
+        int(divisions.country[defenders[0]]),
+        stats.side(attackers),
+        stats.side(defenders),
+        int(world.provinces.terrain[province]),
+        river,
+    )
+    divisions.halt(attackers)
+    divisions.halt(defenders)
+    divisions.battle[attackers] = province
+    divisions.battle[defenders] = province
+    return row
+
+
+def invade(world: World) -> int:
+    """Send divisions at an enemy border in; return how many provinces were taken.
+
+    Divisions that have covered the last hop into the enemy province they
+    were ordered to (:meth:`divisions.DivisionStore.at_border`) take it and
+    move in if none of its controller's divisions are there to hold it, and
+    otherwise attack those that are.  A province already fought over waits.
+    """
+    divisions = world.divisions
+    provinces = world.provinces
+    ready = divisions.at_border(provinces.controller)
+    if not len(ready):
+        return 0
+    targets = divisions.next_hop[ready]
+    taken = 0
+    for target in np.unique(targets).tolist():
+        if target in world.battles.by_province:
+            continue
+        attackers = ready[targets == target]
+        # One country goes in at a time: the lowest-numbered one there.
+        attackers = attackers[divisions.country[attackers] == divisions.country[attackers].min()]
+        enemy = int(provinces.controller[target])
+        present = divisions.at(target)
+        defenders = present[
+            (divisions.country[present] == enemy) & (divisions.battle[present] < 0)
+        ]
+        if len(defenders):
+            # Attacking across a river only if every attacker has to.
+            flags = provinces.adj_flags[
+                [provinces.edge_between(int(u), target) for u in divisions.location[attackers]]
+            ]
+            engage(world, target, attackers, defenders, river=bool((flags & EDGE_RIVER).all()))
+            continue
+        provinces.update(
+            "controller",
+            np.array([target]),
+            np.array([divisions.country[attackers[0]]], dtype=np.int16),
+        )
+        divisions.location[attackers] = target
+        divisions.halt(attackers)
+        taken += 1
+    return taken
+
+
+def seed_border_battles(world: World, count: int, rng: np.random.Generator) -> int:
+    """Start up to ``count`` battles across random land borders (test scenarios).
+
+    Each side is one to five freshly raised divisions of random templates.
+    """
+    provinces = world.provinces
+    divisions = world.divisions
+    contested = np.flatnonzero(provinces.contested_edges())
+    rng.shuffle(contested)
+    started = 0
+    for edge in contested:
+        if started == count:
+            break
+        src = int(provinces.adj_sources[edge])
+        dst = int(provinces.adj_targets[edge])
+        if dst in world.battles.by_province:
+            continue
+        sides = []
+        for location in (src, dst):
+            template = int(rng.integers(len(divisions.templates)))
+            stack = np.full(int(rng.integers(1, 6)), location, dtype=np.int32)
+            country = int(provinces.controller[location])
+            sides.append(divisions.spawn_many(country, template, stack))
+        engage(world, dst, *sides, river=bool(provinces.adj_flags[edge] & EDGE_RIVER))
+        started += 1
+    return started
+
+
+def _ratio(after: np.ndarray, before: np.ndarray) -> np.ndarray:
+    return np.divide(after, before, out=np.ones_like(after), where=before > 0.0)
+
+
+def _retreat(world: World, province: int, country: int) -> int:
+    """A land neighbour of ``province`` that ``country`` controls, or -1."""
+    provinces = world.provinces
+    neighbors = provinces.neighbors(province)
+    held = neighbors[(provinces.controller[neighbors] == country) & ~provinces.is_sea[neighbors]]
+    return int(held.min()) if len(held) else -1
+
+
+def combat_system(world: World) -> None:
+    """Hourly system: resolve every battle, book losses, hand won provinces over."""
+    battles = world.battles
+    n = battles.count
+    if n == 0:
+        return
+    before = battles.strength[:n].copy()
+    org_before = battles.org[:n].copy()
+    province = battles.province[:n]
+    air = np.stack(
+        [
+            world.air.modifiers_at(province, battles.attacker_country[:n]),
+            world.air.modifiers_at(province, battles.defender_country[:n]),
+        ],
+        axis=1,
+    )
+    # Forts blunt the attack on the province as well.
+    air[:, 0] *= world.buildings.fort_modifier(province)
+    outcome = battles.resolve_hour(air)
+    lost = before - battles.strength[:n]
+    np.add.at(world.casualties, battles.attacker_country[:n], lost[:, 0])
+    np.add.at(world.casualties, battles.defender_country[:n], lost[:, 1])
+
+    # Each division loses its side's share of organisation and strength.
+    divisions = world.divisions
+    ids = divisions.in_battle()
+    rows = battles.rows_of(divisions.battle[ids])
+    side = (divisions.country[ids] != battles.attacker_country[rows]).astype(np.intp)
+    strength = _ratio(battles.strength[:n], before)[rows, side]
+    divisions.strength[ids] *= strength
+    divisions.equipment_fill[ids] *= strength
+    divisions.org[ids] *= _ratio(battles.org[:n], org_before)[rows, side]
+
+    finished = np.flatnonzero(outcome)
+    if not len(finished):
+        return
+    won = finished[outcome[finished] == ATTACKER_WON]
+    divisions.release(battles.province[finished])
+    world.provinces.update("controller", battles.province[won], battles.attacker_country[won])
+    ending = np.isin(rows, finished)
+    dead = []
+    for row in finished.tolist():
+        mine = ending & (rows == row)
+        target = int(battles.province[row])
+        if outcome[row] == ATTACKER_WON:
+            divisions.location[ids[mine & (side == 0)]] = target
+            # Everything of the defender's still in the province falls back, not just
+            # the divisions that fought.
+            defender = int(battles.defender_country[row])
+            present = divisions.at(target)
+            beaten = present[divisions.country[present] == defender]
+            fallback = _retreat(world, target, defender)
+            if fallback < 0:
+                dead.append(beaten)
+            else:
+                divisions.location[beaten] = fallback
+        dead.append(ids[mine & (divisions.strength[ids] <= 0.0)])
+    dead = np.unique(np.concatenate(dead))
+    if len(dead):
+        divisions.disband_many(dead)
+    # End from the highest row down so swap-removal never moves a pending row.
+    for row in finished[::-1]:
+        battles.end(int(row))
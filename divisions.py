@@ -0,0 +1,517 @@
+"""Division storage: shared templates and per-division state in typed arrays.
+
+A division is an integer ID into :class:`DivisionStore`.  What every division
+of a design has in common (attack, defense, width, organisation and strength
+at full establishment, the equipment it needs) lives once in its
+:class:`DivisionTemplate`.  The templates are also stacked into one float
+table so a batch of divisions looks its stats up with a single fancy index.
+Each division keeps only its mutable state, one slot in each column:
+country, template, location, strength, organisation and equipment fill,
+the battle it is fighting (by province, since battle rows move), and for a
+division under orders its destination, the next province on its way there
+and the distance left to it.
+
+Movement (:meth:`DivisionStore.advance`) takes one hop at a time: a division
+covers its template speed in km per hour of the terrain-weighted edge cost
+to the next province.  Divisions without a route are routed together, one
+:meth:`pathfinding.Pathfinder.routes` search per destination, and keep the
+route they are given; on arrival a division just takes the next province of
+it, as long as the pathfinder still holds the route (a change of control or
+passability along it evicts it, and the division is routed again from where
+it stands).  Routes are not saved: the rest of a held route is what a new
+search from the division's province returns, so a loaded game marches the
+same way.  Divisions only ever step into provinces their country controls.
+One ordered into an enemy province (given the ``hostile`` matrix) marches
+up to its border and waits there with its last hop covered;
+:func:`combat.invade` then takes the province if nobody holds it, or starts
+the battle for it.
+
+IDs are stable for a division's lifetime, unlike the swap-removed rows of
+:class:`combat.BattleTable`.  A disbanded division's ID goes on a free-list
+(itself an ``int32`` array) and is handed to the next division raised, and
+the columns double only when the free-list is empty.  There are no Python
+objects per division, so raising, fighting and disbanding thousands of them
+allocates nothing the garbage collector has to track or traverse: 5,000
+divisions are about 270 KB of columns.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, fields
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+
+from combat import BattleSide, invade
+from production import Equipment
+
+if TYPE_CHECKING:
+    from pathfinding import Pathfinder, Route
+    from world import World
+
+
+@dataclass(frozen=True, slots=True)
+class DivisionTemplate:
+    name: str
+    soft_attack: float
+    hard_attack: float
+    defense: float
+    breakthrough: float
+    hardness: float
+    armor: float
+    piercing: float
+    width: float
+    max_org: float
+    max_strength: float
+    speed: float  # km/h
+    # Equipment units at full establishment, as (Equipment, amount) pairs.
+    equipment: tuple[tuple[int, float], ...] = ()
+
+
+STAT_FIELDS = tuple(f.name for f in fields(DivisionTemplate) if f.name not in ("name", "equipment"))
+_STAT = {name: i for i, name in enumerate(STAT_FIELDS)}
+
+STANDARD_TEMPLATES = (
+    DivisionTemplate(
+        "Infantry Division", soft_attack=50, hard_attack=4, defense=180, breakthrough=20,
+        hardness=0.0, armor=0, piercing=5, width=18, max_org=60, max_strength=25, speed=4,
+        equipment=((Equipment.INFANTRY_EQUIPMENT, 900), (Equipment.SUPPORT_EQUIPMENT, 20)),
+    ),
+    DivisionTemplate(
+        "Motorized Division", soft_attack=55, hard_attack=6, defense=170, breakthrough=35,
+        hardness=0.1, armor=0, piercing=8, width=18, max_org=55, max_strength=25, speed=12,
+        equipment=((Equipment.INFANTRY_EQUIPMENT, 700), (Equipment.MOTORIZED, 200)),
+    ),
+    DivisionTemplate(
+        "Armored Division", soft_attack=110, hard_attack=40, defense=90, breakthrough=160,
+        hardness=0.7, armor=45, piercing=50, width=30, max_org=35, max_strength=30, speed=10,
+        equipment=((Equipment.MEDIUM_TANK, 250), (Equipment.MOTORIZED, 150)),
+    ),
+)
+
+# A country raises one infantry division per this many military factories.
+FACTORIES_PER_DIVISION = 2
+REINFORCE_RATE = 0.1  # strength regained per day, as a share of full strength
+ORG_RECOVERY = 0.3  # organisation regained per day out of battle, as a share of max_org
+
+COLUMN_FIELDS = (
+    "alive", "country", "template", "location", "strength", "org", "equipment_fill",
+    "battle", "destination", "next_hop", "move_left",
+)
+
+
+class DivisionStore:
+    def __init__(self, capacity: int = 1024) -> None:
+        self.alive = np.zeros(capacity, dtype=np.bool_)
+        self.country = np.zeros(capacity, dtype=np.int16)
+        self.template = np.zeros(capacity, dtype=np.int16)
+        self.location = np.zeros(capacity, dtype=np.int32)
+        self.strength = np.zeros(capacity, dtype=np.float32)
+        self.org = np.zeros(capacity, dtype=np.float32)
+        self.equipment_fill = np.zeros(capacity, dtype=np.float32)
+        # Province of the battle the division is in, -1 when not fighting.
+        self.battle = np.zeros(capacity, dtype=np.int32)
+        # Ordered destination and next province on the way, -1 when not moving;
+        # move_left is the edge cost still to cover to next_hop.
+        self.destination = np.zeros(capacity, dtype=np.int32)
+        self.next_hop = np.zeros(capacity, dtype=np.int32)
+        self.move_left = np.zeros(capacity, dtype=np.float32)
+        # IDs in [0, high_water) have been used; freed ones sit on the free-list.
+        self.high_water = 0
+        self._free = np.zeros(64, dtype=np.int32)
+        self._n_free = 0
+        self._listeners: list[Callable[[np.ndarray], None]] = []
+        # Route of each division under orders and the index of its province on it.
+        self._routes: dict[int, tuple[Route, int]] = {}
+
+        self.templates: list[DivisionTemplate] = []
+        self.template_stats = np.zeros((0, len(STAT_FIELDS)), dtype=np.float64)
+        self.template_equipment = np.zeros((0, len(Equipment)), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.high_water - self._n_free
+
+    @property
+    def capacity(self) -> int:
+        return len(self.alive)
+
+    @property
+    def nbytes(self) -> int:
+        columns = sum(getattr(self, name).nbytes for name in COLUMN_FIELDS)
+        return columns + self._free.nbytes + self.template_stats.nbytes
+
+    @classmethod
+    def starting(
+        cls, capitals: np.ndarray, military_factories: np.ndarray
+    ) -> DivisionStore:
+        """The standard templates and an infantry army at every capital."""
+        store = cls()
+        for template in STANDARD_TEMPLATES:
+            store.add_template(template)
+        for country, capital in enumerate(capitals.tolist()):
+            count = 1 + int(military_factories[country]) // FACTORIES_PER_DIVISION
+            store.spawn_many(country, 0, np.full(count, capital, dtype=np.int32))
+        return store
+
+    # -- templates ---------------------------------------------------------
+
+    def add_template(self, template: DivisionTemplate) -> int:
+        stats = np.array([[getattr(template, name) for name in STAT_FIELDS]], dtype=np.float64)
+        need = np.zeros((1, len(Equipment)), dtype=np.float64)
+        for equipment, amount in template.equipment:
+            need[0, equipment] = amount
+        self.templates.append(template)
+        self.template_stats = np.vstack([self.template_stats, stats])
+        self.template_equipment = np.vstack([self.template_equipment, need])
+        return len(self.templates) - 1
+
+    def stat(self, name: str, ids: np.ndarray | int) -> np.ndarray:
+        """Template stat ``name`` of each division in ``ids``."""
+        return self.template_stats[self.template[ids], _STAT[name]]
+
+    # -- allocation --------------------------------------------------------
+
+    def _grow(self, needed: int) -> None:
+        new = self.capacity
+        while new < needed:
+            new *= 2
+        for name in COLUMN_FIELDS:
+            old = getattr(self, name)
+            grown = np.zeros(new, dtype=old.dtype)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+
+    def _allocate(self, count: int) -> np.ndarray:
+        reused = min(count, self._n_free)
+        ids = np.empty(count, dtype=np.int32)
+        # Most recently freed first: their column slots are the likeliest cached.
+        ids[:reused] = self._free[self._n_free - reused : self._n_free][::-1]
+        self._n_free -= reused
+        fresh = count - reused
+        if fresh:
+            if self.high_water + fresh > self.capacity:
+                self._grow(self.high_water + fresh)
+            ids[reused:] = np.arange(self.high_water, self.high_water + fresh, dtype=np.int32)
+            self.high_water += fresh
+        return ids
+
+    def spawn_many(self, country: int, template: int, locations: np.ndarray) -> np.ndarray:
+        """Raise one division per entry of ``locations``, at full strength; return the IDs."""
+        if not 0 <= template < len(self.templates):
+            raise ValueError(f"template {template} is not in 0..{len(self.templates) - 1}")
+        ids = self._allocate(len(locations))
+        stats = self.template_stats[template]
+        self.alive[ids] = True
+        self.country[ids] = country
+        self.template[ids] = template
+        self.location[ids] = locations
+        self.strength[ids] = stats[_STAT["max_strength"]]
+        self.org[ids] = stats[_STAT["max_org"]]
+        self.equipment_fill[ids] = 1.0
+        self.battle[ids] = -1
+        self.destination[ids] = -1
+        self.next_hop[ids] = -1
+        self.move_left[ids] = 0.0
+        return ids
+
+    def spawn(self, country: int, template: int, location: int) -> int:
+        return int(self.spawn_many(country, template, np.array([location], dtype=np.int32))[0])
+
+    def disband_many(self, ids: np.ndarray) -> None:
+        ids = np.asarray(ids, dtype=np.int32)
+        if not self.alive[ids].all() or len(np.unique(ids)) != len(ids):
+            raise ValueError("only living divisions can be disbanded, each once")
+        self.alive[ids] = False
+        end = self._n_free + len(ids)
+        if end > len(self._free):
+            grown = np.zeros(max(end, 2 * len(self._free)), dtype=np.int32)
+            grown[: self._n_free] = self._free[: self._n_free]
+            self._free = grown
+        self._free[self._n_free : end] = ids
+        self._n_free = end
+        if self._routes:
+            for division in ids.tolist():
+                self._routes.pop(division, None)
+        for callback in self._listeners:
+            callback(ids)
+
+    def disband(self, division: int) -> None:
+        self.disband_many(np.array([division], dtype=np.int32))
+
+    def subscribe(self, callback: Callable[[np.ndarray], None]) -> None:
+        """Call ``callback(ids)`` after :meth:`disband_many` frees ``ids`` for reuse."""
+        self._listeners.append(callback)
+
+    # -- queries -----------------------------------------------------------
+
+    def ids(self) -> np.ndarray:
+        """Every living division."""
+        return np.flatnonzero(self.alive[: self.high_water]).astype(np.int32)
+
+    def ids_of(self, country: int) -> np.ndarray:
+        n = self.high_water
+        return np.flatnonzero(self.alive[:n] & (self.country[:n] == country)).astype(np.int32)
+
+    def at(self, province: int) -> np.ndarray:
+        n = self.high_water
+        return np.flatnonzero(self.alive[:n] & (self.location[:n] == province)).astype(np.int32)
+
+    def fighting(self, province: int) -> np.ndarray:
+        """Living divisions in the battle for ``province``."""
+        n = self.high_water
+        return np.flatnonzero(self.alive[:n] & (self.battle[:n] == province)).astype(np.int32)
+
+    def in_battle(self) -> np.ndarray:
+        """Living divisions held in any battle."""
+        n = self.high_water
+        return np.flatnonzero(self.alive[:n] & (self.battle[:n] >= 0)).astype(np.int32)
+
+    def release(self, provinces: np.ndarray) -> np.ndarray:
+        """Take every division out of the battles for ``provinces``; return their IDs."""
+        n = self.high_water
+        ids = np.flatnonzero(self.alive[:n] & np.isin(self.battle[:n], provinces))
+        self.battle[ids] = -1
+        return ids.astype(np.int32)
+
+    def counts(self, n_countries: int) -> np.ndarray:
+        """Living divisions per country."""
+        n = self.high_water
+        return np.bincount(self.country[:n][self.alive[:n]], minlength=n_countries)
+
+    def side(self, ids: np.ndarray, stats: np.ndarray | None = None) -> BattleSide:
+        """Combined battle stats of ``ids``.
+
+        Attack and defense scale with each division's strength and equipment
+        fill; hardness, armor and piercing are width-weighted means.
+        ``stats`` are per-division effective stats (see :mod:`unitstats`);
+        the template's base stats are used without them.
+        """
+        ids = np.asarray(ids, dtype=np.int32)
+        base = self.template_stats[self.template[ids]]
+        stats = base if stats is None else stats
+        strength = self.strength[ids].astype(np.float64)
+        readiness = strength / base[:, _STAT["max_strength"]] * self.equipment_fill[ids]
+        width = stats[:, _STAT["width"]]
+        total_width = float(width.sum())
+
+        def scaled(name: str) -> float:
+            return float((stats[:, _STAT[name]] * readiness).sum())
+
+        def mean(name: str) -> float:
+            return float((stats[:, _STAT[name]] * width).sum() / total_width)
+
+        return BattleSide(
+            soft_attack=scaled("soft_attack"),
+            hard_attack=scaled("hard_attack"),
+            defense=scaled("defense"),
+            breakthrough=scaled("breakthrough"),
+            hardness=mean("hardness"),
+            armor=mean("armor"),
+            piercing=mean("piercing"),
+            width=total_width,
+            org=float(self.org[ids].sum()),
+            strength=float(strength.sum()),
+        )
+
+    # -- movement ----------------------------------------------------------
+
+    def move(self, ids: np.ndarray, destination: int) -> None:
+        """Order ``ids`` to ``destination``; they set off on the next :meth:`advance`."""
+        ids = np.asarray(ids, dtype=np.int32)
+        if not self.alive[ids].all():
+            raise ValueError("only living divisions can be given orders")
+        changed = ids[self.destination[ids] != destination]
+        self.destination[changed] = destination
+        self.next_hop[changed] = -1
+        self.move_left[changed] = 0.0
+
+    def halt(self, ids: np.ndarray) -> None:
+        """Cancel the orders of ``ids``; they stay in the province they are in."""
+        self.destination[ids] = -1
+        self.next_hop[ids] = -1
+        self.move_left[ids] = 0.0
+        for division in np.atleast_1d(ids).tolist():
+            self._routes.pop(division, None)
+
+    def moving(self) -> np.ndarray:
+        """Living divisions under orders and not held in a battle."""
+        n = self.high_water
+        free = self.alive[:n] & (self.battle[:n] < 0)
+        return np.flatnonzero(free & (self.destination[:n] >= 0)).astype(np.int32)
+
+    def advance(
+        self,
+        pathfinder: Pathfinder,
+        controller: np.ndarray,
+        hours: float = 1.0,
+        hostile: np.ndarray | None = None,
+    ) -> int:
+        """Move every division under orders for ``hours``; return how many arrived somewhere.
+
+        A division whose next province fell to another controller stops
+        where it is and is routed again; one whose route is gone (or ends in
+        a province it does not control) halts.  With ``hostile``, the
+        ``(countries, countries)`` war matrix, a route may end in an enemy
+        province: the division covers the last hop but stays where it is,
+        at the border, for :meth:`at_border` to report.
+        """
+        moving = self.moving()
+        if len(moving) == 0:
+            return 0
+        hop = self.next_hop[moving]
+        held = controller[np.maximum(hop, 0)]
+        lost = (hop >= 0) & (held != self.country[moving])
+        lost &= ~self._enemy_goal(moving, hop, held, hostile)
+        self.next_hop[moving[lost]] = -1
+        stepping = moving[self.next_hop[moving] >= 0]
+        self.move_left[stepping] -= self.stat("speed", stepping) * hours
+        arrived = stepping[self.move_left[stepping] <= 0.0]
+        self.move_left[arrived] = 0.0
+        arrived = arrived[controller[self.next_hop[arrived]] == self.country[arrived]]
+        self.location[arrived] = self.next_hop[arrived]
+        self.next_hop[arrived] = -1
+        unrouted: dict[int, list[int]] = {}
+        for d in moving[self.next_hop[moving] < 0].tolist():
+            here, goal = int(self.location[d]), int(self.destination[d])
+            route_held = self._routes.pop(d, None)
+            if here == goal:
+                self.destination[d] = -1
+                continue
+            if route_held is not None:
+                route, leg = route_held
+                # A retreat or a new order leaves the division off its route.
+                if route[leg] == here and route[-1] == goal and pathfinder.holds(route):
+                    self._set_off(d, route, leg, pathfinder, controller, hostile)
+                    continue
+            unrouted.setdefault(goal, []).append(d)
+        for goal, ids in unrouted.items():
+            routes = pathfinder.routes(self.location[ids].tolist(), goal)
+            for d, route in zip(ids, routes):
+                if route is None:
+                    self.destination[d] = -1
+                else:
+                    self._set_off(d, route, 0, pathfinder, controller, hostile)
+        return len(arrived)
+
+    def _enemy_goal(
+        self, ids: np.ndarray, hop: np.ndarray, held: np.ndarray, hostile: np.ndarray | None
+    ) -> np.ndarray:
+        """Whether each next ``hop`` is the destination and ``held`` by an enemy."""
+        if hostile is None:
+            return np.zeros(len(ids), dtype=np.bool_)
+        goal = (hop >= 0) & (hop == self.destination[ids]) & (held >= 0)
+        return goal & hostile[self.country[ids], np.maximum(held, 0)]
+
+    def _set_off(
+        self,
+        division: int,
+        route: Route,
+        leg: int,
+        pathfinder: Pathfinder,
+        controller: np.ndarray,
+        hostile: np.ndarray | None,
+    ) -> None:
+        """Send ``division`` from ``route[leg]`` on to the next province of ``route``."""
+        here, ahead = route[leg], route[leg + 1]
+        ids, hop = np.array([division]), np.array([ahead])
+        held = controller[hop]
+        if held[0] != self.country[division] and not self._enemy_goal(ids, hop, held, hostile)[0]:
+            self.destination[division] = -1
+            return
+        self._routes[division] = (route, leg + 1)
+        self.next_hop[division] = ahead
+        self.move_left[division] = pathfinder.step_cost(here, ahead)
+
+    def at_border(self, controller: np.ndarray) -> np.ndarray:
+        """Divisions that have covered the last hop into the enemy province they are ordered to."""
+        moving = self.moving()
+        hop = self.next_hop[moving]
+        ready = (hop >= 0) & (self.move_left[moving] <= 0.0)
+        ready &= controller[np.maximum(hop, 0)] != self.country[moving]
+        return moving[ready]
+
+    # -- daily reinforcement -----------------------------------------------
+
+    def reinforce(self, stockpile: np.ndarray) -> None:
+        """Refill equipment from the ``(countries, equipment)`` stockpile, then strength.
+
+        Only divisions out of battle are reinforced, and they recover
+        organisation as well.  Each country's stockpile is shared pro rata
+        to what its divisions lack; a division's fill rises by the scarcest
+        equipment it needs.
+        """
+        n = self.high_water
+        ids = np.flatnonzero(self.alive[:n] & (self.battle[:n] < 0)).astype(np.int32)
+        if len(ids) == 0:
+            return
+        max_org = self.template_stats[self.template[ids], _STAT["max_org"]]
+        self.org[ids] = np.minimum(self.org[ids] + ORG_RECOVERY * max_org, max_org)
+        n_equipment = stockpile.shape[1]
+        need = self.template_equipment[self.template[ids]]
+        fill = self.equipment_fill[ids].astype(np.float64)
+        missing = need * (1.0 - fill)[:, None]
+        country = self.country[ids].astype(np.intp)
+        flat = country[:, None] * n_equipment + np.arange(n_equipment)
+        wanted = np.bincount(flat.ravel(), weights=missing.ravel(), minlength=stockpile.size)
+        share = np.divide(
+            np.minimum(stockpile.reshape(-1), wanted),
+            wanted,
+            out=np.ones_like(wanted),
+            where=wanted > 0,
+        )
+        limit = np.where(need > 0, share[flat], 1.0).min(axis=1)
+        gained = (1.0 - fill) * limit
+        stockpile.reshape(-1)[:] -= np.bincount(
+            flat.ravel(), weights=(need * gained[:, None]).ravel(), minlength=stockpile.size
+        )
+        np.maximum(stockpile, 0.0, out=stockpile)  # rounding must not leave -1e-12
+        self.equipment_fill[ids] = fill + gained
+        full = self.template_stats[self.template[ids], _STAT["max_strength"]]
+        target = full * self.equipment_fill[ids]
+        strength = self.strength[ids]
+        self.strength[ids] = np.maximum(
+            strength, np.minimum(strength + REINFORCE_RATE * full, target)
+        )
+
+    # -- persistence -------------------------------------------------------
+
+    def template_meta(self) -> list[dict[str, Any]]:
+        """Templates as JSON-ready dicts, for save-game metadata."""
+        return [asdict(template) for template in self.templates]
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Every used slot of every column, and the free-list, by name."""
+        columns = {name: getattr(self, name)[: self.high_water] for name in COLUMN_FIELDS}
+        columns["free"] = self._free[: self._n_free]
+        return columns
+
+    @classmethod
+    def from_columns(
+        cls, templates: list[dict[str, Any]], columns: dict[str, np.ndarray]
+    ) -> DivisionStore:
+        used = len(columns["alive"])
+        store = cls(max(used, 1024))
+        for template in templates:
+            equipment = tuple((int(e), a) for e, a in template["equipment"])
+            store.add_template(DivisionTemplate(**dict(template, equipment=equipment)))
+        for name in COLUMN_FIELDS:
+            getattr(store, name)[:used] = columns[name]
+        store.high_water = used
+        free = columns["free"]
+        store._free = np.zeros(max(len(free), 64), dtype=np.int32)
+        store._free[: len(free)] = free
+        store._n_free = len(free)
+        return store
+
+
+def reinforcement_system(world: World) -> None:
+    """Daily system: re-equip and reinforce divisions out of battle from the stockpile."""
+    world.divisions.reinforce(world.production.stockpile)
+
+
+def movement_system(world: World) -> None:
+    """Hourly system: march every division under orders along its route, then invade."""
+    world.divisions.advance(
+        world.pathfinder, world.provinces.controller, hostile=world.fronts.hostile
+    )
+    invade(world)
@@ -0,0 +1,369 @@
+"""Trigger evaluation for events, focuses and decisions.
+
+Trigger scripts (``trigger = { ... }`` blocks from :mod:`script`) compile into
+plain Python closures ``predicate(world, country) -> bool``.  While
+compiling, every leaf condition reports the world-state *input keys* it
+reads, e.g. ``("controller", 1234)`` for ``controls_province = 1234`` or
+``("territory",)`` for ``num_of_controlled_provinces > 50``.
+
+:class:`TriggerEngine` keeps an index from input key to the triggers that
+read it and a dirty flag per (trigger, country).  Province updates, combat
+losses and the calendar invalidate only the keys they touch, and the daily
+pass re-evaluates just the dirty pairs; everything else keeps its cached
+result.  Date conditions are scheduled for the day their answer can change
+instead of being polled.
+
+Single-element keys (``("territory",)``, ``("casualties",)``,
+``("capital",)``) read the evaluating country's own value and are
+invalidated only for the countries whose value changed; keys naming a
+province, state or day are global and dirty every country.
+
+Supported conditions (country scope)::
+
+    always = yes|no
+    tag = <country id>
+    date > 1939.9.1                       (also <, >=, <=)
+    has_capital = yes|no                  controls its own capital
+    controls_province = <province id>
+    controls_state = <state id>           every province of the state
+    num_of_controlled_provinces > N
+    controlled_victory_points > N
+    casualties > N
+    AND|OR|NOT = { ... }
+
+As in the original game, ``=`` on a numeric condition means ``>=``, and
+``date = X`` likewise holds from day ``X`` on.  The yes/no and identity
+conditions (``always``, ``tag``, ``has_capital``, ``controls_province``,
+``controls_state``) take ``=`` only; any other operator is a
+:class:`TriggerSyntaxError`.
+"""
+
+from __future__ import annotations
+
+import heapq
+import operator
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+from profiling import EVENT, span
+from scheduler import GameClock
+from script import Block
+
+if TYPE_CHECKING:
+    from world import World
+
+Predicate = Callable[["World", int], bool]
+InputKey = tuple
+
+# Conditions that are true or false rather than compared with a number.
+_EQUALS_ONLY = frozenset({"always", "tag", "has_capital", "controls_province", "controls_state"})
+_COMPARE = {
+    "=": operator.ge,
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+}
+
+
+class TriggerSyntaxError(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class CompiledTrigger:
+    predicate: Predicate
+    inputs: frozenset[InputKey]
+
+
+def _date_hour(value: object) -> int:
+    try:
+        year, month, day = (int(part) for part in str(value).split("."))
+    except ValueError:
+        raise TriggerSyntaxError(f"bad date {value!r}, expected YYYY.M.D") from None
+    return GameClock.hours_until(datetime(year, month, day))
+
+
+def _compile_leaf(key: str, op: str, value: object) -> tuple[Predicate, set[InputKey]]:
+    compare = _COMPARE.get(op)
+    if compare is None or (key in _EQUALS_ONLY and op != "="):
+        raise TriggerSyntaxError(f"unsupported operator {op!r} in {key}")
+
+    if key == "always":
+        result = bool(value)
+        return (lambda world, country: result), set()
+    if key == "tag":
+        tag = int(value)
+        return (lambda world, country: country == tag), set()
+    if key == "date":
+        hour = _date_hour(value)
+        return (lambda world, country: compare(world.clock.hour, hour)), {("date", hour // 24)}
+    if key == "has_capital":
+        wanted = bool(value)
+
+        def has_capital(world: World, country: int) -> bool:
+            held = world.provinces.controller[world.capitals[country]] == country
+            return bool(held) == wanted
+
+        return has_capital, {("capital",)}
+    if key == "controls_province":
+        province = int(value)
+        return (
+            lambda world, country: bool(world.provinces.controller[province] == country)
+        ), {("controller", province)}
+    if key == "controls_state":
+        state = int(value)
+
+        def controls_state(world: World, country: int) -> bool:
+            members = world.triggers.state_members(state)
+            return bool(len(members)) and bool(
+                (world.provinces.controller[members] == country).all()
+            )
+
+        return controls_state, {("state_controller", state)}
+    if key == "num_of_controlled_provinces":
+        threshold = int(value)
+        return (
+            lambda world, country: compare(int(world.triggers.territory[country]), threshold)
+        ), {("territory",)}
+    if key == "controlled_victory_points":
+        threshold = int(value)
+        return (
+            lambda world, country: compare(int(world.triggers.victory_points[country]), threshold)
+        ), {("territory",)}
+    if key == "casualties":
+        threshold = float(value)
+        return (
+            lambda world, country: compare(float(world.casualties[country]), threshold)
+        ), {("casualties",)}
+    raise TriggerSyntaxError(f"unknown trigger {key!r}")
+
+
+def _compile_block(block: Block, mode: str) -> tuple[Predicate, set[InputKey]]:
+    parts: list[Predicate] = []
+    inputs: set[InputKey] = set()
+    for key, op, value in block:
+        if key is None:
+            raise TriggerSyntaxError(f"bare value {value!r} in trigger")
+        if key in ("AND", "OR", "NOT"):
+            if not isinstance(value, Block):
+                raise TriggerSyntaxError(f"{key} needs a block")
+            predicate, keys = _compile_block(value, key)
+        else:
+            predicate, keys = _compile_leaf(key, op, value)
+        parts.append(predicate)
+        inputs |= keys
+
+    if mode == "OR":
+        def combined(world: World, country: int) -> bool:
+            return any(p(world, country) for p in parts)
+    elif mode == "NOT":
+        # NOT = { a b } is NOT (a AND b), as in the original scripts.
+        def combined(world: World, country: int) -> bool:
+            return not all(p(world, country) for p in parts)
+    elif len(parts) == 1:
+        combined = parts[0]
+    else:
+        def combined(world: World, country: int) -> bool:
+            return all(p(world, country) for p in parts)
+    return combined, inputs
+
+
+def compile_trigger(block: Block) -> CompiledTrigger:
+    predicate, inputs = _compile_block(block, "AND")
+    return CompiledTrigger(predicate, frozenset(inputs))
+
+
+@dataclass(slots=True)
+class Trigger:
+    name: str
+    compiled: CompiledTrigger
+    once: bool
+    on_fire: Callable[[World, int], None] | None
+
+
+class TriggerEngine:
+    """Dirty-flag cache of trigger results, one row per trigger, one column per country."""
+
+    def __init__(self, world: World, capacity: int = 64) -> None:
+        self.world = world
+        n = world.n_countries
+        self.triggers: list[Trigger] = []
+        self.index: dict[InputKey, list[int]] = {}
+        self.dirty = np.zeros((capacity, n), dtype=bool)
+        self.result = np.zeros((capacity, n), dtype=bool)
+        self.fired = np.zeros((capacity, n), dtype=bool)
+        # (hour, trigger name, country) for every firing, in order.
+        self.log: list[tuple[int, str, int]] = []
+        self.checks = 0
+        self.days = 0
+
+        provinces = world.provinces
+        self.territory = provinces.province_counts(n, controlled=True)
+        self.victory_points = provinces.victory_points_by_country(n)
+        self._controller = provinces.controller.copy()
+        self._casualties = world.casualties.copy()
+        self._state_order = np.argsort(provinces.state, kind="stable")
+        self._state_start = np.searchsorted(
+            provinces.state[self._state_order], np.arange(int(provinces.state.max()) + 2)
+        )
+        self._capital_of = {int(p): c for c, p in enumerate(world.capitals)}
+        # (day, key) wake-ups for date conditions.
+        self._wakeups: list[tuple[int, InputKey]] = []
+        # name -> (result, fired) rows restored from a save, applied on add().
+        self._restored: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        provinces.subscribe("controller", self._on_control_changed)
+
+    def __len__(self) -> int:
+        return len(self.triggers)
+
+    # -- registration ------------------------------------------------------
+
+    def _grow(self) -> None:
+        for name in ("dirty", "result", "fired"):
+            old = getattr(self, name)
+            grown = np.zeros((len(old) * 2, old.shape[1]), dtype=bool)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+
+    def add(
+        self,
+        name: str,
+        trigger: Block | CompiledTrigger,
+        once: bool = True,
+        on_fire: Callable[[World, int], None] | None = None,
+    ) -> int:
+        compiled = compile_trigger(trigger) if isinstance(trigger, Block) else trigger
+        tid = len(self.triggers)
+        if tid == len(self.dirty):
+            self._grow()
+        self.triggers.append(Trigger(name, compiled, once, on_fire))
+        for key in compiled.inputs:
+            if key[0] == "date" and key not in self.index:
+                # Strict and inclusive comparisons flip on consecutive days.
+                heapq.heappush(self._wakeups, (key[1], key))
+                heapq.heappush(self._wakeups, (key[1] + 1, key))
+            self.index.setdefault(key, []).append(tid)
+        self.dirty[tid] = True
+        restored = self._restored.pop(name, None)
+        if restored is not None:
+            self.result[tid], self.fired[tid] = restored
+        return tid
+
+    def add_events(self, scripts: Block) -> int:
+        """Register every ``country_event = { id = ... trigger = { ... } }``."""
+        added = 0
+        for key, _, event in scripts:
+            if key != "country_event" or not isinstance(event, Block):
+                continue
+            trigger = event.get("trigger", Block())
+            self.add(str(event.get("id")), trigger, once=bool(event.get("fire_only_once", True)))
+            added += 1
+        return added
+
+    def state(self) -> tuple[list[str], np.ndarray, np.ndarray]:
+        """Trigger names with their cached results and fired flags, for saving."""
+        n = len(self.triggers)
+        return [t.name for t in self.triggers], self.result[:n].copy(), self.fired[:n].copy()
+
+    def restore(self, names: list[str], result: np.ndarray, fired: np.ndarray) -> None:
+        """Reapply saved results and fired flags as triggers are (re-)registered."""
+        for i, name in enumerate(names):
+            self._restored[name] = (np.array(result[i]), np.array(fired[i]))
+        for tid, trigger in enumerate(self.triggers):
+            restored = self._restored.pop(trigger.name, None)
+            if restored is not None:
+                self.result[tid], self.fired[tid] = restored
+
+    # -- invalidation ------------------------------------------------------
+
+    def invalidate(self, key: InputKey, countries: np.ndarray | list[int] | None = None) -> None:
+        rows = self.index.get(key)
+        if not rows:
+            return
+        if countries is None:
+            self.dirty[rows, :] = True
+        else:
+            self.dirty[np.ix_(rows, np.asarray(countries, dtype=np.intp))] = True
+
+    def state_members(self, state: int) -> np.ndarray:
+        return self._state_order[self._state_start[state] : self._state_start[state + 1]]
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        provinces = self.world.provinces
+        old = self._controller[ids]
+        new = provinces.controller[ids]
+        self._controller[ids] = new
+        n = self.world.n_countries
+        held_old, held_new = old >= 0, new >= 0
+        self.territory -= np.bincount(old[held_old], minlength=n)
+        self.territory += np.bincount(new[held_new], minlength=n)
+        vp = provinces.victory_points[ids]
+        self.victory_points -= np.bincount(old[held_old], weights=vp[held_old], minlength=n).astype(
+            np.int64
+        )
+        self.victory_points += np.bincount(new[held_new], weights=vp[held_new], minlength=n).astype(
+            np.int64
+        )
+        touched = np.union1d(old[held_old], new[held_new])
+        self.invalidate(("territory",), touched)
+        for province in ids.tolist():
+            self.invalidate(("controller", province))
+            country = self._capital_of.get(province)
+            if country is not None:
+                self.invalidate(("capital",), [country])
+        for state in set(provinces.state[ids].tolist()):
+            self.invalidate(("state_controller", state))
+
+    # -- evaluation --------------------------------------------------------
+
+    def update(self) -> list[tuple[str, int]]:
+        """Re-check dirty (trigger, country) pairs; return events that fired."""
+        world = self.world
+        self.days += 1
+        today = world.clock.day
+        while self._wakeups and self._wakeups[0][0] <= today:
+            self.invalidate(heapq.heappop(self._wakeups)[1])
+        changed = np.flatnonzero(world.casualties != self._casualties)
+        if len(changed):
+            self._casualties[changed] = world.casualties[changed]
+            self.invalidate(("casualties",), changed)
+
+        rows, cols = np.nonzero(self.dirty)
+        self.dirty[rows, cols] = False
+        self.checks += len(rows)
+        fired = []
+        triggers = self.triggers
+        for tid, country in zip(rows.tolist(), cols.tolist()):
+            trigger = triggers[tid]
+            value = trigger.compiled.predicate(world, country)
+            was = self.result[tid, country]
+            self.result[tid, country] = value
+            if value and not was and not (trigger.once and self.fired[tid, country]):
+                self.fired[tid, country] = True
+                self.log.append((world.clock.hour, trigger.name, country))
+                fired.append((trigger.name, country))
+                if trigger.on_fire is not None:
+                    with span(trigger.name, EVENT):
+                        trigger.on_fire(world, country)
+        return fired
+
+    @property
+    def brute_force_checks(self) -> int:
+        """Checks polling every trigger for every country each day would have cost."""
+        return self.days * len(self.triggers) * self.world.n_countries
+
+    def report(self) -> str:
+        return (
+            f"{len(self.triggers)} triggers, {len(self.log)} fired, "
+            f"{self.checks} checks vs {self.brute_force_checks} polling every day"
+        )
+
+
+def trigger_system(world: World) -> None:
+    """Daily system: re-evaluate triggers whose inputs changed."""
+    world.triggers.update()
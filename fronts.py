@@ -0,0 +1,385 @@
+"""Front lines between hostile controllers, maintained incrementally.
+
+A *front edge* is a land border edge (straits excluded) whose two provinces
+are controlled by countries at war.  For every ordered pair ``(country,
+enemy)`` the engine keeps the country-side provinces on that border with
+their number of front edges; a *segment* is a connected run of those
+provinces, which is what an army group holds.
+
+When provinces change hands, only the edges touching them are re-tested
+(their out-edges and the matching reverse edges), so the cost of a change is
+proportional to the handful of edges around it rather than the map.
+The changed provinces are remembered per pair and segments are rebuilt
+lazily, the next time they are asked for: only segments on or next to a
+changed province are walked again, and the hundreds of captures of an hour
+of a large war cost one rebuild per front rather than one per capture.
+
+Division assignment uses largest-remainder apportionment of a country's
+front divisions over its segments in proportion to their front edges (or
+to caller-supplied weights, such as the AI's threat estimates);
+:meth:`FrontEngine.rebalance` then keeps every division that can stay where
+it is and moves only the surplus, each to the nearest under-staffed
+segment.  :meth:`FrontEngine.deploy` turns that into march orders for a
+country's divisions that are not fighting: a division counts as being where
+it is headed, so only newly surplus divisions are sent anywhere, and each
+newcomer goes to the least crowded province of its segment.
+:func:`front_system` deploys every country at war once a day.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from provinces import EDGE_STRAIT, ProvinceStore
+from scheduler import Cadence
+
+if TYPE_CHECKING:
+    from divisions import DivisionStore
+    from world import World
+
+Pair = tuple[int, int]
+
+
+@dataclass(slots=True)
+class FrontSegment:
+    country: int
+    enemy: int
+    provinces: np.ndarray  # country-side provinces, sorted
+    edges: int  # front edges along the segment
+    x: float
+    y: float
+
+
+def apportion(weights: np.ndarray, total: int) -> np.ndarray:
+    """Split ``total`` into integers proportional to ``weights`` (largest remainder)."""
+    weights = np.asarray(weights, dtype=np.float64)
+    if total <= 0 or len(weights) == 0 or weights.sum() <= 0:
+        return np.zeros(len(weights), dtype=np.int64)
+    quotas = weights * (total / weights.sum())
+    counts = np.floor(quotas).astype(np.int64)
+    short = total - int(counts.sum())
+    if short:
+        # Stable sort: ties go to the earlier segment, keeping results deterministic.
+        order = np.argsort(-(quotas - counts), kind="stable")
+        counts[order[:short]] += 1
+    return counts
+
+
+class FrontEngine:
+    def __init__(self, provinces: ProvinceStore, n_countries: int) -> None:
+        self.provinces = provinces
+        self.n_countries = n_countries
+        self.hostile = np.zeros((n_countries, n_countries), dtype=bool)
+        # Bumped whenever any front of the country moves; lets consumers cache.
+        self.version = np.zeros(n_countries, dtype=np.int64)
+        self.changes = 0
+        self.rebuilds = 0
+
+        src = provinces.adj_sources
+        dst = provinces.adj_targets
+        n = len(provinces)
+        self._src = src
+        self._dst = dst
+        land = ~provinces.is_sea
+        self._border = land[src] & land[dst] & ((provinces.adj_flags & EDGE_STRAIT) == 0)
+        # CSR edges are sorted by (src, dst), so the reverse edge is a binary search away.
+        keys = src.astype(np.int64) * n + dst
+        self._reverse = np.searchsorted(keys, dst.astype(np.int64) * n + src).astype(np.int32)
+        self._is_front = np.zeros(len(dst), dtype=bool)
+        self._controller = provinces.controller.copy()
+        offsets = provinces.adj_offsets.tolist()
+        targets = dst.tolist()
+        border = self._border.tolist()
+        self._land_neighbors = [
+            [targets[e] for e in range(offsets[p], offsets[p + 1]) if border[e]]
+            for p in range(n)
+        ]
+        self._fronts: dict[Pair, dict[int, int]] = {}
+        self._segments: dict[Pair, list[FrontSegment]] = {}
+        self._segment_of: dict[Pair, dict[int, int]] = {}
+        # Pair -> provinces whose front-edge count changed since the last rebuild.
+        self._dirty: dict[Pair, set[int]] = {}
+        self._x = provinces.x.tolist()
+        self._y = provinces.y.tolist()
+        provinces.subscribe("controller", self._on_control_changed)
+
+    # -- wars --------------------------------------------------------------
+
+    def declare_war(self, a: int, b: int) -> None:
+        if a == b or self.hostile[a, b]:
+            return
+        self.hostile[a, b] = self.hostile[b, a] = True
+        self.version[[a, b]] += 1
+        ctrl = self._controller
+        cs, cd = ctrl[self._src], ctrl[self._dst]
+        between = ((cs == a) & (cd == b)) | ((cs == b) & (cd == a))
+        edges = np.flatnonzero(self._border & between)
+        self._add_edges(edges)
+
+    def make_peace(self, a: int, b: int) -> None:
+        if not self.hostile[a, b]:
+            return
+        self.hostile[a, b] = self.hostile[b, a] = False
+        self.version[[a, b]] += 1
+        for pair in ((a, b), (b, a)):
+            for province in self._fronts.pop(pair, {}):
+                start, end = self.provinces.adj_offsets[province : province + 2]
+                self._is_front[start:end] &= ~(self._controller[self._dst[start:end]] == pair[1])
+            self._segments.pop(pair, None)
+            self._segment_of.pop(pair, None)
+            self._dirty.pop(pair, None)
+
+    def at_war(self, country: int) -> np.ndarray:
+        return np.flatnonzero(self.hostile[country])
+
+    # -- incremental maintenance -------------------------------------------
+
+    def _add_edges(self, edges: np.ndarray) -> None:
+        ctrl = self._controller
+        for e in edges.tolist():
+            self._is_front[e] = True
+            province = int(self._src[e])
+            pair = (int(ctrl[province]), int(ctrl[self._dst[e]]))
+            front = self._fronts.setdefault(pair, {})
+            front[province] = front.get(province, 0) + 1
+            self._dirty.setdefault(pair, set()).add(province)
+            self.version[list(pair)] += 1
+
+    def _remove_edges(self, edges: np.ndarray) -> None:
+        ctrl = self._controller
+        for e in edges.tolist():
+            self._is_front[e] = False
+            province = int(self._src[e])
+            pair = (int(ctrl[province]), int(ctrl[self._dst[e]]))
+            front = self._fronts[pair]
+            if front[province] == 1:
+                del front[province]
+                if not front:
+                    del self._fronts[pair]
+            else:
+                front[province] -= 1
+            self._dirty.setdefault(pair, set()).add(province)
+            self.version[list(pair)] += 1
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        self.changes += len(ids)
+        offsets = self.provinces.adj_offsets
+        out = np.concatenate([np.arange(offsets[p], offsets[p + 1]) for p in ids.tolist()])
+        edges = np.union1d(out, self._reverse[out])
+        edges = edges[self._border[edges]]
+        # Retire edges under the old controllers, then re-test them under the new ones.
+        self._remove_edges(edges[self._is_front[edges]])
+        self._controller[ids] = self.provinces.controller[ids]
+        cs = self._controller[self._src[edges]]
+        cd = self._controller[self._dst[edges]]
+        held = (cs >= 0) & (cd >= 0) & (cs != cd)
+        front = np.zeros(len(edges), dtype=bool)
+        front[held] = self.hostile[cs[held], cd[held]]
+        self._add_edges(edges[front])
+
+    # -- segments ----------------------------------------------------------
+
+    def _components(self, pair: Pair, front: dict[int, int], seeds: set[int]) -> list[FrontSegment]:
+        """Connected runs of front provinces reachable from ``seeds``."""
+        neighbors, xs, ys = self._land_neighbors, self._x, self._y
+        unseen = set(seeds)
+        segments = []
+        for start in sorted(seeds):
+            if start not in unseen:
+                continue
+            unseen.discard(start)
+            members = [start]
+            stack = [start]
+            while stack:
+                for v in neighbors[stack.pop()]:
+                    if v in front and v in unseen:
+                        unseen.discard(v)
+                        members.append(v)
+                        stack.append(v)
+            members.sort()
+            n = len(members)
+            segments.append(
+                FrontSegment(
+                    pair[0], pair[1], np.array(members, dtype=np.int32),
+                    sum(front[p] for p in members),
+                    sum(xs[p] for p in members) / n, sum(ys[p] for p in members) / n,
+                )
+            )
+        return segments
+
+    def _rebuild(self, pair: Pair) -> None:
+        """Recompute only the segments on or next to provinces that changed."""
+        touched = self._dirty.pop(pair, set())
+        front = self._fronts.get(pair)
+        if not front:
+            self._segments.pop(pair, None)
+            self._segment_of.pop(pair, None)
+            return
+        self.rebuilds += 1
+        old = self._segments.get(pair, [])
+        segment_of = self._segment_of.get(pair, {})
+        neighbors = self._land_neighbors
+        hit = set()
+        for p in touched:
+            for q in (p, *neighbors[p]):
+                i = segment_of.get(q)
+                if i is not None:
+                    hit.add(i)
+        seeds = {p for p in touched if p in front}
+        for i in hit:
+            seeds.update(p for p in old[i].provinces.tolist() if p in front)
+        # A new or merged run always reaches a touched province, so untouched
+        # segments are unaffected and kept as they are.
+        segments = [s for i, s in enumerate(old) if i not in hit]
+        segments += self._components(pair, front, seeds)
+        segments.sort(key=lambda s: int(s.provinces[0]))
+        self._segments[pair] = segments
+        self._segment_of[pair] = {
+            p: i for i, s in enumerate(segments) for p in s.provinces.tolist()
+        }
+
+    def segments(self, country: int, enemy: int | None = None) -> list[FrontSegment]:
+        """Front segments of ``country``, against one enemy or all of them."""
+        enemies = [enemy] if enemy is not None else self.at_war(country).tolist()
+        out = []
+        for e in enemies:
+            pair = (country, e)
+            if pair in self._dirty:
+                self._rebuild(pair)
+            out.extend(self._segments.get(pair, ()))
+        return out
+
+    def front_provinces(self, country: int, enemy: int) -> np.ndarray:
+        return np.array(sorted(self._fronts.get((country, enemy), ())), dtype=np.int32)
+
+    def front_mask(self) -> np.ndarray:
+        """Whether each province is on a front, on either side of it."""
+        mask = np.zeros(len(self.provinces), dtype=bool)
+        mask[self._src[self._is_front]] = True
+        return mask
+
+    def front_length(self, country: int) -> int:
+        """Front edges of ``country`` against every enemy."""
+        return sum(
+            sum(front.values()) for (c, _), front in self._fronts.items() if c == country
+        )
+
+    def refresh(self) -> None:
+        """Rebuild every dirty segment list now rather than on first use."""
+        for pair in list(self._dirty):
+            self._rebuild(pair)
+
+    # -- division assignment -----------------------------------------------
+
+    def allocate(
+        self, country: int, divisions: int, weights: np.ndarray | None = None
+    ) -> list[tuple[FrontSegment, int]]:
+        """Target division count per segment, proportional to ``weights``.
+
+        ``weights`` has one entry per segment of :meth:`segments`; the
+        default is each segment's front edges.
+        """
+        segments = self.segments(country)
+        if weights is None:
+            weights = np.array([s.edges for s in segments], dtype=np.float64)
+        counts = apportion(weights, divisions)
+        return list(zip(segments, counts.tolist()))
+
+    def rebalance(
+        self, country: int, locations: np.ndarray, weights: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Segment index (into :meth:`segments`) for each division at ``locations``.
+
+        Divisions already on a segment stay there up to its target
+        (:meth:`allocate`); the rest fill under-staffed segments, nearest first.
+        """
+        locations = np.asarray(locations, dtype=np.int64)
+        plan = self.allocate(country, len(locations), weights)
+        assignment = np.full(len(locations), -1, dtype=np.int64)
+        if not plan:
+            return assignment
+        segments = [segment for segment, _ in plan]
+        targets = np.array([target for _, target in plan], dtype=np.int64)
+        segment_of = {}
+        for i, segment in enumerate(segments):
+            for p in segment.provinces.tolist():
+                segment_of[p] = i
+        filled = np.zeros(len(segments), dtype=np.int64)
+        for d, p in enumerate(locations.tolist()):
+            i = segment_of.get(p, -1)
+            if i >= 0 and filled[i] < targets[i]:
+                assignment[d] = i
+                filled[i] += 1
+
+        free = np.flatnonzero(assignment < 0)
+        if len(free) == 0:
+            return assignment
+        fx = self.provinces.x[locations[free]].astype(np.float64)
+        fy = self.provinces.y[locations[free]].astype(np.float64)
+        deficit = targets - filled
+        # Largest gaps first, each taking the nearest divisions still unassigned.
+        for i in np.argsort(-deficit, kind="stable").tolist():
+            need = int(deficit[i])
+            if need <= 0:
+                break
+            waiting = np.flatnonzero(assignment[free] < 0)
+            d2 = (fx[waiting] - segments[i].x) ** 2 + (fy[waiting] - segments[i].y) ** 2
+            nearest = waiting[np.argsort(d2, kind="stable")[:need]]
+            assignment[free[nearest]] = i
+        return assignment
+
+    def deploy(
+        self, country: int, divisions: DivisionStore, weights: np.ndarray | None = None
+    ) -> int:
+        """Order ``country``'s divisions out of battle onto its fronts; return the orders given."""
+        ids = divisions.ids_of(country)
+        ids = ids[divisions.battle[ids] < 0]
+        # Divisions on their way into an enemy province are attacking, not deploying.
+        heading = divisions.destination[ids]
+        ids = ids[(heading < 0) | (self.provinces.controller[heading] == country)]
+        if not len(ids):
+            return 0
+        heading = divisions.destination[ids]
+        where = np.where(heading >= 0, heading, divisions.location[ids])
+        assignment = self.rebalance(country, where, weights)
+        segments = self.segments(country)
+        orders = 0
+        for i in np.unique(assignment[assignment >= 0]).tolist():
+            members = segments[i].provinces
+            mine = assignment == i
+            arriving = ids[mine & ~np.isin(where, members)]
+            if not len(arriving):
+                continue
+            # Fill the least crowded provinces first; ties go to the lowest ID.
+            crowd = np.searchsorted(members, where[mine & np.isin(where, members)])
+            load = np.bincount(crowd, minlength=len(members))
+            for division in arriving.tolist():
+                slot = int(np.argmin(load))
+                load[slot] += 1
+                divisions.move(np.array([division]), int(members[slot]))
+                orders += 1
+        return orders
+
+    # -- persistence -------------------------------------------------------
+
+    def restore(self, hostile: np.ndarray) -> None:
+        """Re-declare the saved wars against the current province control."""
+        for a, b in zip(*np.nonzero(np.triu(hostile))):
+            self.declare_war(int(a), int(b))
+
+
+def front_system(world: World) -> None:
+    """Hourly system: rebuild the segments of fronts that moved this hour.
+
+    At the start of every day each country at war also deploys its
+    divisions along its fronts, weighted by the AI's planned threat.
+    """
+    fronts = world.fronts
+    fronts.refresh()
+    if not world.clock.due()[Cadence.DAILY]:
+        return
+    for country in np.flatnonzero(fronts.hostile.any(axis=1)).tolist():
+        fronts.deploy(country, world.divisions, world.ai.segment_weights(country))
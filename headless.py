@@ -0,0 +1,111 @@
+"""Headless batch campaigns for AI tuning and balance testing.
+
+Each campaign builds a fresh world from its seed, runs the full scheduler
+with nothing rendered until the end date, and returns a JSON-ready summary:
+territory sampled monthly, casualties, victory points and factories per
+country.
+Batches fan campaigns out over a process pool, one campaign per process;
+campaigns are independent, so each one is reproducible from its seed alone.
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from combat import seed_border_battles
+from scheduler import GameClock
+from simulation import build_scheduler
+from world import World
+
+
+@dataclass(frozen=True)
+class CampaignConfig:
+    seed: int
+    until: datetime
+    width: int = 150
+    height: int = 100
+    countries: int = 60
+    battles: int = 0
+    wars: tuple[tuple[int, int], ...] = ()  # country pairs at war from the start
+
+
+def run_campaign(config: CampaignConfig) -> dict[str, Any]:
+    started = time.perf_counter()
+    world = World.generate(config.width, config.height, config.countries, config.seed)
+    for a, b in config.wars:
+        world.fronts.declare_war(a, b)
+    if config.battles:
+        seed_border_battles(world, config.battles, np.random.default_rng(config.seed))
+    scheduler = build_scheduler(world)
+    scheduler.run_until(config.until)
+    wall = time.perf_counter() - started
+
+    summary = asdict(config)
+    summary["until"] = config.until.date().isoformat()
+    summary.update(
+        reached=world.clock.now.isoformat(),
+        wall_seconds=round(wall, 3),
+        hours_per_second=round(scheduler.hours_per_second(), 1),
+        digest=world.digest(),
+        territory=[
+            {"date": GameClock(hour).now.date().isoformat(), "provinces": counts.tolist()}
+            for hour, counts in world.territory
+        ],
+        final_territory=world.provinces.province_counts(
+            world.n_countries, controlled=True
+        ).tolist(),
+        casualties=np.round(world.casualties, 3).tolist(),
+        victory_points=world.provinces.victory_points_by_country(world.n_countries).tolist(),
+        factories={
+            "civilian": world.production.civilian_factories.tolist(),
+            "military": world.production.military_factories.tolist(),
+            "dockyards": world.buildings.dockyards.tolist(),
+        },
+        systems={
+            system.name: {"calls": system.stats.calls, "mean_ms": round(system.stats.mean_ms, 4)}
+            for system in scheduler.systems
+        },
+    )
+    return summary
+
+
+def aggregate(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    """Cross-run statistics of the per-country end state."""
+    territory = np.array([run["final_territory"] for run in runs], dtype=np.float64)
+    casualties = np.array([run["casualties"] for run in runs], dtype=np.float64)
+    return {
+        "runs": len(runs),
+        "seeds": [run["seed"] for run in runs],
+        "mean_wall_seconds": round(float(np.mean([run["wall_seconds"] for run in runs])), 3),
+        "territory_mean": np.round(territory.mean(axis=0), 3).tolist(),
+        "territory_std": np.round(territory.std(axis=0), 3).tolist(),
+        "casualties_mean": np.round(casualties.mean(axis=0), 3).tolist(),
+        "casualties_total_mean": round(float(casualties.sum(axis=1).mean()), 3),
+    }
+
+
+def run_batch(
+    configs: list[CampaignConfig], workers: int, out_dir: Path
+) -> dict[str, Any]:
+    """Run every campaign, write ``run-<seed>.json`` files and ``summary.json``."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if workers <= 1 or len(configs) == 1:
+        runs = [run_campaign(config) for config in configs]
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            runs = list(pool.map(run_campaign, configs))
+    for run in runs:
+        (out_dir / f"run-{run['seed']}.json").write_text(json.dumps(run, indent=1))
+    summary = aggregate(runs)
+    (out_dir / "summary.json").write_text(json.dumps(summary, indent=1))
+    return summary
@@ -0,0 +1,294 @@
+"""HOI4Clone entry point."""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import benchmark
+from combat import seed_border_battles
+from headless import CampaignConfig, run_batch
+import profiling
+import savegame
+from parallel import ParallelStepper
+from render import MAP_MODES, MapRenderer
+from replay import Replay, ReplayRecorder
+from scheduler import Cadence
+from script import ScriptCache, load_definitions
+from simulation import build_scheduler
+from world import World
+
+DEFAULT_HEADLESS_END = datetime(1945, 1, 1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="hoi4clone")
+    parser.add_argument("--width", type=int, default=150, help="map width in provinces")
+    parser.add_argument("--height", type=int, default=100, help="map height in provinces")
+    parser.add_argument("--countries", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hours", type=int, default=24 * 31, help="in-game hours to simulate")
+    parser.add_argument(
+        "--until", type=datetime.fromisoformat, help="simulate up to this date (overrides --hours)"
+    )
+    parser.add_argument(
+        "--battles", type=int, default=0, help="start N border battles before running"
+    )
+    parser.add_argument(
+        "--war",
+        action="append",
+        default=[],
+        metavar="A:B",
+        help="countries A and B start at war (repeatable)",
+    )
+    parser.add_argument(
+        "--ai-budget",
+        type=float,
+        default=2.0,
+        metavar="MS",
+        help="wall-clock AI planning time per tick; 0 plans a fixed amount per tick "
+        "so runs are reproducible",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="processes for per-country systems, or for campaigns with --headless",
+    )
+    parser.add_argument(
+        "--debug-supply",
+        action="store_true",
+        help="check every incremental supply update against a full recompute",
+    )
+    parser.add_argument(
+        "--profile", type=Path, metavar="TRACE", help="write a Chrome trace-event JSON file"
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=10, help="hot spans listed per game year"
+    )
+    data = parser.add_argument_group("game data")
+    data.add_argument("--data", type=Path, help="directory of game definition scripts")
+    data.add_argument(
+        "--script-cache",
+        type=Path,
+        default=Path(".script_cache"),
+        help="where parsed scripts are cached between runs",
+    )
+    saves = parser.add_argument_group("save games")
+    saves.add_argument("--load", type=Path, help="continue from a save game")
+    saves.add_argument("--save", type=Path, help="write a save game when the run ends")
+    saves.add_argument(
+        "--autosave", type=Path, metavar="DIR", help="save monthly in the background to DIR"
+    )
+    replays = parser.add_argument_group("replays")
+    replays.add_argument("--record", type=Path, metavar="FILE", help="record a replay of the run")
+    replays.add_argument("--replay", type=Path, metavar="FILE", help="start from a recorded replay")
+    replays.add_argument(
+        "--seek",
+        type=datetime.fromisoformat,
+        help="date in the --replay to start from (default: where it ends)",
+    )
+    rendering = parser.add_argument_group("rendering")
+    rendering.add_argument(
+        "--screenshot", type=Path, metavar="PNG", help="render the map when the run ends"
+    )
+    rendering.add_argument("--map-mode", choices=sorted(MAP_MODES), default="political")
+    rendering.add_argument(
+        "--zoom", type=int, default=0, help="zoom level, each one halving the resolution"
+    )
+    bench = parser.add_argument_group("benchmarks")
+    bench.add_argument(
+        "--bench", action="store_true", help="run the benchmark scenarios and exit"
+    )
+    bench.add_argument(
+        "--bench-scenario",
+        action="append",
+        choices=list(benchmark.SCENARIOS),
+        help="scenario to run (repeatable; default all)",
+    )
+    bench.add_argument(
+        "--bench-repeat", type=int, default=3, help="runs per scenario, the fastest is kept"
+    )
+    bench.add_argument(
+        "--bench-out", type=Path, default=Path("bench.json"), help="where results are written"
+    )
+    bench.add_argument(
+        "--bench-baseline",
+        type=Path,
+        metavar="JSON",
+        help="earlier results to compare with; regressions make the exit status 1",
+    )
+    bench.add_argument(
+        "--bench-tolerance",
+        type=float,
+        default=benchmark.DEFAULT_TOLERANCE,
+        help="allowed slowdown or memory growth as a fraction (default 0.05)",
+    )
+    headless = parser.add_argument_group("headless batch runs")
+    headless.add_argument(
+        "--headless", action="store_true", help="run campaigns without rendering"
+    )
+    headless.add_argument(
+        "--runs", type=int, default=1, help="campaigns to run, seeds SEED..SEED+RUNS-1"
+    )
+    headless.add_argument(
+        "--out", type=Path, default=Path("runs"), help="directory for run summaries"
+    )
+    return parser
+
+
+def parse_wars(wars: list[str]) -> tuple[tuple[int, int], ...]:
+    """``A:B`` arguments of ``--war`` as country pairs."""
+    pairs = []
+    for war in wars:
+        a, b = (int(country) for country in war.split(":"))
+        pairs.append((a, b))
+    return tuple(pairs)
+
+
+def run_headless(args: argparse.Namespace) -> int:
+    until = args.until or DEFAULT_HEADLESS_END
+    configs = [
+        CampaignConfig(
+            seed=args.seed + i,
+            until=until,
+            width=args.width,
+            height=args.height,
+            countries=args.countries,
+            battles=args.battles,
+            wars=parse_wars(args.war),
+        )
+        for i in range(args.runs)
+    ]
+    workers = args.workers or min(len(configs), os.cpu_count() or 1)
+    summary = run_batch(configs, workers, args.out)
+    print(
+        f"{summary['runs']} campaigns to {until:%Y-%m-%d}, "
+        f"{summary['mean_wall_seconds']:.1f} s each on average, results in {args.out}/"
+    )
+    return 0
+
+
+def run_benchmarks(args: argparse.Namespace) -> int:
+    results = benchmark.run_suite(args.bench_scenario, args.bench_repeat)
+    benchmark.write_results(args.bench_out, results)
+    baseline = benchmark.load_results(args.bench_baseline) if args.bench_baseline else None
+    print(benchmark.report(results, baseline))
+    print(f"results written to {args.bench_out}")
+    if baseline is None:
+        return 0
+    regressions = benchmark.compare(results, baseline, args.bench_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.headless:
+        return run_headless(args)
+    if args.bench:
+        return run_benchmarks(args)
+
+    definitions = {}
+    if args.data:
+        started = time.perf_counter()
+        cache = ScriptCache(args.script_cache)
+        definitions = load_definitions(args.data, cache)
+        print(
+            f"loaded {sum(len(files) for files in definitions.values())} definition files "
+            f"({cache.parsed} parsed, {cache.reused} cached) "
+            f"in {time.perf_counter() - started:.2f} s"
+        )
+
+    if args.load:
+        world = savegame.load(args.load)
+        world.supply.debug = args.debug_supply
+        print(f"loaded {args.load} at {world.clock.now:%Y-%m-%d %H:00}")
+    elif args.replay:
+        started = time.perf_counter()
+        replay = Replay(args.replay)
+        world = replay.seek(args.seek or replay.last_hour)
+        world.supply.debug = args.debug_supply
+        print(
+            f"sought {args.replay} to {world.clock.now:%Y-%m-%d %H:00} "
+            f"in {time.perf_counter() - started:.2f} s"
+        )
+    else:
+        world = World.generate(
+            args.width, args.height, args.countries, args.seed, supply_debug=args.debug_supply
+        )
+    provinces = world.provinces
+    land = int(provinces.land_mask().sum())
+    print(
+        f"{len(provinces)} provinces ({land} land, {len(provinces) - land} sea), "
+        f"{len(provinces.adj_targets) // 2} edges, {provinces.nbytes / 2**20:.2f} MiB"
+    )
+
+    events = sum(
+        world.triggers.add_events(tree) for tree in definitions.get("events", {}).values()
+    )
+    if events:
+        print(f"{events} events registered")
+
+    for a, b in parse_wars(args.war):
+        world.fronts.declare_war(a, b)
+    world.ai.budget_ms = args.ai_budget or None
+
+    world.stepper = ParallelStepper(args.workers or 1)
+    if args.battles:
+        seed_border_battles(world, args.battles, np.random.default_rng(args.seed))
+
+    if args.profile:
+        profiling.profiler.enable()
+    scheduler = build_scheduler(world)
+    autosaver = None
+    if args.autosave:
+        autosaver = savegame.Autosaver(args.autosave)
+        scheduler.register("autosave", autosaver, Cadence.MONTHLY)
+    recorder = None
+    if args.record:
+        recorder = ReplayRecorder(args.record)
+        scheduler.register("replay", recorder, Cadence.HOURLY)
+        recorder(world)
+    try:
+        if args.until:
+            scheduler.run_until(args.until)
+        else:
+            scheduler.run(args.hours)
+    finally:
+        world.stepper.close()
+        if recorder is not None:
+            recorder.close()
+    if autosaver is not None:
+        autosaver.wait()
+    if args.save:
+        savegame.save(world, args.save)
+    print(f"reached {world.clock.now:%Y-%m-%d %H:00}, state {world.digest()[:16]}")
+    print(scheduler.report())
+    if len(world.triggers):
+        print(world.triggers.report())
+    if args.screenshot:
+        started = time.perf_counter()
+        renderer = MapRenderer(world, zoom_levels=args.zoom + 1)
+        renderer.screenshot(args.screenshot, args.map_mode, args.zoom)
+        print(
+            f"{args.map_mode} map written to {args.screenshot} "
+            f"in {time.perf_counter() - started:.2f} s"
+        )
+    if args.profile:
+        profiling.profiler.export_chrome_trace(args.profile)
+        print(profiling.profiler.report(args.profile_top))
+        print(f"trace written to {args.profile}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,171 @@
+"""Procedural test map generator.
+
+Produces a fully populated :class:`ProvinceStore` on a triangular lattice so
+that the simulation, benchmarks and headless runs have a world to work on
+before real map data is loaded.  Output is a pure function of the arguments.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+from provinces import EDGE_RAILWAY, EDGE_RIVER, EDGE_STRAIT, ProvinceStore, Terrain
+
+CELL_KM = 30.0
+STATE_BLOCK = 4
+REGION_BLOCK = 16
+SEA_FRACTION = 0.3
+RIVER_FRACTION = 0.08
+HUB_FRACTION = 0.5
+PORT_FRACTION = 0.15
+
+_LAND_TERRAIN = np.array(
+    [Terrain.PLAINS, Terrain.FOREST, Terrain.HILLS, Terrain.MOUNTAIN,
+     Terrain.JUNGLE, Terrain.MARSH, Terrain.DESERT, Terrain.URBAN],
+    dtype=np.uint8,
+)
+_LAND_WEIGHTS = np.array([0.38, 0.2, 0.14, 0.07, 0.05, 0.05, 0.07, 0.04])
+
+
+class GeneratedMap(NamedTuple):
+    provinces: ProvinceStore
+    capitals: np.ndarray  # province id of each country's capital
+    width: int
+    height: int
+
+
+def _value_noise(rng: np.random.Generator, width: int, height: int, scale: int) -> np.ndarray:
+    """Bilinearly upsampled random lattice in [0, 1)."""
+    gw, gh = width // scale + 2, height // scale + 2
+    grid = rng.random((gh, gw))
+    yi, yf = np.divmod(np.arange(height) / scale, 1.0)
+    xi, xf = np.divmod(np.arange(width) / scale, 1.0)
+    y0 = yi.astype(int)[:, None]
+    x0 = xi.astype(int)[None, :]
+    ty = yf[:, None]
+    tx = xf[None, :]
+    top = grid[y0, x0] * (1 - tx) + grid[y0, x0 + 1] * tx
+    bottom = grid[y0 + 1, x0] * (1 - tx) + grid[y0 + 1, x0 + 1] * tx
+    return top * (1 - ty) + bottom * ty
+
+
+def _lattice_edges(width: int, height: int) -> tuple[np.ndarray, np.ndarray]:
+    ids = np.arange(width * height, dtype=np.int32).reshape(height, width)
+    right = (ids[:, :-1].ravel(), ids[:, 1:].ravel())
+    down = (ids[:-1, :].ravel(), ids[1:, :].ravel())
+    diag = (ids[:-1, :-1].ravel(), ids[1:, 1:].ravel())
+    a = np.concatenate([right[0], down[0], diag[0]])
+    b = np.concatenate([right[1], down[1], diag[1]])
+    return a, b
+
+
+def _compact_ids(keys: np.ndarray) -> np.ndarray:
+    _, inverse = np.unique(keys, return_inverse=True)
+    return inverse.astype(np.int32)
+
+
+def _lay_railways(store: ProvinceStore, capitals: np.ndarray) -> None:
+    """Connect every supply hub to its country's capital along a BFS tree."""
+    offsets = store.adj_offsets.tolist()
+    targets = store.adj_targets.tolist()
+    owner = store.owner.tolist()
+    hubs_by_country: dict[int, list[int]] = {}
+    for hub in np.flatnonzero(store.supply_hub).tolist():
+        hubs_by_country.setdefault(owner[hub], []).append(hub)
+    for country, capital in enumerate(capitals.tolist()):
+        parent = {capital: capital}
+        frontier = [capital]
+        while frontier:
+            nxt = []
+            for u in frontier:
+                for v in targets[offsets[u] : offsets[u + 1]]:
+                    if v not in parent and owner[v] == country:
+                        parent[v] = u
+                        nxt.append(v)
+            frontier = nxt
+        laid = set()
+        for hub in hubs_by_country.get(country, ()):
+            node = hub
+            while node in parent and node != capital and node not in laid:
+                laid.add(node)
+                store.set_edge_flag(node, parent[node], EDGE_RAILWAY)
+                node = parent[node]
+
+
+def generate_map(
+    width: int = 150, height: int = 100, n_countries: int = 60, seed: int = 0
+) -> GeneratedMap:
+    rng = np.random.default_rng(seed)
+    n = width * height
+    store = ProvinceStore(n)
+
+    yy, xx = np.divmod(np.arange(n), width)
+    store.x[:] = xx * CELL_KM
+    store.y[:] = yy * CELL_KM
+
+    elevation = _value_noise(rng, width, height, scale=12).ravel()
+    sea_level = np.quantile(elevation, SEA_FRACTION)
+    store.is_sea[:] = elevation < sea_level
+    land = np.flatnonzero(~store.is_sea)
+
+    store.terrain[:] = Terrain.OCEAN
+    store.terrain[land] = rng.choice(_LAND_TERRAIN, size=len(land), p=_LAND_WEIGHTS)
+
+    # Countries: nearest capital wins, one chunked distance pass.
+    capitals = np.sort(rng.choice(land, size=n_countries, replace=False)).astype(np.int32)
+    cx, cy = store.x[capitals], store.y[capitals]
+    nearest = np.empty(len(land), dtype=np.int16)
+    for start in range(0, len(land), 4096):
+        chunk = land[start : start + 4096]
+        d2 = (store.x[chunk, None] - cx) ** 2 + (store.y[chunk, None] - cy) ** 2
+        nearest[start : start + len(chunk)] = d2.argmin(axis=1)
+    store.owner[land] = nearest
+    store.controller[:] = store.owner
+    store.terrain[capitals] = Terrain.URBAN
+
+    block = (yy // STATE_BLOCK) * (width // STATE_BLOCK + 1) + xx // STATE_BLOCK
+    state_keys = block[land].astype(np.int64) * (n_countries + 1) + store.owner[land]
+    store.state[land] = _compact_ids(state_keys)
+
+    region_block = (yy // REGION_BLOCK) * (width // REGION_BLOCK + 1) + xx // REGION_BLOCK
+    store.region[:] = _compact_ids(region_block.astype(np.int64) * 2 + store.is_sea)
+
+    store.infrastructure[land] = rng.integers(1, 4, size=len(land))
+    store.infrastructure[capitals] = 5
+    store.victory_points[capitals] = 30
+    minor_vp = rng.choice(land, size=max(1, len(land) // 40), replace=False)
+    store.victory_points[minor_vp] += rng.integers(1, 10, size=len(minor_vp)).astype(np.int16)
+
+    a, b = _lattice_edges(width, height)
+    flags = np.zeros(len(a), dtype=np.uint8)
+    land_edge = ~store.is_sea[a] & ~store.is_sea[b]
+    flags[land_edge & (rng.random(len(a)) < RIVER_FRACTION)] |= EDGE_RIVER
+
+    # A few strait crossings between land provinces separated by one sea tile.
+    ids = np.arange(n, dtype=np.int32).reshape(height, width)
+    la, mid, lb = ids[:, :-2].ravel(), ids[:, 1:-1].ravel(), ids[:, 2:].ravel()
+    strait = ~store.is_sea[la] & ~store.is_sea[lb] & store.is_sea[mid]
+    strait &= rng.random(len(la)) < 0.1
+    store.set_adjacency(
+        np.concatenate([a, la[strait]]),
+        np.concatenate([b, lb[strait]]),
+        np.concatenate([flags, np.full(int(strait.sum()), EDGE_STRAIT, dtype=np.uint8)]),
+    )
+
+    # One candidate hub per state, kept with probability HUB_FRACTION.
+    shuffled = rng.permutation(land)
+    _, first = np.unique(store.state[shuffled], return_index=True)
+    hubs = shuffled[first]
+    store.supply_hub[hubs[rng.random(len(hubs)) < HUB_FRACTION]] = True
+    store.supply_hub[capitals] = False
+
+    coastal = land[np.bincount(
+        store.adj_sources, weights=store.is_sea[store.adj_targets], minlength=n
+    )[land] > 0]
+    ports = coastal[rng.random(len(coastal)) < PORT_FRACTION]
+    store.naval_base[ports] = rng.integers(1, 4, size=len(ports))
+    _lay_railways(store, capitals)
+
+    return GeneratedMap(store, capitals, width, height)
@@ -0,0 +1,331 @@
+"""Typed modifiers at country, state and unit scope, with running totals.
+
+National spirits, ideas, laws, advisors, technologies, equipment variants,
+doctrines, occupation and buildings all change the same handful of numbers:
+factory output, research and construction speed, how much of a state's
+resources can be extracted, and division stats.  Each of them is a named *source* (``"law:
+war_economy"``, ``"advisor:tank_designer"``) holding a value per
+:class:`Modifier`, added to one or more targets of a :class:`Scope`:
+countries, states (``ProvinceStore.state``) or units (division IDs).
+
+Every modifier is a percentage and modifiers stack additively, so what a
+consumer needs is one sum per (target, modifier).  :class:`ModifierEngine`
+keeps those sums in a ``(targets, modifiers)`` table per scope and updates
+them when a source is added, replaced or removed, so reading a total is one
+array index -- or, for a whole scope at once, one column.  Each target also
+has a version counter, bumped with every change, and one per (target,
+modifier) bumped only when that modifier's total moves, so a cache that
+reads a few modifiers (see :class:`unitstats.DivisionStatCache`) is not
+invalidated by a law that only changes factory output; and consumers
+holding derived data can :meth:`~ModifierEngine.subscribe` to a scope to be
+told which targets changed.
+
+Which scopes a modifier may be given at is part of its type
+(:data:`MODIFIER_SCOPES`): research speed is national, resource extraction
+local to a state, and so on.
+
+Occupation is maintained here: a state most of whose provinces are
+controlled by a country other than its owner gets the ``occupation``
+source, kept current through ``ProvinceStore.subscribe``.
+"""
+
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Any, Callable
+
+import numpy as np
+
+from provinces import ProvinceStore
+
+
+class Scope(IntEnum):
+    COUNTRY = 0
+    STATE = 1
+    UNIT = 2
+
+
+class Modifier(IntEnum):
+    FACTORY_OUTPUT = 0
+    RESEARCH_SPEED = 1
+    CONSTRUCTION_SPEED = 2
+    LOCAL_RESOURCES = 3
+    SOFT_ATTACK = 4
+    HARD_ATTACK = 5
+    DEFENSE = 6
+    BREAKTHROUGH = 7
+    MAX_ORG = 8
+    ARMOR = 9
+    PIERCING = 10
+
+
+_DIVISION = (Scope.COUNTRY, Scope.UNIT)
+MODIFIER_SCOPES: dict[Modifier, tuple[Scope, ...]] = {
+    Modifier.FACTORY_OUTPUT: (Scope.COUNTRY,),
+    Modifier.RESEARCH_SPEED: (Scope.COUNTRY,),
+    Modifier.CONSTRUCTION_SPEED: (Scope.COUNTRY, Scope.STATE),
+    Modifier.LOCAL_RESOURCES: (Scope.STATE,),
+    Modifier.SOFT_ATTACK: _DIVISION,
+    Modifier.HARD_ATTACK: _DIVISION,
+    Modifier.DEFENSE: _DIVISION,
+    Modifier.BREAKTHROUGH: _DIVISION,
+    Modifier.MAX_ORG: _DIVISION,
+    Modifier.ARMOR: _DIVISION,
+    Modifier.PIERCING: _DIVISION,
+}
+assert len(MODIFIER_SCOPES) == len(Modifier)
+_ALLOWED = np.zeros((len(Scope), len(Modifier)), dtype=bool)
+for _key, _scopes in MODIFIER_SCOPES.items():
+    _ALLOWED[list(_scopes), _key] = True
+
+# A source name is "<kind>:<name>", or just the kind for built-in sources.
+SOURCE_KINDS = (
+    "spirit", "idea", "law", "advisor", "tech", "equipment", "doctrine", "occupation", "building"
+)
+
+OCCUPATION = {Modifier.LOCAL_RESOURCES: -0.5, Modifier.CONSTRUCTION_SPEED: -0.5}
+
+
+def _targets(targets: np.ndarray | int) -> np.ndarray:
+    return np.unique(np.atleast_1d(np.asarray(targets, dtype=np.int64)))
+
+
+class ModifierEngine:
+    """Modifier sources per scope target, with incrementally kept totals and versions."""
+
+    def __init__(self, provinces: ProvinceStore, n_countries: int, units: int = 1024) -> None:
+        n_states = int(provinces.state.max()) + 1
+        sizes = (n_countries, n_states, units)
+        self.totals = [np.zeros((n, len(Modifier)), dtype=np.float64) for n in sizes]
+        self.version = [np.zeros(n, dtype=np.int64) for n in sizes]
+        self.key_version = [np.zeros((n, len(Modifier)), dtype=np.int64) for n in sizes]
+        # scope -> target -> source -> (Modifier,) vector
+        self._sources: list[dict[int, dict[str, np.ndarray]]] = [{} for _ in Scope]
+        self._listeners: list[list[Callable[[np.ndarray], None]]] = [[] for _ in Scope]
+
+        self.provinces = provinces
+        land = provinces.state >= 0
+        self._state_order = np.argsort(provinces.state, kind="stable")[int((~land).sum()) :]
+        self._state_start = np.searchsorted(
+            provinces.state[self._state_order], np.arange(n_states + 1)
+        )
+        self._state_size = np.diff(self._state_start)
+        self._controller = provinces.controller.copy()
+        # Provinces of each state controlled by someone other than their owner.
+        ids = np.flatnonzero(land)
+        self._foreign = np.bincount(
+            provinces.state[ids[self._is_foreign(ids)]], minlength=n_states
+        ).astype(np.int64)
+        self.occupied = np.zeros(n_states, dtype=bool)
+        self._update_occupation(np.arange(n_states))
+        provinces.subscribe("controller", self._on_control_changed)
+
+    # -- sources -----------------------------------------------------------
+
+    @staticmethod
+    def _vector(scope: Scope, values: dict[Modifier, float]) -> np.ndarray:
+        vector = np.zeros(len(Modifier), dtype=np.float64)
+        for key, value in values.items():
+            if not _ALLOWED[scope, key]:
+                raise ValueError(f"{Modifier(key).name} cannot be given at {scope.name} scope")
+            vector[key] = value
+        return vector
+
+    @staticmethod
+    def _check_source(source: str) -> None:
+        if source.partition(":")[0] not in SOURCE_KINDS:
+            raise ValueError(f"source {source!r} is not one of {SOURCE_KINDS}")
+
+    def _reserve(self, scope: Scope, target: int) -> None:
+        size = len(self.version[scope])
+        if target < size:
+            return
+        if scope != Scope.UNIT:
+            raise ValueError(f"{scope.name} {target} is not in 0..{size - 1}")
+        while size <= target:
+            size *= 2
+        totals = np.zeros((size, len(Modifier)), dtype=np.float64)
+        totals[: len(self.totals[scope])] = self.totals[scope]
+        version = np.zeros(size, dtype=np.int64)
+        version[: len(self.version[scope])] = self.version[scope]
+        key_version = np.zeros((size, len(Modifier)), dtype=np.int64)
+        key_version[: len(self.key_version[scope])] = self.key_version[scope]
+        self.totals[scope], self.version[scope] = totals, version
+        self.key_version[scope] = key_version
+
+    def _apply(self, scope: Scope, targets: np.ndarray, deltas: np.ndarray) -> None:
+        self.totals[scope][targets] += deltas
+        self.version[scope][targets] += 1
+        self.key_version[scope][targets] += deltas != 0.0
+        for callback in self._listeners[scope]:
+            callback(targets)
+
+    def add(
+        self,
+        scope: Scope,
+        targets: np.ndarray | int,
+        source: str,
+        values: dict[Modifier, float],
+    ) -> None:
+        """Give ``source`` with ``values`` to every target, replacing what it gave before."""
+        self._check_source(source)
+        targets = _targets(targets)
+        if not len(targets):
+            return
+        self._reserve(scope, int(targets[-1]))
+        vector = self._vector(scope, values)
+        deltas = np.empty((len(targets), len(Modifier)), dtype=np.float64)
+        sources = self._sources[scope]
+        for i, target in enumerate(targets.tolist()):
+            held = sources.setdefault(target, {})
+            old = held.get(source)
+            deltas[i] = vector if old is None else vector - old
+            held[source] = vector
+        self._apply(scope, targets, deltas)
+
+    def remove(self, scope: Scope, targets: np.ndarray | int, source: str) -> None:
+        """Take ``source`` away from every target that has it."""
+        targets = _targets(targets)
+        removed, deltas = [], []
+        sources = self._sources[scope]
+        for target in targets.tolist():
+            held = sources.get(target)
+            if held is None or source not in held:
+                continue
+            deltas.append(-held.pop(source))
+            removed.append(target)
+            if not held:
+                del sources[target]
+        if removed:
+            self._apply(scope, np.array(removed, dtype=np.int64), np.stack(deltas))
+
+    def clear(self, scope: Scope, targets: np.ndarray | int) -> None:
+        """Take every source away from the targets (a disbanded unit, say)."""
+        targets = _targets(targets)
+        cleared = [t for t in targets.tolist() if t in self._sources[scope]]
+        if not cleared:
+            return
+        deltas = np.stack(
+            [-np.sum(list(self._sources[scope].pop(t).values()), axis=0) for t in cleared]
+        )
+        self._apply(scope, np.array(cleared, dtype=np.int64), deltas)
+
+    def sources_of(self, scope: Scope, target: int) -> dict[str, dict[Modifier, float]]:
+        held = self._sources[scope].get(target, {})
+        return {
+            source: {Modifier(k): float(v) for k, v in enumerate(vector.tolist()) if v}
+            for source, vector in held.items()
+        }
+
+    def subscribe(self, scope: Scope, callback: Callable[[np.ndarray], None]) -> None:
+        """Call ``callback(targets)`` after the totals of ``targets`` in ``scope`` change."""
+        self._listeners[scope].append(callback)
+
+    # -- totals ------------------------------------------------------------
+
+    def get(self, scope: Scope, target: int, key: Modifier) -> float:
+        """Summed ``key`` of ``target``; unknown units have none."""
+        totals = self.totals[scope]
+        return float(totals[target, key]) if target < len(totals) else 0.0
+
+    def column(self, scope: Scope, key: Modifier) -> np.ndarray:
+        """Summed ``key`` of every target in ``scope``, as a read-only view."""
+        column = self.totals[scope][:, key]
+        column.flags.writeable = False
+        return column
+
+    def gather(self, scope: Scope, targets: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """``(targets, keys)`` totals; targets past the table (new units) have none."""
+        targets = np.asarray(targets, dtype=np.int64)
+        totals = self.totals[scope]
+        out = np.zeros((len(targets), len(keys)), dtype=np.float64)
+        inside = targets < len(totals)
+        out[inside] = totals[np.ix_(targets[inside], keys)]
+        return out
+
+    def keys_version(self, scope: Scope, target: int, keys: np.ndarray) -> int:
+        """A number that changes whenever any of ``keys`` changes for ``target``."""
+        return int(self.key_version[scope][target, keys].sum())
+
+    def has_any(self, scope: Scope) -> bool:
+        return bool(self._sources[scope])
+
+    def state_provinces(self, states: np.ndarray) -> np.ndarray:
+        """Every province of ``states``."""
+        states = np.asarray(states, dtype=np.int64)
+        start, size = self._state_start[states], self._state_size[states]
+        offsets = np.arange(int(size.sum())) - np.repeat(np.cumsum(size) - size, size)
+        return self._state_order[np.repeat(start, size) + offsets]
+
+    # -- occupation --------------------------------------------------------
+
+    def _is_foreign(self, ids: np.ndarray) -> np.ndarray:
+        controller = self._controller[ids]
+        return (controller >= 0) & (controller != self.provinces.owner[ids])
+
+    def _update_occupation(self, states: np.ndarray) -> None:
+        occupied = 2 * self._foreign[states] > self._state_size[states]
+        changed = occupied != self.occupied[states]
+        self.occupied[states] = occupied
+        gained = states[changed & occupied]
+        lost = states[changed & ~occupied]
+        if len(gained):
+            self.add(Scope.STATE, gained, "occupation", OCCUPATION)
+        if len(lost):
+            self.remove(Scope.STATE, lost, "occupation")
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        ids = ids[self.provinces.state[ids] >= 0]
+        if not len(ids):
+            return
+        states = self.provinces.state[ids]
+        n_states = len(self._foreign)
+        self._foreign -= np.bincount(states[self._is_foreign(ids)], minlength=n_states)
+        self._controller[ids] = self.provinces.controller[ids]
+        self._foreign += np.bincount(states[self._is_foreign(ids)], minlength=n_states)
+        self._update_occupation(np.unique(states).astype(np.int64))
+
+    # -- persistence -------------------------------------------------------
+
+    def to_meta(self) -> dict[str, Any]:
+        return {
+            scope.name: {
+                str(target): {
+                    source: {Modifier(k).name: v for k, v in enumerate(vector.tolist()) if v}
+                    for source, vector in held.items()
+                }
+                for target, held in self._sources[scope].items()
+            }
+            for scope in Scope
+        }
+
+    def restore(self, meta: dict[str, Any], versions: dict[str, np.ndarray]) -> None:
+        """Replace every source and version counter with saved ones."""
+        for scope in Scope:
+            version = versions[scope.name.lower()]
+            self._reserve(scope, len(version) - 1)
+            sources = self._sources[scope]
+            sources.clear()
+            totals = self.totals[scope]
+            totals[:] = 0.0
+            for target, held in meta[scope.name].items():
+                target = int(target)
+                sources[target] = {
+                    source: self._vector(scope, {Modifier[k]: v for k, v in values.items()})
+                    for source, values in held.items()
+                }
+                totals[target] = np.sum(list(sources[target].values()), axis=0)
+            self.version[scope][:] = 0
+            self.version[scope][: len(version)] = version
+            # Not saved: bump every key so nothing derived before the restore is reused.
+            self.key_version[scope] += 1
+            everything = np.arange(len(self.version[scope]))
+            for callback in self._listeners[scope]:
+                callback(everything)
+        self.occupied[:] = False
+        for target, held in self._sources[Scope.STATE].items():
+            self.occupied[target] = "occupation" in held
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Version counters per scope, by lower-case scope name."""
+        return {scope.name.lower(): self.version[scope] for scope in Scope}
@@ -0,0 +1,412 @@
+"""Naval missions, sea combat and convoy raiding over strategic sea regions.
+
+Every task force of every country is a row of one :class:`NavalTable`: its
+country, the sea region it operates in, its mission, ship class and ship
+count, remaining hull strength and how close the enemy is to finding it.
+An hour at sea for the whole world is one pass of array operations in
+:meth:`NavalTable.step`, with per-(region, country) totals gathered by one
+flat ``bincount`` each and hostility applied as a ``(countries, countries)``
+matrix product:
+
+1. spotting: each country's spotting power in a region (patrols see twice
+   as far, raiders hide) raises every hostile task force's *contact* there
+   by ``spot * visibility / (spot * visibility + SPOT_HALF)``; a task force
+   no enemy can see loses contact;
+2. engagement: task forces at full contact fight everything hostile that is
+   also engaged in their region;
+3. positioning: a side's firepower is scaled between 0.75 and 1.25 by its
+   share of the spotting in the region;
+4. damage: each country's firepower is split over the hostile engaged hull
+   in the region pro rata, so a task force loses
+   ``strength * sum(hostile firepower / hostile-facing hull)``; task forces
+   below :data:`RETREAT_AT` of their hull return to port and repair, and
+   those at zero are sunk.
+
+Task forces change region by sailing: the move is routed over sea
+provinces by the :class:`pathfinding.Pathfinder` between the two regions'
+anchor provinces (the sea province nearest each region's centre), and the
+task force spends the route's length over :data:`FLEET_SPEED` hours in
+*transit*, at sea but neither spotting, fighting nor raiding.  Regions with
+no sea route between them (separate oceans) cannot be sailed between.
+
+Hull lost beyond a whole ship sinks it for good; damaged ships repair in
+port.  Convoys sail from every port into the port's sea region.  Raiders
+that are not engaged sink a share
+``RAID_LOSS * raid / (raid + escort + CONVOY_SCREEN)`` of the hostile
+convoys crossing their region; :func:`convoy_system` averages a day of
+those shares into each country's convoy efficiency.  Trade imports
+(:attr:`production.ProductionTable.convoy_efficiency`) and port supply
+(:meth:`supply.SupplyNetwork.set_port_efficiency`) are scaled by it, and
+raiders move to the region where their enemies' convoys are most exposed.
+"""
+
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from pathfinding import MovementClass, Pathfinder
+from provinces import ProvinceStore
+
+if TYPE_CHECKING:
+    from world import World
+
+
+class Mission(IntEnum):
+    PATROL = 0
+    CONVOY_RAIDING = 1
+    STRIKE_FORCE = 2
+
+
+class ShipClass(IntEnum):
+    DESTROYER = 0
+    LIGHT_CRUISER = 1
+    HEAVY_CRUISER = 2
+    BATTLESHIP = 3
+    CARRIER = 4
+    SUBMARINE = 5
+
+
+# Per ship, indexed by ShipClass.
+HULL = np.array([20.0, 40.0, 60.0, 120.0, 90.0, 15.0])
+ATTACK = np.array([1.5, 3.0, 4.5, 9.0, 8.0, 2.0])
+SPOTTING = np.array([1.0, 1.5, 1.5, 1.0, 4.0, 0.5])
+VISIBILITY = np.array([1.0, 1.5, 2.0, 3.0, 3.0, 0.3])
+# Indexed by Mission.
+MISSION_SPOTTING = np.array([2.0, 0.5, 1.0])
+MISSION_ATTACK = np.array([1.0, 1.0, 1.5])
+assert len(HULL) == len(ATTACK) == len(SPOTTING) == len(VISIBILITY) == len(ShipClass)
+assert len(MISSION_SPOTTING) == len(MISSION_ATTACK) == len(Mission)
+
+SPOT_HALF = 8.0
+RETREAT_AT = 0.3
+REPAIR_RATE = 0.01  # of full hull per hour in port
+RAID_LOSS = 0.5  # share of the convoys crossing a region an overwhelming raid sinks
+CONVOY_SCREEN = 4.0  # raid firepower the convoys' own escorts absorb
+FLEET_SPEED = 30.0  # km of terrain-weighted route per hour
+
+ROW_FIELDS = (
+    "country", "region", "mission", "ship_class", "ships", "strength", "contact", "at_sea",
+    "transit",
+)
+COUNTRY_FIELDS = ("convoy_efficiency", "raid_loss", "ships_lost")
+
+
+def coastal_regions(provinces: ProvinceStore, sea_regions: np.ndarray) -> np.ndarray:
+    """Index into ``sea_regions`` of each land province's first sea neighbour, or -1."""
+    src, dst = provinces.adj_sources, provinces.adj_targets
+    coastal = ~provinces.is_sea[src] & provinces.is_sea[dst]
+    out = np.full(len(provinces), -1, dtype=np.int32)
+    # Reversed so the first sea neighbour in CSR order is written last and wins.
+    edges = np.flatnonzero(coastal)[::-1]
+    out[src[edges]] = np.searchsorted(sea_regions, provinces.region[dst[edges]])
+    return out
+
+
+class NavalTable:
+    """Dense array table of every country's task forces.
+
+    Task forces are packed into rows ``[0, count)``; removing one (sunk)
+    moves the last row into the freed slot, so row indices are not stable
+    across :meth:`remove`.
+    """
+
+    def __init__(
+        self,
+        provinces: ProvinceStore,
+        n_countries: int,
+        pathfinder: Pathfinder,
+        capacity: int = 256,
+    ) -> None:
+        self.count = 0
+        self.country = np.zeros(capacity, dtype=np.int16)
+        self.region = np.zeros(capacity, dtype=np.int32)
+        self.mission = np.zeros(capacity, dtype=np.uint8)
+        self.ship_class = np.zeros(capacity, dtype=np.uint8)
+        self.ships = np.zeros(capacity, dtype=np.int32)
+        self.strength = np.zeros(capacity, dtype=np.float64)
+        self.contact = np.zeros(capacity, dtype=np.float64)
+        self.at_sea = np.zeros(capacity, dtype=np.bool_)
+        # Hours of sailing left before arriving in ``region``.
+        self.transit = np.zeros(capacity, dtype=np.int32)
+
+        self.n_countries = n_countries
+        # Share of convoys that arrived yesterday, and today's losses so far.
+        self.convoy_efficiency = np.ones(n_countries, dtype=np.float64)
+        self.raid_loss = np.zeros(n_countries, dtype=np.float64)
+        self.ships_lost = np.zeros(n_countries, dtype=np.int64)
+
+        self.provinces = provinces
+        self.sea_regions = np.unique(provinces.region[provinces.is_sea])
+        self.port_region = coastal_regions(provinces, self.sea_regions)
+        self.pathfinder = pathfinder
+        self.anchor = self._anchors()
+        # (from, to) region -> transit hours, or -1 with no sea route.
+        self._passage: dict[tuple[int, int], int] = {}
+        provinces.subscribe("impassable", lambda ids: self._passage.clear())
+        self.exposure = np.zeros((len(self.sea_regions), n_countries), dtype=np.float64)
+        self.update_exposure()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        return len(self.country)
+
+    @classmethod
+    def starting(
+        cls, provinces: ProvinceStore, n_countries: int, pathfinder: Pathfinder
+    ) -> NavalTable:
+        """Task forces at every port, sized by its naval base level."""
+        table = cls(provinces, n_countries, pathfinder)
+        ports = np.flatnonzero((provinces.naval_base > 0) & (table.port_region >= 0))
+        for port in ports.tolist():
+            country = int(provinces.controller[port])
+            if country < 0:
+                continue
+            region = int(table.port_region[port])
+            level = int(provinces.naval_base[port])
+            table.add(country, region, Mission.PATROL, ShipClass.DESTROYER, 2 * level)
+            table.add(country, region, Mission.CONVOY_RAIDING, ShipClass.SUBMARINE, 2 * level)
+            if level >= 2:
+                table.add(country, region, Mission.STRIKE_FORCE, ShipClass.LIGHT_CRUISER, level)
+            if level >= 3:
+                table.add(country, region, Mission.STRIKE_FORCE, ShipClass.BATTLESHIP, 1)
+        return table
+
+    def _anchors(self) -> np.ndarray:
+        """The sea province nearest the centre of each sea region."""
+        p = self.provinces
+        sea = np.flatnonzero(p.is_sea)
+        region = np.searchsorted(self.sea_regions, p.region[sea])
+        count = np.bincount(region, minlength=len(self.sea_regions))
+        cx = np.bincount(region, weights=p.x[sea], minlength=len(count)) / count
+        cy = np.bincount(region, weights=p.y[sea], minlength=len(count)) / count
+        d2 = (p.x[sea] - cx[region]) ** 2 + (p.y[sea] - cy[region]) ** 2
+        # Nearest per region: sort by (region, distance), keep each region's first.
+        order = np.lexsort((sea, d2, region))
+        first = np.flatnonzero(np.r_[True, region[order][1:] != region[order][:-1]])
+        return sea[order[first]].astype(np.int32)
+
+    def passage(self, start: int, goal: int) -> int:
+        """Hours to sail from region ``start`` to region ``goal``, or -1 if no route."""
+        key = (start, goal)
+        hours = self._passage.get(key)
+        if hours is None:
+            route = self.pathfinder.route(
+                int(self.anchor[start]), int(self.anchor[goal]), MovementClass.NAVAL
+            )
+            if route is None:
+                hours = -1
+            else:
+                hours = int(np.ceil(self.pathfinder.length(route) / FLEET_SPEED))
+            self._passage[key] = hours
+        return hours
+
+    # -- task forces -------------------------------------------------------
+
+    def _grow(self) -> None:
+        new = self.capacity * 2
+        for name in ROW_FIELDS:
+            old = getattr(self, name)
+            grown = np.zeros(new, dtype=old.dtype)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+
+    def add(self, country: int, region: int, mission: int, ship_class: int, ships: int) -> int:
+        if not 0 <= region < len(self.sea_regions):
+            raise ValueError(f"sea region {region} is not in 0..{len(self.sea_regions) - 1}")
+        if ships <= 0:
+            raise ValueError(f"a task force needs ships, not {ships}")
+        if self.count == self.capacity:
+            self._grow()
+        row = self.count
+        self.count += 1
+        self.country[row] = country
+        self.region[row] = region
+        self.mission[row] = mission
+        self.ship_class[row] = ship_class
+        self.ships[row] = ships
+        self.strength[row] = ships * HULL[ship_class]
+        self.contact[row] = 0.0
+        self.at_sea[row] = True
+        self.transit[row] = 0
+        return row
+
+    def assign(self, row: int, mission: int, region: int | None = None) -> bool:
+        """Change a task force's mission and, optionally, sail it to another sea region.
+
+        Returns False, leaving the region as it was, if there is no sea route there.
+        """
+        self.mission[row] = mission
+        if region is None or region == self.region[row]:
+            return True
+        hours = self.passage(int(self.region[row]), region)
+        if hours < 0:
+            return False
+        self.region[row] = region
+        self.contact[row] = 0.0
+        self.transit[row] = hours
+        return True
+
+    def remove(self, row: int) -> None:
+        last = self.count - 1
+        if row != last:
+            for name in ROW_FIELDS:
+                column = getattr(self, name)
+                column[row] = column[last]
+        self.count = last
+
+    def fleets_of(self, country: int) -> np.ndarray:
+        return np.flatnonzero(self.country[: self.count] == country)
+
+    def afloat(self) -> np.ndarray:
+        """Ships still afloat per country."""
+        n = self.count
+        alive = np.ceil(self.strength[:n] / HULL[self.ship_class[:n]])
+        return np.bincount(self.country[:n], weights=alive, minlength=self.n_countries)
+
+    # -- convoys -----------------------------------------------------------
+
+    def update_exposure(self) -> None:
+        """Ports per (sea region, country): where each country's convoys sail."""
+        p = self.provinces
+        ports = np.flatnonzero((p.naval_base > 0) & (p.controller >= 0) & (self.port_region >= 0))
+        cells = self.port_region[ports].astype(np.intp) * self.n_countries + p.controller[ports]
+        self.exposure[:] = np.bincount(cells, minlength=self.exposure.size).reshape(
+            self.exposure.shape
+        )
+
+    def end_day(self, hostile: np.ndarray) -> None:
+        """Turn the day's convoy losses into efficiency and send raiders after convoys."""
+        sailing = self.exposure.sum(axis=0)
+        lost = self.raid_loss / np.maximum(24.0 * sailing, 1e-9)
+        self.convoy_efficiency[:] = np.clip(1.0 - lost, 0.0, 1.0)
+        self.raid_loss[:] = 0.0
+        self.update_exposure()
+
+        n = self.count
+        targets = self.exposure @ hostile.astype(np.float64)
+        best = np.argmax(targets, axis=0)
+        has_target = targets[best, np.arange(self.n_countries)] > 0
+        country = self.country[:n]
+        moving = (self.mission[:n] == Mission.CONVOY_RAIDING) & has_target[country]
+        moving &= (self.region[:n] != best[country]) & (self.transit[:n] == 0)
+        for row in np.flatnonzero(moving).tolist():
+            self.assign(row, Mission.CONVOY_RAIDING, int(best[country[row]]))
+
+    # -- hourly step -------------------------------------------------------
+
+    def step(self, hostile: np.ndarray) -> None:
+        """One hour of spotting, engagement, damage and raiding in every sea region."""
+        n = self.count
+        if n == 0:
+            return
+        c, r = self.n_countries, len(self.sea_regions)
+        war = hostile.astype(np.float64)
+        country = self.country[:n].astype(np.intp)
+        cell = self.region[:n].astype(np.intp) * c + country
+        ship_class = self.ship_class[:n]
+        mission = self.mission[:n]
+        at_sea = self.at_sea[:n]
+        transit = self.transit[:n]
+        # Task forces still sailing to their region take no part in it.
+        on_station = at_sea & (transit == 0)
+        np.maximum(transit - 1, 0, out=transit)
+        strength = self.strength[:n]
+        contact = self.contact[:n]
+        full = self.ships[:n] * HULL[ship_class]
+        alive = strength / HULL[ship_class]
+
+        def per_cell(weights: np.ndarray) -> np.ndarray:
+            return np.bincount(cell, weights=weights, minlength=r * c).reshape(r, c)
+
+        # 1. spotting
+        spotting = alive * SPOTTING[ship_class] * MISSION_SPOTTING[mission]
+        spot = per_cell(np.where(on_station, spotting, 0.0))
+        enemy_spot = spot @ war
+        seen = enemy_spot.reshape(-1)[cell] * alive * VISIBILITY[ship_class]
+        contact += seen / (seen + SPOT_HALF)
+        contact[(seen == 0.0) | ~on_station] = 0.0
+        engaged = on_station & (contact >= 1.0)
+        np.minimum(contact, 1.0, out=contact)
+
+        # 2-4. engagement, positioning and damage
+        if engaged.any():
+            position = 0.75 + 0.5 * spot / np.maximum(spot + enemy_spot, 1e-9)
+            firepower = alive * ATTACK[ship_class] * MISSION_ATTACK[mission]
+            fire = per_cell(np.where(engaged, firepower, 0.0)) * position
+            facing = per_cell(np.where(engaged, strength, 0.0)) @ war
+            per_hull = np.divide(fire, facing, out=np.zeros_like(fire), where=facing > 0) @ war
+            strength -= np.where(engaged, strength * per_hull.reshape(-1)[cell], 0.0)
+            np.maximum(strength, 0.0, out=strength)
+            # Hull lost beyond a whole ship sinks it for good; the rest is repairable.
+            ships = self.ships[:n]
+            afloat = np.minimum(np.ceil(strength / HULL[ship_class]), ships).astype(np.int32)
+            self.ships_lost += np.bincount(country, weights=ships - afloat, minlength=c).astype(
+                np.int64
+            )
+            ships[:] = afloat
+            retreat = engaged & (strength < RETREAT_AT * full)
+            at_sea[retreat] = False
+            contact[retreat] = 0.0
+
+        # Repair in port; back to sea once whole.
+        docked = ~at_sea
+        if docked.any():
+            full = self.ships[:n] * HULL[ship_class]
+            repaired = strength[docked] + REPAIR_RATE * full[docked]
+            strength[docked] = np.minimum(repaired, full[docked])
+            at_sea[docked & (strength >= full)] = True
+
+        # Convoy raiding by raiders the enemy has not pinned down.
+        raiding = on_station & ~engaged & (mission == Mission.CONVOY_RAIDING)
+        escorting = on_station & (mission != Mission.CONVOY_RAIDING)
+        raid = per_cell(np.where(raiding, alive * ATTACK[ship_class], 0.0)) @ war
+        escort = per_cell(np.where(escorting, alive * ATTACK[ship_class], 0.0))
+        loss = RAID_LOSS * raid / (raid + escort + CONVOY_SCREEN)
+        self.raid_loss += (loss * self.exposure).sum(axis=0)
+
+        # Sunk task forces, highest row first so swap-removal never moves a pending one.
+        for row in np.flatnonzero(self.ships[:n] == 0)[::-1].tolist():
+            self.remove(row)
+
+    # -- persistence -------------------------------------------------------
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Active task force rows and per-country convoy arrays, by name."""
+        columns = {name: getattr(self, name)[: self.count] for name in ROW_FIELDS}
+        for name in COUNTRY_FIELDS:
+            columns[name] = getattr(self, name)
+        return columns
+
+    def restore(self, columns: dict[str, np.ndarray]) -> None:
+        """Replace every task force and country array with saved ``columns``."""
+        count = len(columns["country"])
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        for name in ROW_FIELDS:
+            column = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            column[:count] = columns[name]
+            setattr(self, name, column)
+        for name in COUNTRY_FIELDS:
+            getattr(self, name)[:] = columns[name]
+        self.count = count
+        self.update_exposure()
+
+
+def naval_system(world: World) -> None:
+    """Hourly system: resolve an hour at sea in every region at once."""
+    world.navy.step(world.fronts.hostile)
+
+
+def convoy_system(world: World) -> None:
+    """Daily system: settle convoy losses and pass them on to trade and port supply."""
+    navy = world.navy
+    navy.end_day(world.fronts.hostile)
+    world.production.convoy_efficiency[:] = navy.convoy_efficiency
+    world.supply.set_port_efficiency(navy.convoy_efficiency)
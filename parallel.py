@@ -0,0 +1,218 @@
+"""Deterministic multi-core stepping over world partitions.
+
+Per-country work (production, research, construction, AI evaluation) is
+split into a fixed set of partitions that depends only on the world, never on
+the worker count.  Each partition runs a *kernel* -- a module-level function
+``kernel(arrays, countries, rng) -> result`` -- against read-only views of a
+:class:`SharedSnapshot`, and results come back in partition order so the
+caller merges them the same way every time.  Every partition gets its own
+generator seeded from ``(world seed, tick, partition index)``.
+
+Together these make a run bit-identical whether it uses one process or
+many: ``workers=1`` runs the same kernels inline without a pool.
+
+Systems call :meth:`ParallelStepper.run`, which splits the world into
+:data:`PARTITIONS` partitions and keeps one snapshot per calling system, so
+its shared-memory blocks are reused from one day to the next.  A kernel
+that draws no random numbers computes each country from that country's
+rows alone, so its results do not depend on how countries are grouped:
+with one worker it runs once over every country, saving the per-call
+overhead of the partitions.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from world import World
+
+Kernel = Callable[[dict[str, np.ndarray], np.ndarray, np.random.Generator], Any]
+Handle = dict[str, tuple[str, tuple[int, ...], str]]
+# Runs a kernel for a system: (system name, kernel, arrays) -> results in partition order.
+Runner = Callable[[str, Kernel, dict[str, np.ndarray]], list[Any]]
+
+# Partitions per-country work is split into, whatever the worker count.
+PARTITIONS = 8
+
+# Shared-memory blocks this process has attached to, by block name.
+_attached: dict[str, shared_memory.SharedMemory] = {}
+
+
+class SharedSnapshot:
+    """Named arrays copied into shared memory, attachable from worker processes."""
+
+    def __init__(self, arrays: dict[str, np.ndarray]) -> None:
+        self._blocks: dict[str, shared_memory.SharedMemory] = {}
+        self._views: dict[str, np.ndarray] = {}
+        self.handle: Handle = {}
+        self.refresh(arrays)
+
+    def refresh(self, arrays: dict[str, np.ndarray]) -> None:
+        """Copy new contents in, reusing blocks whose shape and dtype still match."""
+        for name, array in arrays.items():
+            view = self._views.get(name)
+            if view is None or view.shape != array.shape or view.dtype != array.dtype:
+                self._release(name)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+                self._blocks[name] = block
+                self._views[name] = view
+                self.handle[name] = (block.name, array.shape, array.dtype.str)
+            view[...] = array
+
+    @property
+    def arrays(self) -> dict[str, np.ndarray]:
+        return self._views
+
+    def _release(self, name: str) -> None:
+        block = self._blocks.pop(name, None)
+        self._views.pop(name, None)
+        self.handle.pop(name, None)
+        if block is not None:
+            block.close()
+            block.unlink()
+
+    def close(self) -> None:
+        for name in list(self._blocks):
+            self._release(name)
+
+    def __enter__(self) -> SharedSnapshot:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def attach(handle: Handle) -> dict[str, np.ndarray]:
+    """Read-only views of a snapshot inside a worker process."""
+    views = {}
+    for name, (block_name, shape, dtype) in handle.items():
+        block = _attached.get(block_name)
+        if block is None:
+            block = shared_memory.SharedMemory(name=block_name)
+            _attached[block_name] = block
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        view.flags.writeable = False
+        views[name] = view
+    return views
+
+
+def partition_seed(seed: int, tick: int, index: int) -> np.random.SeedSequence:
+    return np.random.SeedSequence([seed, tick, index])
+
+
+def _run_partition(
+    kernel: Kernel, handle: Handle, countries: np.ndarray, seed: np.random.SeedSequence
+) -> Any:
+    return kernel(attach(handle), countries, np.random.default_rng(seed))
+
+
+def _inline(
+    kernel: Kernel,
+    arrays: dict[str, np.ndarray],
+    partitions: Sequence[np.ndarray],
+    seed: int,
+    tick: int,
+) -> list[Any]:
+    """Run ``kernel`` on every partition in this process, on read-only views."""
+    views = {}
+    for name, array in arrays.items():
+        views[name] = view = np.asarray(array).view()
+        view.flags.writeable = False
+    return [
+        kernel(views, countries, np.random.default_rng(partition_seed(seed, tick, i)))
+        for i, countries in enumerate(partitions)
+    ]
+
+
+def serial(n_countries: int) -> Runner:
+    """A runner for tables stepped outside a world: one partition of every country."""
+    everyone = np.arange(n_countries)
+
+    def run(name: str, kernel: Kernel, arrays: dict[str, np.ndarray]) -> list[Any]:
+        return _inline(kernel, arrays, [everyone], 0, 0)
+
+    return run
+
+
+def partition_countries(world: World, parts: int) -> list[np.ndarray]:
+    """Split countries into ``parts`` groups of neighbours, ordered by capital region."""
+    order = np.argsort(world.provinces.region[world.capitals], kind="stable")
+    return [chunk for chunk in np.array_split(order, parts) if len(chunk)]
+
+
+class ParallelStepper:
+    """Runs kernels over partitions, inline or on a process pool."""
+
+    def __init__(self, workers: int = 1) -> None:
+        self.workers = max(1, workers)
+        self._pool: ProcessPoolExecutor | None = None
+        self._snapshots: dict[str, SharedSnapshot] = {}
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def map(
+        self,
+        kernel: Kernel,
+        snapshot: SharedSnapshot,
+        partitions: Sequence[np.ndarray],
+        seed: int,
+        tick: int,
+    ) -> list[Any]:
+        """Run ``kernel`` on every partition; results are in partition order."""
+        if self.workers == 1:
+            return _inline(kernel, snapshot.arrays, partitions, seed, tick)
+        seeds = [partition_seed(seed, tick, i) for i in range(len(partitions))]
+        pool = self._executor()
+        handles = [snapshot.handle] * len(partitions)
+        kernels = [kernel] * len(partitions)
+        return list(pool.map(_run_partition, kernels, handles, partitions, seeds))
+
+    def run(
+        self,
+        world: World,
+        name: str,
+        kernel: Kernel,
+        arrays: dict[str, np.ndarray],
+        random: bool = False,
+    ) -> list[Any]:
+        """Run ``kernel`` over the world's partitions against ``arrays``.
+
+        ``name`` identifies the caller, whose snapshot is refreshed in place;
+        with one worker the kernels read ``arrays`` directly, in a single
+        call unless the kernel uses its generator (``random``).
+        """
+        partitions = partition_countries(world, PARTITIONS)
+        if self.workers == 1:
+            if not random:
+                partitions = [np.concatenate(partitions)]
+            return _inline(kernel, arrays, partitions, world.seed, world.clock.hour)
+        snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            snapshot = self._snapshots[name] = SharedSnapshot(arrays)
+        else:
+            snapshot.refresh(arrays)
+        return self.map(kernel, snapshot, partitions, world.seed, world.clock.hour)
+
+    def runner(self, world: World) -> Runner:
+        """:meth:`run` bound to ``world`` for kernels without randomness, as a :data:`Runner`."""
+        return lambda name, kernel, arrays: self.run(world, name, kernel, arrays)
+
+    def close(self) -> None:
+        for snapshot in self._snapshots.values():
+            snapshot.close()
+        self._snapshots.clear()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
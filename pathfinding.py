@@ -0,0 +1,409 @@
+"""Hierarchical A* over the province graph with an LRU route cache.
+
+Searches run in two levels.  A small A* over the strategic-region graph picks
+a corridor of regions between start and goal; the province-level A* is then
+confined to that corridor (the region path plus its neighbouring regions),
+so it only ever touches a sliver of the map.  If the corridor turns out to be
+blocked, the province search is retried unconfined.
+
+Land routes stay inside territory held by the controller of the start
+province and may only leave it to enter the goal itself.  Naval routes use
+sea provinces; the start and goal may be coastal land (ports).
+
+Orders (:meth:`Pathfinder.routes`) are routed differently: one backward
+Dijkstra from the goal, stopping once every start in the batch is settled,
+instead of one A* per unit.  Its routes follow a single shortest-path tree
+per goal, so the rest of such a route from any province on it is the route
+a new backward search from that province returns.  A marching division can
+therefore keep its route and walk it, and a division loaded from a save
+(which keeps no routes) is routed onto the same provinces.  These routes are
+cached apart from :meth:`Pathfinder.route`'s, whose corridor-confined A*
+may find a different path of equal or higher cost.
+
+Finished routes are cached per ``(start, goal, kind)``.  Every cached entry
+is indexed by the regions its search depended on (the corridor, or for an
+unconfined or backward search every region it settled, each plus its
+neighbours), and a change of control or passability in a province evicts
+exactly the entries indexed under that province's region.  Eviction is as
+precise as that index: a corridor search that failed and fell back to an
+unconfined one is indexed by the fallback's regions only, so a change that
+would reopen the corridor leaves the fallback's route cached, and a cached
+:meth:`Pathfinder.route` can then differ from a fresh search.  Nothing kept
+in a save depends on those routes.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Iterable
+
+import numpy as np
+
+from provinces import EDGE_RIVER, ProvinceStore, Terrain
+
+# Multiplier on edge length for entering a province of each terrain.
+MOVE_COST = np.array([1.0, 1.25, 1.5, 2.0, 1.5, 1.6, 1.1, 1.0, 1.0], dtype=np.float64)
+assert len(MOVE_COST) == len(Terrain)
+RIVER_COST = 0.5
+
+Route = tuple[int, ...]
+RouteKey = tuple[int, int, int]
+
+
+class MovementClass(IntEnum):
+    LAND = 0
+    NAVAL = 1
+
+
+# Added to the movement class in the keys of routes from the backward search.
+BATCHED = len(MovementClass)
+
+
+class Pathfinder:
+    def __init__(self, provinces: ProvinceStore, cache_size: int = 4096) -> None:
+        self.provinces = provinces
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[RouteKey, Route | None] = OrderedDict()
+        self._by_region: dict[int, set[RouteKey]] = {}
+        self._corridors: dict[RouteKey, tuple[int, ...]] = {}
+        self._failed: set[RouteKey] = set()
+
+        # Python mirrors of the hot columns; list indexing beats NumPy
+        # scalar access by an order of magnitude inside the search loop.
+        self._x = provinces.x.astype(np.float64).tolist()
+        self._y = provinces.y.astype(np.float64).tolist()
+        self._region = provinces.region.tolist()
+        self._sea = provinces.is_sea.tolist()
+        self._ctrl = provinces.controller.tolist()
+        self._blocked = provinces.impassable.tolist()
+        self._build_edges()
+        self._build_regions()
+
+        provinces.subscribe("controller", self._on_control_changed)
+        provinces.subscribe("impassable", self._on_passability_changed)
+
+    # -- precomputation ----------------------------------------------------
+
+    def _build_edges(self) -> None:
+        p = self.provinces
+        src, dst = p.adj_sources, p.adj_targets
+        length = np.hypot(p.x[dst] - p.x[src], p.y[dst] - p.y[src]).astype(np.float64)
+        river = (p.adj_flags & EDGE_RIVER) != 0
+        cost = length * (MOVE_COST[p.terrain[dst]] + np.where(river, RIVER_COST, 0.0))
+        offsets = p.adj_offsets.tolist()
+        targets = dst.tolist()
+        costs = cost.tolist()
+        self._adj = [
+            list(zip(targets[offsets[i] : offsets[i + 1]], costs[offsets[i] : offsets[i + 1]]))
+            for i in range(len(p))
+        ]
+        # Reverse adjacency: for each province, (predecessor, cost predecessor -> it).
+        self._radj: list[list[tuple[int, float]]] = [[] for _ in range(len(p))]
+        for s, d, c in zip(src.tolist(), targets, costs):
+            self._radj[d].append((s, c))
+
+    def _build_regions(self) -> None:
+        """Region centroids and the region adjacency graph of each movement class."""
+        p = self.provinces
+        n_regions = int(p.region.max()) + 1
+        counts = np.bincount(p.region, minlength=n_regions).clip(min=1)
+        self._rx = (np.bincount(p.region, weights=p.x, minlength=n_regions) / counts).tolist()
+        self._ry = (np.bincount(p.region, weights=p.y, minlength=n_regions) / counts).tolist()
+        open_ = ~p.impassable
+        src, dst = p.adj_sources, p.adj_targets
+        ra, rb = p.region[src], p.region[dst]
+        self._region_adj: list[list[set[int]]] = []
+        for movement in MovementClass:
+            usable = open_ & (p.is_sea if movement is MovementClass.NAVAL else ~p.is_sea)
+            mask = (ra != rb) & usable[src] & usable[dst]
+            graph: list[set[int]] = [set() for _ in range(n_regions)]
+            for a, b in zip(ra[mask].tolist(), rb[mask].tolist()):
+                graph[a].add(b)
+            self._region_adj.append(graph)
+
+    # -- invalidation ------------------------------------------------------
+
+    def _evict_regions(self, ids: np.ndarray) -> None:
+        for region in set(self.provinces.region[ids].tolist()):
+            for key in self._by_region.pop(region, ()):
+                self._forget(key)
+        # Failed searches carry no corridor and may succeed after any change.
+        for key in list(self._failed):
+            self._forget(key)
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        ctrl = self._ctrl
+        for i, c in zip(ids.tolist(), self.provinces.controller[ids].tolist()):
+            ctrl[i] = c
+        self._evict_regions(ids)
+
+    def _on_passability_changed(self, ids: np.ndarray) -> None:
+        blocked = self._blocked
+        for i, b in zip(ids.tolist(), self.provinces.impassable[ids].tolist()):
+            blocked[i] = b
+        self._build_regions()
+        self._evict_regions(ids)
+
+    def _forget(self, key: RouteKey) -> None:
+        self._cache.pop(key, None)
+        self._failed.discard(key)
+        for region in self._corridors.pop(key, ()):
+            keys = self._by_region.get(region)
+            if keys is not None:
+                keys.discard(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._by_region.clear()
+        self._corridors.clear()
+        self._failed.clear()
+
+    # -- queries -----------------------------------------------------------
+
+    def route(
+        self, start: int, goal: int, movement: MovementClass = MovementClass.LAND
+    ) -> Route | None:
+        """Province ids from ``start`` to ``goal`` inclusive, or None if unreachable."""
+        key = (start, goal, int(movement))
+        cache = self._cache
+        if key in cache:
+            cache.move_to_end(key)
+            self.hits += 1
+            return cache[key]
+        self.misses += 1
+        corridor = self._region_corridor(start, goal, movement)
+        route = None
+        if corridor is not None:
+            route = self._search(start, goal, movement, set(corridor))
+        if route is None:
+            explored: set[int] = set()
+            route = self._search(start, goal, movement, None, explored)
+            corridor = self._widen(explored, movement)
+        self._store(key, route, corridor)
+        return route
+
+    def step_cost(self, a: int, b: int) -> float:
+        """Cost of moving from ``a`` into its neighbour ``b`` (km, terrain-weighted)."""
+        for nxt, cost in self._adj[a]:
+            if nxt == b:
+                return cost
+        raise ValueError(f"provinces {a} and {b} are not adjacent")
+
+    def length(self, route: Route) -> float:
+        """Total cost of ``route``."""
+        return sum(self.step_cost(a, b) for a, b in zip(route, route[1:]))
+
+    def routes(
+        self, starts: Iterable[int], goal: int, movement: MovementClass = MovementClass.LAND
+    ) -> list[Route | None]:
+        """Routes from each of ``starts`` to one shared ``goal``, from the backward search."""
+        starts = [int(s) for s in starts]
+        found: dict[int, Route | None] = {}
+        pending: dict[int, list[int]] = {}
+        cache = self._cache
+        kind = int(movement) + BATCHED
+        for start in dict.fromkeys(starts):
+            key = (start, goal, kind)
+            if key in cache:
+                cache.move_to_end(key)
+                self.hits += 1
+                found[start] = cache[key]
+            else:
+                group = -1 if movement is MovementClass.NAVAL else self._ctrl[start]
+                pending.setdefault(group, []).append(start)
+        for group in pending.values():
+            self.misses += len(group)
+            batch, corridor = self._search_back(group, goal, movement)
+            for start in group:
+                route = batch.get(start)
+                self._store((start, goal, kind), route, corridor if route else None)
+                found[start] = route
+        return [found[s] for s in starts]
+
+    def holds(self, route: Route, movement: MovementClass = MovementClass.LAND) -> bool:
+        """Whether ``route``, from :meth:`routes`, is still cached, so still the route."""
+        key = (route[0], route[-1], int(movement) + BATCHED)
+        if self._cache.get(key) is not route:
+            return False
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return True
+
+    def _store(self, key: RouteKey, route: Route | None, corridor: tuple[int, ...] | None) -> None:
+        if route is not None:
+            if corridor is None:
+                # Unconfined search: the route may depend on any region it crossed.
+                corridor = tuple(set(self._region[p] for p in route))
+            self._corridors[key] = corridor
+            for region in corridor:
+                self._by_region.setdefault(region, set()).add(key)
+        else:
+            self._failed.add(key)
+        self._cache[key] = route
+        if len(self._cache) > self.cache_size:
+            oldest = next(iter(self._cache))
+            self._forget(oldest)
+
+    def _region_corridor(
+        self, start: int, goal: int, movement: MovementClass
+    ) -> tuple[int, ...] | None:
+        """Region path from start to goal plus its neighbours, or None."""
+        graph = self._region_adj[movement]
+        rs, rg = self._region[start], self._region[goal]
+        if movement is MovementClass.NAVAL:
+            # Ports sit in land regions; enter the sea graph at an adjacent sea region.
+            rs = self._adjacent_sea_region(start)
+            rg = self._adjacent_sea_region(goal)
+            if rs is None or rg is None:
+                return None
+        rx, ry = self._rx, self._ry
+        gx, gy = rx[rg], ry[rg]
+        best = {rs: 0.0}
+        parent = {rs: rs}
+        heap = [(0.0, rs)]
+        while heap:
+            _, r = heapq.heappop(heap)
+            if r == rg:
+                break
+            base = best[r]
+            for nxt in graph[r]:
+                cost = base + math.hypot(rx[nxt] - rx[r], ry[nxt] - ry[r])
+                if cost < best.get(nxt, math.inf):
+                    best[nxt] = cost
+                    parent[nxt] = r
+                    heapq.heappush(heap, (cost + math.hypot(gx - rx[nxt], gy - ry[nxt]), nxt))
+        else:
+            return None
+        path = [rg]
+        while path[-1] != rs:
+            path.append(parent[path[-1]])
+        corridor = set(path)
+        for r in path:
+            corridor.update(graph[r])
+        corridor.add(self._region[start])
+        corridor.add(self._region[goal])
+        return tuple(sorted(corridor))
+
+    def _passable(self, node: int, movement: MovementClass, owner: int) -> bool:
+        if self._blocked[node]:
+            return False
+        if movement is MovementClass.NAVAL:
+            return self._sea[node]
+        return not self._sea[node] and self._ctrl[node] == owner
+
+    def _search_back(
+        self, starts: list[int], goal: int, movement: MovementClass
+    ) -> tuple[dict[int, Route], tuple[int, ...]]:
+        """Backward Dijkstra from ``goal`` until every start is settled.
+
+        Returns the routes found and the regions the result depends on: every
+        settled region plus its neighbours, mirroring the corridor of
+        :meth:`_region_corridor`.
+        """
+        radj, sea, blocked, ctrl = self._radj, self._sea, self._blocked, self._ctrl
+        naval = movement is MovementClass.NAVAL
+        owner = -1 if naval else ctrl[starts[0]]
+        targets = set(starts)
+        remaining = len(targets)
+        best = {goal: 0.0}
+        parent = {goal: goal}
+        closed = set()
+        heap = [(0.0, goal)]
+        push, pop = heapq.heappush, heapq.heappop
+        while heap and remaining:
+            base, node = pop(heap)
+            if node in closed:
+                continue
+            closed.add(node)
+            if node in targets:
+                remaining -= 1
+                if node != goal and not self._passable(node, movement, owner):
+                    continue  # a port or foreign start: reachable, but not a waypoint
+            for prev, step in radj[node]:
+                if prev not in targets:
+                    if blocked[prev] or sea[prev] != naval:
+                        continue
+                    if not naval and ctrl[prev] != owner:
+                        continue
+                cost = base + step
+                if cost < best.get(prev, math.inf):
+                    best[prev] = cost
+                    parent[prev] = node
+                    push(heap, (cost, prev))
+        routes = {}
+        for start in starts:
+            if start in closed:
+                path = [start]
+                while path[-1] != goal:
+                    path.append(parent[path[-1]])
+                routes[start] = tuple(path)
+        return routes, self._widen(closed, movement)
+
+    def _widen(self, settled: set[int], movement: MovementClass) -> tuple[int, ...]:
+        """Regions of ``settled`` provinces plus their neighbours."""
+        graph = self._region_adj[movement]
+        region = self._region
+        corridor = {region[v] for v in settled}
+        for r in list(corridor):
+            corridor.update(graph[r])
+        return tuple(sorted(corridor))
+
+    def _adjacent_sea_region(self, province: int) -> int | None:
+        if self._sea[province]:
+            return self._region[province]
+        for nxt, _ in self._adj[province]:
+            if self._sea[nxt]:
+                return self._region[nxt]
+        return None
+
+    def _search(
+        self,
+        start: int,
+        goal: int,
+        movement: MovementClass,
+        corridor: set[int] | None,
+        explored: set[int] | None = None,
+    ) -> Route | None:
+        """A* from ``start``; ``explored``, if given, receives every settled province."""
+        adj, region, sea, blocked = self._adj, self._region, self._sea, self._blocked
+        ctrl = self._ctrl
+        xs, ys = self._x, self._y
+        gx, gy = xs[goal], ys[goal]
+        naval = movement is MovementClass.NAVAL
+        owner = ctrl[start]
+        best = {start: 0.0}
+        parent = {start: start}
+        closed = explored if explored is not None else set()
+        heap = [(0.0, start)]
+        hypot = math.hypot
+        push, pop = heapq.heappush, heapq.heappop
+        while heap:
+            _, node = pop(heap)
+            if node == goal:
+                path = [goal]
+                while path[-1] != start:
+                    path.append(parent[path[-1]])
+                return tuple(reversed(path))
+            if node in closed:
+                continue
+            closed.add(node)
+            base = best[node]
+            for nxt, step in adj[node]:
+                if nxt != goal:
+                    if blocked[nxt] or sea[nxt] != naval:
+                        continue
+                    if not naval and ctrl[nxt] != owner:
+                        continue
+                    if corridor is not None and region[nxt] not in corridor:
+                        continue
+                cost = base + step
+                if cost < best.get(nxt, math.inf):
+                    best[nxt] = cost
+                    parent[nxt] = node
+                    push(heap, (cost + hypot(gx - xs[nxt], gy - ys[nxt]), nxt))
+        return None
@@ -0,0 +1,422 @@
+"""Military production: equipment lines, factories, resources and trade.
+
+Every production line of every country lives in one :class:`ProductionTable`
+(one row per line: country, equipment, assigned factories, efficiency and
+the IC accumulated towards the next unit), and a day of production for the
+whole world is a fixed sequence of array operations in
+:meth:`ProductionTable.step`:
+
+1. resource demand per country: factories × per-factory needs of the
+   equipment, summed with one flat ``bincount``;
+2. trade: each deficit is filled from the world surplus of that resource,
+   pro rata, up to :data:`RESOURCES_PER_CIV` units per civilian factory the
+   importer can spend; exporters give pro rata to their surplus and the
+   civilian factories change hands, and convoy losses
+   (:attr:`ProductionTable.convoy_efficiency`) cut what arrives;
+3. shortage: every resource unit a line's factory still lacks costs
+   :data:`RESOURCE_PENALTY` of its output;
+4. output: factories × :data:`OUTPUT_PER_FACTORY` × efficiency × shortage
+   multiplier IC is added to each line, and whole units move to the
+   country's stockpile;
+5. efficiency grows by ``EFFICIENCY_GAIN * cap**2 / efficiency`` towards
+   :data:`EFFICIENCY_CAP`.
+
+Trade couples every country, so steps 1 and 2 run on the whole world;
+steps 3 to 5 touch only a country's own lines and run as
+:func:`output_kernel` on the partitions of a :class:`parallel.ParallelStepper`.
+
+Resource deposits are a fixed function of terrain and province id, so they
+are recomputed rather than saved; the per-country totals follow province
+control through :meth:`ProvinceStore.subscribe`, and each state's
+``LOCAL_RESOURCES`` modifier through :meth:`ModifierEngine.subscribe`.
+Output is scaled by the country's ``FACTORY_OUTPUT`` modifier.
+"""
+
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from modifiers import Modifier, ModifierEngine, Scope
+from parallel import Runner, serial
+from provinces import ProvinceStore, Terrain
+
+if TYPE_CHECKING:
+    from world import World
+
+
+class Equipment(IntEnum):
+    INFANTRY_EQUIPMENT = 0
+    SUPPORT_EQUIPMENT = 1
+    ARTILLERY = 2
+    ANTI_TANK = 3
+    ANTI_AIR = 4
+    MOTORIZED = 5
+    LIGHT_TANK = 6
+    MEDIUM_TANK = 7
+    HEAVY_TANK = 8
+    FIGHTER = 9
+    CAS = 10
+    BOMBER = 11
+    CONVOY = 12
+
+
+class Resource(IntEnum):
+    OIL = 0
+    ALUMINIUM = 1
+    RUBBER = 2
+    TUNGSTEN = 3
+    STEEL = 4
+    CHROMIUM = 5
+
+
+OUTPUT_PER_FACTORY = 4.5  # IC per factory-day at 100% efficiency
+START_EFFICIENCY = 0.1
+EFFICIENCY_CAP = 0.5
+EFFICIENCY_GAIN = 0.001
+RESOURCE_PENALTY = 0.15
+RESOURCES_PER_CIV = 8.0
+MAX_FACTORIES_PER_LINE = 15
+
+# IC per unit, indexed by Equipment.
+UNIT_COST = np.array(
+    [0.5, 4.0, 3.5, 4.0, 4.0, 2.5, 8.0, 12.0, 20.0, 22.0, 23.0, 30.0, 10.0], dtype=np.float64
+)
+# Resource units per factory, Equipment × Resource (oil, aluminium, rubber,
+# tungsten, steel, chromium).
+RESOURCE_NEED = np.array(
+    [
+        [0, 0, 0, 0, 1, 0],
+        [0, 0, 0, 0, 1, 0],
+        [0, 0, 0, 0, 2, 0],
+        [0, 0, 0, 1, 1, 0],
+        [0, 0, 0, 1, 1, 0],
+        [1, 0, 1, 0, 0, 0],
+        [0, 0, 0, 1, 2, 0],
+        [0, 0, 0, 0, 2, 1],
+        [0, 0, 0, 0, 3, 2],
+        [0, 2, 1, 0, 0, 0],
+        [0, 2, 1, 0, 0, 0],
+        [0, 3, 1, 0, 0, 0],
+        [0, 0, 0, 0, 2, 0],
+    ],
+    dtype=np.float64,
+)
+# Units of each resource in a province with a deposit, Terrain × Resource.
+DEPOSIT_YIELD = np.array(
+    [
+        [0, 0, 0, 0, 2, 0],  # plains
+        [0, 0, 2, 0, 0, 0],  # forest
+        [0, 2, 0, 0, 4, 0],  # hills
+        [0, 2, 0, 3, 4, 2],  # mountain
+        [0, 0, 6, 0, 0, 0],  # jungle
+        [2, 0, 0, 0, 0, 0],  # marsh
+        [8, 0, 0, 0, 0, 1],  # desert
+        [0, 1, 0, 0, 3, 0],  # urban
+        [0, 0, 0, 0, 0, 0],  # ocean
+    ],
+    dtype=np.uint8,
+)
+DEPOSIT_CHANCE = 0.3
+
+# Share of a country's military factories given to each equipment at start.
+STARTING_MIX = np.array(
+    [0.3, 0.05, 0.12, 0.05, 0.05, 0.08, 0.05, 0.08, 0.02, 0.1, 0.05, 0.03, 0.02]
+)
+assert len(UNIT_COST) == len(RESOURCE_NEED) == len(STARTING_MIX) == len(Equipment)
+assert DEPOSIT_YIELD.shape == (len(Terrain), len(Resource))
+
+ROW_FIELDS = ("country", "equipment", "factories", "efficiency", "progress")
+COUNTRY_FIELDS = ("military_factories", "civilian_factories", "stockpile")
+
+
+def province_resources(provinces: ProvinceStore) -> np.ndarray:
+    """``(provinces, resources)`` deposit sizes; a pure function of the map."""
+    ids = np.arange(len(provinces), dtype=np.uint64)
+    # Knuth multiplicative hash: deposits stay put across saves and reloads.
+    roll = ((ids * np.uint64(2654435761)) % np.uint64(2**32)).astype(np.float64) / 2**32
+    deposits = DEPOSIT_YIELD[provinces.terrain]
+    deposits[(roll >= DEPOSIT_CHANCE) | provinces.is_sea] = 0
+    return deposits
+
+
+class ProductionTable:
+    """Dense array table of every country's production lines.
+
+    Lines are packed into rows ``[0, count)``; removing a line moves the last
+    row into the freed slot, so row indices are not stable across
+    :meth:`remove_line`.
+    """
+
+    def __init__(
+        self,
+        provinces: ProvinceStore,
+        n_countries: int,
+        modifiers: ModifierEngine,
+        capacity: int = 256,
+    ) -> None:
+        self.count = 0
+        self.country = np.zeros(capacity, dtype=np.int16)
+        self.equipment = np.zeros(capacity, dtype=np.uint8)
+        self.factories = np.zeros(capacity, dtype=np.int16)
+        self.efficiency = np.zeros(capacity, dtype=np.float64)
+        self.progress = np.zeros(capacity, dtype=np.float64)
+
+        self.n_countries = n_countries
+        self.military_factories = np.zeros(n_countries, dtype=np.int32)
+        self.civilian_factories = np.zeros(n_countries, dtype=np.int32)
+        self.stockpile = np.zeros((n_countries, len(Equipment)), dtype=np.float64)
+        # Last day's trade, in resource units and civilian factories.
+        self.imports = np.zeros((n_countries, len(Resource)), dtype=np.float64)
+        self.exports = np.zeros((n_countries, len(Resource)), dtype=np.float64)
+        self.trade_factories = np.zeros(n_countries, dtype=np.float64)
+        # Share of imports that survive the convoy routes; set by the navy.
+        self.convoy_efficiency = np.ones(n_countries, dtype=np.float64)
+
+        self.provinces = provinces
+        self.modifiers = modifiers
+        self.deposits = province_resources(provinces)
+        # Share of each province's deposits extracted, from its state's modifiers.
+        self._extraction = self._extraction_of(np.arange(len(provinces)))
+        self.resources = self._resources_of(provinces.controller, np.arange(len(provinces)))
+        self._controller = provinces.controller.copy()
+        provinces.subscribe("controller", self._on_control_changed)
+        modifiers.subscribe(Scope.STATE, self._on_state_modifiers_changed)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        return len(self.country)
+
+    @classmethod
+    def starting(
+        cls, provinces: ProvinceStore, n_countries: int, modifiers: ModifierEngine
+    ) -> ProductionTable:
+        """Factories scaled by victory points, split over :data:`STARTING_MIX`."""
+        table = cls(provinces, n_countries, modifiers)
+        vp = provinces.victory_points_by_country(n_countries)
+        table.military_factories[:] = 4 + vp // 5
+        table.civilian_factories[:] = 6 + vp // 4
+        for country in range(n_countries):
+            shares = np.floor(STARTING_MIX * table.military_factories[country]).astype(int)
+            for equipment, factories in enumerate(shares.tolist()):
+                while factories > 0:
+                    row = table.add_line(country, equipment)
+                    assigned = min(factories, MAX_FACTORIES_PER_LINE)
+                    table.assign(row, assigned)
+                    table.efficiency[row] = EFFICIENCY_CAP / 2
+                    factories -= assigned
+        return table
+
+    # -- line management ---------------------------------------------------
+
+    def _grow(self) -> None:
+        new = self.capacity * 2
+        for name in ROW_FIELDS:
+            old = getattr(self, name)
+            grown = np.zeros(new, dtype=old.dtype)
+            grown[: len(old)] = old
+            setattr(self, name, grown)
+
+    def free_factories(self) -> np.ndarray:
+        """Military factories not assigned to any line, per country."""
+        n = self.count
+        assigned = np.bincount(
+            self.country[:n], weights=self.factories[:n], minlength=self.n_countries
+        )
+        return self.military_factories - assigned.astype(np.int32)
+
+    def add_line(self, country: int, equipment: int, factories: int = 0) -> int:
+        if self.count == self.capacity:
+            self._grow()
+        row = self.count
+        self.count += 1
+        self.country[row] = country
+        self.equipment[row] = equipment
+        self.factories[row] = 0
+        self.efficiency[row] = START_EFFICIENCY
+        self.progress[row] = 0.0
+        if factories:
+            self.assign(row, factories)
+        return row
+
+    def assign(self, row: int, factories: int) -> None:
+        """Set a line's factories; added factories start at base efficiency."""
+        if not 0 <= factories <= MAX_FACTORIES_PER_LINE:
+            raise ValueError(f"a line takes 0..{MAX_FACTORIES_PER_LINE} factories, not {factories}")
+        old = int(self.factories[row])
+        added = factories - old
+        country = int(self.country[row])
+        if added > self.free_factories()[country]:
+            raise ValueError(f"country {country} has no {added} free military factories")
+        if added > 0:
+            self.efficiency[row] = (
+                self.efficiency[row] * old + START_EFFICIENCY * added
+            ) / factories
+        self.factories[row] = factories
+
+    def shed(self) -> None:
+        """Take factories off the newest lines of every country that lost factories."""
+        free = self.free_factories()
+        for country in np.flatnonzero(free < 0).tolist():
+            excess = -int(free[country])
+            for row in self.lines_of(country)[::-1].tolist():
+                taken = min(excess, int(self.factories[row]))
+                self.factories[row] -= taken
+                excess -= taken
+                if not excess:
+                    break
+
+    def remove_line(self, row: int) -> None:
+        last = self.count - 1
+        if row != last:
+            for name in ROW_FIELDS:
+                column = getattr(self, name)
+                column[row] = column[last]
+        self.count = last
+
+    def lines_of(self, country: int) -> np.ndarray:
+        return np.flatnonzero(self.country[: self.count] == country)
+
+    # -- resources ---------------------------------------------------------
+
+    def _resources_of(self, controller: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        held = controller >= 0
+        r = len(Resource)
+        flat = controller[held].astype(np.intp)[:, None] * r + np.arange(r)
+        deposits = self.deposits[ids[held]] * self._extraction[ids[held], None]
+        return np.bincount(
+            flat.ravel(), weights=deposits.ravel(), minlength=self.n_countries * r
+        ).reshape(self.n_countries, r)
+
+    def _extraction_of(self, ids: np.ndarray) -> np.ndarray:
+        state = self.provinces.state[ids]
+        local = np.zeros(len(ids), dtype=np.float64)
+        land = state >= 0
+        local[land] = self.modifiers.column(Scope.STATE, Modifier.LOCAL_RESOURCES)[state[land]]
+        return np.maximum(1.0 + local, 0.0)
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        self.resources -= self._resources_of(self._controller[ids], ids)
+        self._controller[ids] = self.provinces.controller[ids]
+        self.resources += self._resources_of(self._controller[ids], ids)
+
+    def _on_state_modifiers_changed(self, states: np.ndarray) -> None:
+        ids = self.modifiers.state_provinces(states)
+        self.resources -= self._resources_of(self._controller[ids], ids)
+        self._extraction[ids] = self._extraction_of(ids)
+        self.resources += self._resources_of(self._controller[ids], ids)
+
+    # -- daily step --------------------------------------------------------
+
+    def step(self, run: Runner | None = None) -> None:
+        """One day of trade and production for every line at once."""
+        n = self.count
+        c, r = self.n_countries, len(Resource)
+        country = self.country[:n].astype(np.intp)
+        equipment = self.equipment[:n].astype(np.intp)
+        factories = self.factories[:n].astype(np.float64)
+
+        per_factory = RESOURCE_NEED[equipment]
+        flat = country[:, None] * r + np.arange(r)
+        need = np.bincount(
+            flat.ravel(), weights=(per_factory * factories[:, None]).ravel(), minlength=c * r
+        ).reshape(c, r)
+
+        produced = self.resources
+        deficit = np.maximum(need - produced, 0.0)
+        surplus = np.maximum(produced - need, 0.0)
+        total_surplus = surplus.sum(axis=0)
+        fill = np.minimum(1.0, total_surplus / np.maximum(deficit.sum(axis=0), 1e-9))
+        imports = deficit * fill
+        units = imports.sum(axis=1)
+        budget = self.civilian_factories * RESOURCES_PER_CIV
+        imports *= np.minimum(1.0, budget / np.maximum(units, 1e-9))[:, None]
+        exports = surplus * (imports.sum(axis=0) / np.maximum(total_surplus, 1e-9))
+        self.imports = imports
+        self.exports = exports
+        self.trade_factories = (exports.sum(axis=1) - imports.sum(axis=1)) / RESOURCES_PER_CIV
+        # Paid for and shipped, but only what the convoys bring home arrives.
+        arrived = imports * self.convoy_efficiency[:, None]
+
+        missing = np.maximum(need - produced - arrived, 0.0) / np.maximum(need, 1e-9)
+        bonus = self.modifiers.column(Scope.COUNTRY, Modifier.FACTORY_OUTPUT)
+        arrays = {
+            "country": self.country[:n],
+            "equipment": self.equipment[:n],
+            "factories": self.factories[:n],
+            "efficiency": self.efficiency[:n],
+            "progress": self.progress[:n],
+            "missing": missing,
+            "output": np.maximum(1.0 + bonus, 0.0),
+        }
+        built = np.zeros(n, dtype=np.float64)
+        for rows, progress, efficiency, units in (run or serial(c))(
+            "production", output_kernel, arrays
+        ):
+            self.progress[rows] = progress
+            self.efficiency[rows] = efficiency
+            built[rows] = units
+        self.stockpile += np.bincount(
+            country * len(Equipment) + equipment, weights=built, minlength=self.stockpile.size
+        ).reshape(self.stockpile.shape)
+
+    # -- persistence -------------------------------------------------------
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Active line rows and per-country factory and stockpile arrays, by name."""
+        columns = {name: getattr(self, name)[: self.count] for name in ROW_FIELDS}
+        for name in COUNTRY_FIELDS:
+            columns[name] = getattr(self, name)
+        return columns
+
+    def restore(self, columns: dict[str, np.ndarray]) -> None:
+        """Replace every line and country array with saved ``columns``."""
+        count = len(columns["country"])
+        capacity = self.capacity
+        while capacity < count:
+            capacity *= 2
+        for name in ROW_FIELDS:
+            column = np.zeros(capacity, dtype=getattr(self, name).dtype)
+            column[:count] = columns[name]
+            setattr(self, name, column)
+        for name in COUNTRY_FIELDS:
+            getattr(self, name)[:] = columns[name]
+        self.count = count
+
+
+def output_kernel(
+    arrays: dict[str, np.ndarray], countries: np.ndarray, rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """A day's output of the lines of ``countries``, after trade.
+
+    Returns the rows and their new progress, new efficiency and units built.
+    """
+    rows = np.flatnonzero(np.isin(arrays["country"], countries))
+    country = arrays["country"][rows].astype(np.intp)
+    equipment = arrays["equipment"][rows].astype(np.intp)
+    factories = arrays["factories"][rows].astype(np.float64)
+    efficiency = arrays["efficiency"][rows]
+
+    lacking = (RESOURCE_NEED[equipment] * arrays["missing"][country]).sum(axis=1)
+    multiplier = np.maximum(1.0 - RESOURCE_PENALTY * lacking, 0.0)
+    progress = arrays["progress"][rows] + (
+        factories * OUTPUT_PER_FACTORY * efficiency * multiplier * arrays["output"][country]
+    )
+    cost = UNIT_COST[equipment]
+    built = np.floor(progress / cost)
+    progress -= built * cost
+
+    running = factories > 0
+    grown = efficiency + EFFICIENCY_GAIN * EFFICIENCY_CAP**2 / efficiency
+    efficiency = np.minimum(np.where(running, grown, efficiency), EFFICIENCY_CAP)
+    return rows, progress, efficiency, built
+
+
+def production_system(world: World) -> None:
+    """Daily system: trade, produce and grow efficiency for every line."""
+    world.production.step(world.stepper.runner(world))
@@ -0,0 +1,148 @@
+"""Span profiler with Chrome trace-event export.
+
+The scheduler records one span per tick and one per system call; events and
+AI decisions wrap their work in :func:`span`.  While the profiler is disabled
+(the default) :func:`span` returns a shared no-op context manager and the
+scheduler skips recording entirely, so instrumentation costs one attribute
+check per call.
+
+When enabled, spans are kept as complete (``"ph": "X"``) trace events that
+``chrome://tracing`` and Perfetto render as a flame chart, and are also
+aggregated per game year so :meth:`Profiler.report` can list the hottest
+spans of each year.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+
+TICK = "tick"
+SYSTEM = "system"
+EVENT = "event"
+AI = "ai"
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "category", "start")
+
+    def __init__(self, profiler: Profiler, name: str, category: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc: object) -> None:
+        end = time.perf_counter_ns()
+        self.profiler.record(self.name, self.category, self.start, end - self.start)
+
+
+class Profiler:
+    def __init__(self, max_events: int = 2_000_000) -> None:
+        self.enabled = False
+        self.max_events = max_events
+        self.hour = 0
+        self.year = 1936
+        self.dropped = 0
+        # (name, category, start_ns, duration_ns, game hour)
+        self.events: list[tuple[str, str, int, int, int]] = []
+        # year -> name -> [total_ns, calls]
+        self.by_year: dict[int, dict[str, list[int]]] = defaultdict(
+            lambda: defaultdict(lambda: [0, 0])
+        )
+        self._origin = time.perf_counter_ns()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        self.events.clear()
+        self.by_year.clear()
+        self.dropped = 0
+        self._origin = time.perf_counter_ns()
+
+    def record(self, name: str, category: str, start_ns: int, duration_ns: int) -> None:
+        if len(self.events) < self.max_events:
+            self.events.append((name, category, start_ns, duration_ns, self.hour))
+        else:
+            self.dropped += 1
+        totals = self.by_year[self.year][name]
+        totals[0] += duration_ns
+        totals[1] += 1
+
+    def span(self, name: str, category: str) -> _Span | _NullSpan:
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category)
+
+    def chrome_trace(self) -> dict:
+        """Trace-event JSON object; timestamps are microseconds since reset."""
+        origin = self._origin
+        events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - origin) / 1000.0,
+                "dur": duration / 1000.0,
+                "pid": os.getpid(),
+                "tid": 1,
+                "args": {"hour": hour},
+            }
+            for name, category, start, duration, hour in self.events
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str | os.PathLike) -> Path:
+        path = Path(path)
+        path.write_text(json.dumps(self.chrome_trace(), separators=(",", ":")))
+        return path
+
+    def report(self, top: int = 10) -> str:
+        """Hottest spans of each game year by total time (ticks excluded)."""
+        lines = []
+        for year in sorted(self.by_year):
+            spans = [
+                (name, total, calls)
+                for name, (total, calls) in self.by_year[year].items()
+                if name != TICK
+            ]
+            spans.sort(key=lambda item: item[1], reverse=True)
+            lines.append(f"{year}:")
+            for name, total, calls in spans[:top]:
+                lines.append(
+                    f"  {name:<28}{total / 1e6:>12.2f} ms{calls:>10} calls"
+                    f"{total / calls / 1e3:>10.1f} us/call"
+                )
+        if self.dropped:
+            lines.append(f"({self.dropped} spans beyond max_events kept in totals only)")
+        return "\n".join(lines)
+
+
+profiler = Profiler()
+
+
+def span(name: str, category: str = EVENT) -> _Span | _NullSpan:
+    """Time a block on the global profiler: ``with span("my_event"): ...``."""
+    return profiler.span(name, category)
@@ -0,0 +1,217 @@
+"""Struct-of-arrays province store.
+
+Every per-province attribute lives in its own contiguous NumPy column indexed
+by province id, so whole-map systems (combat, supply, attrition) can scan the
+map with a handful of vectorized operations instead of walking objects.
+
+Adjacency is stored in CSR form: the neighbours of province ``p`` are
+``adj_targets[adj_offsets[p]:adj_offsets[p + 1]]`` and ``adj_flags`` carries
+per-edge flags (rivers, straits, railways) in the same order.
+"""
+
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import Callable
+
+import numpy as np
+
+NO_COUNTRY = -1
+
+EDGE_RIVER = 1
+EDGE_STRAIT = 2
+EDGE_RAILWAY = 4
+EDGE_RAIL_DAMAGED = 8
+
+
+class Terrain(IntEnum):
+    PLAINS = 0
+    FOREST = 1
+    HILLS = 2
+    MOUNTAIN = 3
+    JUNGLE = 4
+    MARSH = 5
+    DESERT = 6
+    URBAN = 7
+    OCEAN = 8
+
+
+# Column name -> dtype.  Order is the canonical on-disk/iteration order.
+COLUMNS: dict[str, np.dtype] = {
+    "owner": np.dtype(np.int16),
+    "controller": np.dtype(np.int16),
+    "terrain": np.dtype(np.uint8),
+    "is_sea": np.dtype(np.bool_),
+    "victory_points": np.dtype(np.int16),
+    "infrastructure": np.dtype(np.uint8),
+    "supply": np.dtype(np.float32),
+    "state": np.dtype(np.int32),
+    "region": np.dtype(np.int32),
+    "impassable": np.dtype(np.bool_),
+    "supply_hub": np.dtype(np.bool_),
+    "naval_base": np.dtype(np.uint8),
+    "x": np.dtype(np.float32),
+    "y": np.dtype(np.float32),
+}
+
+ADJACENCY_COLUMNS: dict[str, np.dtype] = {
+    "adj_offsets": np.dtype(np.int32),
+    "adj_targets": np.dtype(np.int32),
+    "adj_flags": np.dtype(np.uint8),
+}
+
+
+class ProvinceStore:
+    """Column store for all land and sea provinces of the map."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, np.zeros(size, dtype=dtype))
+        self.owner.fill(NO_COUNTRY)
+        self.controller.fill(NO_COUNTRY)
+        self.state.fill(-1)
+        self.adj_offsets = np.zeros(size + 1, dtype=np.int32)
+        self.adj_targets = np.zeros(0, dtype=np.int32)
+        self.adj_flags = np.zeros(0, dtype=np.uint8)
+        self._adj_sources: np.ndarray | None = None
+        self._listeners: dict[str, list[Callable[[np.ndarray], None]]] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @classmethod
+    def from_columns(cls, columns: dict[str, np.ndarray]) -> ProvinceStore:
+        """Wrap existing arrays (e.g. memory-mapped save sections) without copying."""
+        store = cls(0)
+        store.size = len(columns["owner"])
+        for name in (*COLUMNS, *ADJACENCY_COLUMNS):
+            setattr(store, name, columns[name])
+        return store
+
+    # -- adjacency ---------------------------------------------------------
+
+    def set_adjacency(
+        self, a: np.ndarray, b: np.ndarray, flags: np.ndarray | None = None
+    ) -> None:
+        """Build the CSR adjacency from undirected edge lists ``a[i] <-> b[i]``."""
+        a = np.asarray(a, dtype=np.int32)
+        b = np.asarray(b, dtype=np.int32)
+        if flags is None:
+            flags = np.zeros(len(a), dtype=np.uint8)
+        src = np.concatenate([a, b])
+        dst = np.concatenate([b, a])
+        flg = np.concatenate([flags, flags]).astype(np.uint8)
+        order = np.lexsort((dst, src))
+        src, dst, flg = src[order], dst[order], flg[order]
+        counts = np.bincount(src, minlength=self.size)
+        self.adj_offsets = np.zeros(self.size + 1, dtype=np.int32)
+        np.cumsum(counts, out=self.adj_offsets[1:])
+        self.adj_targets = dst
+        self.adj_flags = flg
+        self._adj_sources = None
+
+    def neighbors(self, province: int) -> np.ndarray:
+        return self.adj_targets[self.adj_offsets[province] : self.adj_offsets[province + 1]]
+
+    def edge_flags(self, province: int) -> np.ndarray:
+        return self.adj_flags[self.adj_offsets[province] : self.adj_offsets[province + 1]]
+
+    @property
+    def adj_sources(self) -> np.ndarray:
+        """Source province of every CSR edge (expanded lazily, then cached)."""
+        if self._adj_sources is None:
+            degree = np.diff(self.adj_offsets)
+            self._adj_sources = np.repeat(
+                np.arange(self.size, dtype=np.int32), degree
+            )
+        return self._adj_sources
+
+    def edge_between(self, a: int, b: int) -> int:
+        """CSR index of the edge ``a -> b``, or -1 if they are not adjacent."""
+        lo, hi = self.adj_offsets[a], self.adj_offsets[a + 1]
+        i = lo + int(np.searchsorted(self.adj_targets[lo:hi], b))
+        if i < hi and self.adj_targets[i] == b:
+            return int(i)
+        return -1
+
+    def set_edge_flag(self, a: int, b: int, flag: int, on: bool = True) -> None:
+        """Set or clear ``flag`` on both directions of the edge ``a <-> b``."""
+        for u, v in ((a, b), (b, a)):
+            edge = self.edge_between(u, v)
+            if edge < 0:
+                raise KeyError(f"provinces {a} and {b} are not adjacent")
+            if on:
+                self.adj_flags[edge] |= flag
+            else:
+                self.adj_flags[edge] &= ~np.uint8(flag)
+
+    # -- change notification -----------------------------------------------
+
+    def subscribe(self, column: str, callback: Callable[[np.ndarray], None]) -> None:
+        """Call ``callback(ids)`` after :meth:`update` changes ``column``."""
+        if column not in COLUMNS:
+            raise KeyError(column)
+        self._listeners.setdefault(column, []).append(callback)
+
+    def update(self, column: str, ids: np.ndarray | int, values) -> np.ndarray:
+        """Assign ``values`` to ``column[ids]`` and notify subscribers.
+
+        Only provinces whose value actually changed are reported; they are
+        also returned.  Systems that own derived state (routes, supply,
+        fronts) must go through here rather than writing columns directly.
+        """
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        array = getattr(self, column)
+        new = np.broadcast_to(np.asarray(values, dtype=array.dtype), ids.shape)
+        changed_mask = array[ids] != new
+        changed = ids[changed_mask]
+        if len(changed):
+            array[changed] = new[changed_mask]
+            for callback in self._listeners.get(column, ()):
+                callback(changed)
+        return changed
+
+    # -- whole-map scans ---------------------------------------------------
+
+    def land_mask(self) -> np.ndarray:
+        return ~self.is_sea
+
+    def provinces_of(self, country: int, *, controlled: bool = False) -> np.ndarray:
+        column = self.controller if controlled else self.owner
+        return np.flatnonzero(column == country)
+
+    def province_counts(self, n_countries: int, *, controlled: bool = False) -> np.ndarray:
+        """Number of provinces per country, one bincount over the map."""
+        column = self.controller if controlled else self.owner
+        held = column[column >= 0]
+        return np.bincount(held, minlength=n_countries)
+
+    def victory_points_by_country(self, n_countries: int) -> np.ndarray:
+        held = self.controller >= 0
+        return np.bincount(
+            self.controller[held],
+            weights=self.victory_points[held],
+            minlength=n_countries,
+        ).astype(np.int64)
+
+    def occupied_mask(self) -> np.ndarray:
+        return (self.owner != self.controller) & (self.controller >= 0)
+
+    def contested_edges(self) -> np.ndarray:
+        """Mask over CSR edges whose endpoints have different land controllers."""
+        src, dst = self.adj_sources, self.adj_targets
+        ctrl = self.controller
+        return (ctrl[src] != ctrl[dst]) & (ctrl[src] >= 0) & (ctrl[dst] >= 0)
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """All arrays of the store by name, in canonical order."""
+        out = {name: getattr(self, name) for name in COLUMNS}
+        out.update((name, getattr(self, name)) for name in ADJACENCY_COLUMNS)
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.columns().values())
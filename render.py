@@ -0,0 +1,244 @@
+"""CPU tile renderer for political, terrain and supply map modes.
+
+The map is rasterized once into a province-id lookup texture (one ``int32``
+per pixel, ``-1`` off the map) by vectorized nearest-centroid picking through
+:class:`spatial.SpatialIndex`; zoom level ``z`` samples every ``2**z``-th
+pixel of it.  A map mode is just two per-province arrays: an RGB palette and
+a border key (neighbouring pixels with different keys are drawn darker), so
+colouring a tile is one palette gather plus two shifted comparisons.
+
+Composited tiles are cached per (mode, zoom, tile).  Each tile also knows the
+provinces it shows (including the one-pixel apron its borders look at), and
+the inverse index lists the tiles of every province.  Before drawing, the
+mode's palette and keys are recomputed for the whole map (a few vectorized
+operations) and diffed against the cached ones; only tiles showing a
+province whose colour or key changed are dropped and redrawn.
+
+Images are plain ``(height, width, 3)`` ``uint8`` arrays; :func:`write_png`
+saves them without any imaging library, so screenshots work headless.
+"""
+
+from __future__ import annotations
+
+import colorsys
+import struct
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+import numpy as np
+
+from provinces import Terrain
+from supply import CAPITAL_SUPPLY
+
+if TYPE_CHECKING:
+    from world import World
+
+TILE = 256
+BACKGROUND = np.array([12, 18, 32], dtype=np.uint8)
+SEA = np.array([38, 70, 120], dtype=np.uint8)
+BORDER_SHADE = 0.55
+
+# Indexed by Terrain.
+TERRAIN_COLORS = np.array(
+    [
+        [150, 180, 90],  # plains
+        [40, 110, 50],  # forest
+        [160, 140, 90],  # hills
+        [130, 120, 115],  # mountain
+        [20, 90, 40],  # jungle
+        [90, 120, 100],  # marsh
+        [220, 200, 140],  # desert
+        [170, 160, 160],  # urban
+        SEA.tolist(),  # ocean
+    ],
+    dtype=np.uint8,
+)
+assert len(TERRAIN_COLORS) == len(Terrain)
+
+
+def country_colors(n_countries: int) -> np.ndarray:
+    """Distinct, stable colours: hues stepped by the golden ratio."""
+    colors = np.empty((n_countries, 3), dtype=np.uint8)
+    for c in range(n_countries):
+        hue = (c * 0.618033988749895) % 1.0
+        value = 0.75 + 0.2 * ((c * 7) % 3) / 2
+        colors[c] = [round(255 * v) for v in colorsys.hsv_to_rgb(hue, 0.55, value)]
+    return colors
+
+
+def political_mode(world: World) -> tuple[np.ndarray, np.ndarray]:
+    provinces = world.provinces
+    palette = country_colors(world.n_countries)
+    controller = provinces.controller
+    held = controller >= 0
+    colors = np.broadcast_to(SEA, (len(provinces), 3)).copy()
+    colors[held] = palette[controller[held]]
+    # Occupied provinces are drawn darker in the occupier's colour.
+    occupied = provinces.occupied_mask()
+    colors[occupied] = (colors[occupied] * 0.7).astype(np.uint8)
+    return colors, controller.astype(np.int32)
+
+
+def terrain_mode(world: World) -> tuple[np.ndarray, np.ndarray]:
+    terrain = world.provinces.terrain
+    return TERRAIN_COLORS[terrain], terrain.astype(np.int32)
+
+
+def supply_mode(world: World) -> tuple[np.ndarray, np.ndarray]:
+    provinces = world.provinces
+    # Network supply already counts what strategic bombing destroys.
+    level = np.clip(provinces.supply / CAPITAL_SUPPLY, 0.0, 1.0)
+    colors = np.empty((len(provinces), 3), dtype=np.uint8)
+    colors[:, 0] = (220 * (1.0 - level) + 30).astype(np.uint8)
+    colors[:, 1] = (200 * level + 30).astype(np.uint8)
+    colors[:, 2] = 40
+    colors[provinces.is_sea] = SEA
+    return colors, provinces.controller.astype(np.int32)
+
+
+MapMode = Callable[["World"], tuple[np.ndarray, np.ndarray]]
+MAP_MODES: dict[str, MapMode] = {
+    "political": political_mode,
+    "terrain": terrain_mode,
+    "supply": supply_mode,
+}
+
+
+def write_png(path: str | Path, image: np.ndarray) -> Path:
+    """Write an ``(h, w, 3)`` ``uint8`` image as an 8-bit RGB PNG."""
+    path = Path(path)
+    height, width, _ = image.shape
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)  # filter byte 0 per row
+    rows[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    path.write_bytes(
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+    return path
+
+
+class MapRenderer:
+    """Province-id raster of ``world``'s map, ``km_per_px`` at zoom 0, with cached tiles."""
+
+    def __init__(self, world: World, km_per_px: float = 5.0, zoom_levels: int = 4) -> None:
+        self.world = world
+        self.km_per_px = km_per_px
+        spatial = world.spatial
+        x0, y0 = spatial.x0, spatial.y0
+        width = int(np.ceil((float(spatial.x.max()) - x0) / km_per_px)) + 1
+        height = int(np.ceil((float(spatial.y.max()) - y0) / km_per_px)) + 1
+        ids = np.empty((height, width), dtype=np.int32)
+        px = x0 + np.arange(width) * km_per_px
+        for top in range(0, height, TILE):
+            py = y0 + np.arange(top, min(top + TILE, height)) * km_per_px
+            ids[top : top + len(py)] = spatial.pick_many(px[None, :], py[:, None])
+        self.levels = [ids[:: 2**z, :: 2**z] for z in range(zoom_levels)]
+        self._tiles_of = [self._index_tiles(level) for level in self.levels]
+        self._cache: dict[tuple[str, int, int, int], np.ndarray] = {}
+        self._modes: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self.tiles_drawn = 0
+        self.tiles_reused = 0
+
+    # -- tiles -------------------------------------------------------------
+
+    def tile_grid(self, zoom: int) -> tuple[int, int]:
+        """Tiles across and down at ``zoom``."""
+        height, width = self.levels[zoom].shape
+        return -(-width // TILE), -(-height // TILE)
+
+    def _tile_ids(self, level: np.ndarray, tx: int, ty: int) -> np.ndarray:
+        """Ids of one tile plus a one-pixel apron to the right and below."""
+        return level[ty * TILE : (ty + 1) * TILE + 1, tx * TILE : (tx + 1) * TILE + 1]
+
+    def _index_tiles(self, level: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """CSR index province -> tiles (row-major tile numbers) showing it."""
+        across, down = -(-level.shape[1] // TILE), -(-level.shape[0] // TILE)
+        provinces, tiles = [], []
+        for ty in range(down):
+            for tx in range(across):
+                shown = np.unique(self._tile_ids(level, tx, ty))
+                shown = shown[shown >= 0]
+                provinces.append(shown)
+                tiles.append(np.full(len(shown), ty * across + tx, dtype=np.int32))
+        provinces = np.concatenate(provinces)
+        tiles = np.concatenate(tiles)
+        order = np.argsort(provinces, kind="stable")
+        offsets = np.zeros(len(self.world.provinces) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(provinces, minlength=len(self.world.provinces)), out=offsets[1:])
+        return offsets, tiles[order]
+
+    def _draw(self, mode: str, zoom: int, tx: int, ty: int) -> np.ndarray:
+        colors, keys = self._modes[mode]
+        ids = self._tile_ids(self.levels[zoom], tx, ty)
+        # Index -1 (off the map) picks the extra background row.
+        palette = np.vstack([colors, BACKGROUND])
+        key_of = np.append(keys, -2)
+        tile_keys = key_of[ids]
+        border = np.zeros(tile_keys.shape, dtype=bool)
+        border[:, :-1] |= tile_keys[:, :-1] != tile_keys[:, 1:]
+        border[:-1, :] |= tile_keys[:-1, :] != tile_keys[1:, :]
+        h = min(TILE, ids.shape[0] - (ids.shape[0] > TILE))
+        w = min(TILE, ids.shape[1] - (ids.shape[1] > TILE))
+        image = palette[ids[:h, :w]]
+        edge = border[:h, :w]
+        image[edge] = (image[edge] * BORDER_SHADE).astype(np.uint8)
+        return image
+
+    def sync(self, mode: str) -> int:
+        """Recompute ``mode``'s colours and drop tiles that show changed provinces."""
+        colors, keys = MAP_MODES[mode](self.world)
+        cached = self._modes.get(mode)
+        self._modes[mode] = (colors, keys)
+        if cached is None:
+            return 0
+        changed = np.flatnonzero((cached[0] != colors).any(axis=1) | (cached[1] != keys))
+        if len(changed) == 0:
+            return 0
+        dropped = 0
+        for zoom, (offsets, tiles) in enumerate(self._tiles_of):
+            across, _ = self.tile_grid(zoom)
+            stale = np.unique(
+                np.concatenate([tiles[offsets[p] : offsets[p + 1]] for p in changed.tolist()])
+            )
+            for tile in stale.tolist():
+                ty, tx = divmod(tile, across)
+                if self._cache.pop((mode, zoom, tx, ty), None) is not None:
+                    dropped += 1
+        return dropped
+
+    def tile(self, mode: str, zoom: int, tx: int, ty: int) -> np.ndarray:
+        key = (mode, zoom, tx, ty)
+        image = self._cache.get(key)
+        if image is None:
+            image = self._cache[key] = self._draw(mode, zoom, tx, ty)
+            self.tiles_drawn += 1
+        else:
+            self.tiles_reused += 1
+        return image
+
+    def render(self, mode: str = "political", zoom: int = 0) -> np.ndarray:
+        """The whole map at ``zoom`` in ``mode``, redrawing only stale tiles."""
+        if mode not in MAP_MODES:
+            raise KeyError(f"unknown map mode {mode!r}; expected one of {', '.join(MAP_MODES)}")
+        self.sync(mode)
+        height, width = self.levels[zoom].shape
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        across, down = self.tile_grid(zoom)
+        for ty in range(down):
+            for tx in range(across):
+                tile = self.tile(mode, zoom, tx, ty)
+                h, w, _ = tile.shape
+                image[ty * TILE : ty * TILE + h, tx * TILE : tx * TILE + w] = tile
+        return image
+
+    def screenshot(self, path: str | Path, mode: str = "political", zoom: int = 0) -> Path:
+        return write_png(path, self.render(mode, zoom))
@@ -0,0 +1,300 @@
+"""Delta-compressed campaign replays with monthly keyframes.
+
+A replay is the save-game snapshot of the world (:func:`savegame._snapshot`)
+at the first recorded hour, followed by one delta per tick: for every array
+whose shape is unchanged, the flat indices of the cells that changed and
+their new values; arrays that were resized (battles starting or ending, the
+territory history growing) are stored whole.  Every in-game month starts a
+new chunk whose keyframe holds the full snapshot, except arrays identical to
+the first keyframe, which refer back to it.  Seeking therefore decodes the
+first chunk and at most one other, then applies under a month of deltas.
+
+File layout::
+
+    magic  b"HOI4CRPL"                       8 bytes
+    format version                           uint32 little-endian
+    chunks, each:
+        first hour, hours covered            int64, uint32 little-endian
+        compressed length                    uint32 little-endian
+        zlib(header length uint32, JSON header, raw array bytes)
+
+The chunk header lists entries ``[tick, name, kind, dtype, shape, offset]``
+where ``kind`` is ``"full"``, ``"base"`` (same as the first keyframe),
+``"index"`` followed by ``"values"``, or ``"removed"``.  Chunks are compressed and appended on a
+worker thread, and a replay whose recording was cut short is still
+readable up to its last complete chunk.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+import numpy as np
+
+from savegame import _restore, _snapshot
+from scheduler import Cadence, GameClock
+
+if TYPE_CHECKING:
+    from world import World
+
+MAGIC = b"HOI4CRPL"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sI")
+_CHUNK = struct.Struct("<qII")
+_HEADER = struct.Struct("<I")
+_EMPTY = np.zeros(0, dtype=np.uint8)
+
+
+class ReplayFormatError(ValueError):
+    """The file is not a replay this version can read."""
+
+
+def _encode(entries: list[tuple[int, str, str, np.ndarray]], meta: dict[str, Any]) -> bytes:
+    table = []
+    blobs = []
+    offset = 0
+    for tick, name, kind, array in entries:
+        array = np.ascontiguousarray(array)
+        table.append([tick, name, kind, array.dtype.str, list(array.shape), offset])
+        blobs.append(array.tobytes())
+        offset += array.nbytes
+    header = json.dumps({"meta": meta, "entries": table}, separators=(",", ":")).encode()
+    return zlib.compress(_HEADER.pack(len(header)) + header + b"".join(blobs), 6)
+
+
+def _decode(data: bytes) -> tuple[dict[str, Any], list[tuple[int, str, str, np.ndarray]]]:
+    raw = zlib.decompress(data)
+    (header_len,) = _HEADER.unpack_from(raw)
+    header = json.loads(raw[_HEADER.size : _HEADER.size + header_len])
+    body = memoryview(raw)[_HEADER.size + header_len :]
+    entries = []
+    for tick, name, kind, dtype, shape, offset in header["entries"]:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        array = np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape)
+        entries.append((tick, name, kind, array))
+    return header["meta"], entries
+
+
+class ReplayRecorder:
+    """Hourly system, registered last, that appends the tick's changes to ``path``.
+
+    Call it once before the first tick as well to record the starting state.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        self.chunks = 0
+        self._base: dict[str, np.ndarray] | None = None
+        self._last: dict[str, np.ndarray] = {}
+        self._meta: dict[str, Any] = {}
+        self._entries: list[tuple[int, str, str, np.ndarray]] = []
+        self._start = 0
+        self._hours = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replay")
+        self._pending: Future[None] | None = None
+
+    def __call__(self, world: World) -> None:
+        meta, arrays = _snapshot(world, copy=False)
+        hour = meta.pop("hour")
+        if self._base is None:
+            with open(self.path, "wb") as f:
+                f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION))
+            self._base = {name: array.copy() for name, array in arrays.items()}
+            self._keyframe(hour, meta, arrays)
+        elif world.clock.due()[Cadence.MONTHLY] or meta != self._meta:
+            # A new chunk every month, and whenever the metadata changes (rare:
+            # triggers registered mid-run) so each chunk has a single meta.
+            self._flush()
+            self._keyframe(hour, meta, arrays)
+        else:
+            self._delta(hour - self._start, arrays)
+        self._hours = hour - self._start + 1
+
+    def _keyframe(self, hour: int, meta: dict[str, Any], arrays: dict[str, np.ndarray]) -> None:
+        self._start = hour
+        self._meta = meta
+        self._entries = []
+        self._last = {name: array.copy() for name, array in arrays.items()}
+        base = self._base
+        for name, array in self._last.items():
+            original = base.get(name)
+            # The first chunk is the base itself and always stores every array.
+            if (
+                self.chunks
+                and original is not None
+                and original.shape == array.shape
+                and np.array_equal(original, array)
+            ):
+                self._entries.append((0, name, "base", _EMPTY))
+            else:
+                self._entries.append((0, name, "full", array.copy()))
+
+    def _delta(self, tick: int, arrays: dict[str, np.ndarray]) -> None:
+        """Record what changed since the last tick and patch the private copy to match."""
+        last = self._last
+        entries = self._entries
+        for name, array in arrays.items():
+            old = last.get(name)
+            if old is None or old.shape != array.shape or old.dtype != array.dtype:
+                last[name] = array.copy()
+                entries.append((tick, name, "full", last[name].copy()))
+                continue
+            flat_old, flat_new = old.reshape(-1), array.reshape(-1)
+            changed = (flat_old != flat_new).nonzero()[0]
+            if len(changed):
+                values = flat_new[changed]
+                flat_old[changed] = values
+                entries.append((tick, name, "index", changed.astype(np.uint32)))
+                entries.append((tick, name, "values", values))
+        for name in sorted(last.keys() - arrays.keys()):
+            del last[name]
+            entries.append((tick, name, "removed", _EMPTY))
+
+    def _flush(self) -> None:
+        if not self._entries:
+            return
+        meta = dict(self._meta, hour=self._start)
+        self._pending = self._writer.submit(
+            self._append, self._entries, meta, self._start, self._hours
+        )
+        self._entries = []
+        self.chunks += 1
+
+    def _append(
+        self,
+        entries: list[tuple[int, str, str, np.ndarray]],
+        meta: dict[str, Any],
+        start: int,
+        hours: int,
+    ) -> None:
+        data = _encode(entries, meta)
+        with open(self.path, "ab") as f:
+            f.write(_CHUNK.pack(start, hours, len(data)))
+            f.write(data)
+
+    def close(self) -> None:
+        """Write the final partial month and wait for the file to be complete."""
+        self._flush()
+        self._writer.shutdown(wait=True)
+        if self._pending is not None:
+            self._pending.result()
+
+
+class Replay:
+    """Random-access reader: :meth:`seek` rebuilds the world at any recorded hour."""
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        # (first hour, hours covered, file offset, compressed length) per chunk.
+        self.chunks: list[tuple[int, int, int, int]] = []
+        with open(self.path, "rb") as f:
+            preamble = f.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size or preamble[:8] != MAGIC:
+                raise ReplayFormatError(f"{self.path}: not a replay")
+            _, version = _PREAMBLE.unpack(preamble)
+            if version != FORMAT_VERSION:
+                raise ReplayFormatError(
+                    f"{self.path}: format version {version}, expected {FORMAT_VERSION}"
+                )
+            size = self.path.stat().st_size
+            offset = _PREAMBLE.size
+            while offset + _CHUNK.size <= size:
+                f.seek(offset)
+                start, hours, length = _CHUNK.unpack(f.read(_CHUNK.size))
+                if offset + _CHUNK.size + length > size:
+                    break  # recording interrupted mid-write
+                self.chunks.append((start, hours, offset + _CHUNK.size, length))
+                offset += _CHUNK.size + length
+        if not self.chunks:
+            raise ReplayFormatError(f"{self.path}: no complete chunks")
+        self._decoded: dict[int, tuple[dict[str, Any], list]] = {}
+
+    @property
+    def first_hour(self) -> int:
+        return self.chunks[0][0]
+
+    @property
+    def last_hour(self) -> int:
+        start, hours, _, _ = self.chunks[-1]
+        return start + hours - 1
+
+    def _chunk(self, i: int) -> tuple[dict[str, Any], list[tuple[int, str, str, np.ndarray]]]:
+        if i not in self._decoded:
+            if len(self._decoded) > 2:
+                self._decoded.pop(next(k for k in self._decoded if k != 0))
+            _, _, offset, length = self.chunks[i]
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                self._decoded[i] = _decode(f.read(length))
+        return self._decoded[i]
+
+    def _hour(self, when: int | datetime) -> int:
+        hour = GameClock.hours_until(when) if isinstance(when, datetime) else when
+        if not self.first_hour <= hour <= self.last_hour:
+            raise ValueError(
+                f"hour {hour} is outside the recording ({self.first_hour}..{self.last_hour})"
+            )
+        return hour
+
+    def frames(
+        self, start: int | datetime, stop: int | datetime | None = None
+    ) -> Iterator[tuple[int, dict[str, Any], dict[str, np.ndarray]]]:
+        """``(hour, meta, arrays)`` for each recorded hour in ``[start, stop]``.
+
+        The arrays are updated in place from one frame to the next; copy what
+        must outlive the iteration step.
+        """
+        hour = self._hour(start)
+        stop = self.last_hour if stop is None else self._hour(stop)
+        index = max(i for i, chunk in enumerate(self.chunks) if chunk[0] <= hour)
+        _, base = self._chunk(0)
+        # "base" entries refer to the first keyframe only (tick 0 of chunk 0), not
+        # to arrays the first month later stored whole because they were resized.
+        base_arrays = {name: array for tick, name, _, array in base if tick == 0}
+        while index < len(self.chunks) and hour <= stop:
+            meta, entries = self._chunk(index)
+            first, hours, _, _ = self.chunks[index]
+            arrays: dict[str, np.ndarray] = {}
+            pos = 0
+            while pos < len(entries) and entries[pos][0] == 0:
+                _, name, kind, array = entries[pos]
+                arrays[name] = (base_arrays[name] if kind == "base" else array).copy()
+                pos += 1
+            changed = None
+            for tick in range(hours):
+                while pos < len(entries) and entries[pos][0] == tick:
+                    _, name, kind, array = entries[pos]
+                    if kind == "full":
+                        arrays[name] = array.copy()
+                    elif kind == "removed":
+                        del arrays[name]
+                    elif kind == "index":
+                        changed = array
+                    else:
+                        arrays[name].reshape(-1)[changed] = array
+                    pos += 1
+                if first + tick > stop:
+                    return
+                if first + tick >= hour:
+                    yield first + tick, dict(meta, hour=first + tick), arrays
+            hour = first + hours
+            index += 1
+
+    def arrays_at(self, when: int | datetime) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+        hour = self._hour(when)
+        for _, meta, arrays in self.frames(hour, hour):
+            return meta, arrays
+        raise ValueError(f"hour {hour} is not in the recording")
+
+    def seek(self, when: int | datetime) -> World:
+        """The world as it was at ``when`` (an hour count or a date)."""
+        meta, arrays = self.arrays_at(when)
+        return _restore(meta, arrays)
@@ -0,0 +1,358 @@
+"""Technology: a compiled tech tree and every country's research in arrays.
+
+:meth:`TechTree.compile` checks the tree's prerequisites and numbers the
+techs in topological order (Kahn's algorithm, ties broken by name), so a
+tech's index is always greater than those of its prerequisites.  The
+prerequisite and dependent lists are stored as CSR arrays over those
+indices.
+
+:class:`ResearchTable` keeps, per country, which techs are done and how
+many prerequisites each tech still lacks, both as ``(countries, techs)``
+arrays, plus a ``(countries, slots)`` pair of arrays with the tech each
+research slot works on and its progress.  A day of research for the whole
+world is one array step in :meth:`ResearchTable.step`: every busy slot
+gains ``(1 + RESEARCH_SPEED) / (1 + AHEAD_OF_TIME_PENALTY * years ahead)``
+days of progress, the research-speed bonus coming from the country's
+:class:`modifiers.ModifierEngine` total and the years ahead being how far
+the tech's historical year lies past today.  The progress arithmetic is
+:func:`progress_kernel`, run on the partitions of a
+:class:`parallel.ParallelStepper`; completions are applied afterwards, in
+country order, because their effects go through the shared modifier engine.
+
+Which techs a country can start is cached in :attr:`ResearchTable.available`
+and only changes when one of its techs completes: the tech itself leaves
+the set, and each dependent whose last missing prerequisite it was joins
+it.  A completed tech's effects are a ``tech:<name>`` source in the modifier
+engine.  Freed slots take the available tech with the earliest year.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from modifiers import Modifier, ModifierEngine, Scope
+from parallel import Runner, serial
+
+if TYPE_CHECKING:
+    from world import World
+
+
+@dataclass(frozen=True, slots=True)
+class Technology:
+    name: str
+    year: int
+    days: float  # research time at base speed
+    prerequisites: tuple[str, ...] = ()
+    # Country-scope (Modifier, value) pairs granted on completion.
+    modifiers: tuple[tuple[Modifier, float], ...] = ()
+
+
+def _tech(
+    name: str, year: int, days: float, *prerequisites: str, **modifiers: float
+) -> Technology:
+    return Technology(
+        name, year, days, prerequisites,
+        tuple((Modifier[key.upper()], value) for key, value in modifiers.items()),
+    )
+
+
+STANDARD_TECHS = (
+    _tech("infantry_weapons", 1934, 100, soft_attack=0.05),
+    _tech("infantry_weapons1", 1936, 120, "infantry_weapons", soft_attack=0.1),
+    _tech("infantry_weapons2", 1939, 150, "infantry_weapons1", soft_attack=0.1),
+    _tech("infantry_at", 1936, 120, "infantry_weapons", hard_attack=0.1),
+    _tech("infantry_at2", 1940, 150, "infantry_at", "infantry_weapons2", hard_attack=0.15),
+    _tech("support_weapons", 1936, 100, "infantry_weapons", defense=0.05),
+    _tech("support_weapons2", 1939, 130, "support_weapons", defense=0.05),
+    _tech("tech_support", 1934, 100, max_org=0.05),
+    _tech("motorised_infantry", 1936, 120, "tech_support", breakthrough=0.05),
+    _tech("gw_artillery", 1934, 100, soft_attack=0.03),
+    _tech("interwar_artillery", 1936, 120, "gw_artillery", soft_attack=0.05),
+    _tech("artillery1", 1939, 150, "interwar_artillery", soft_attack=0.05),
+    _tech("gwtank", 1934, 100),
+    _tech("basic_light_tank", 1936, 130, "gwtank", breakthrough=0.05),
+    _tech("basic_medium_tank", 1938, 160, "basic_light_tank", breakthrough=0.1),
+    _tech("basic_heavy_tank", 1938, 160, "basic_light_tank", hard_attack=0.05),
+    _tech("improved_medium_tank", 1941, 180, "basic_medium_tank", breakthrough=0.1),
+    _tech("advanced_medium_tank", 1943, 200, "improved_medium_tank", breakthrough=0.1),
+    _tech("superior_firepower", 1936, 150, "infantry_weapons", soft_attack=0.1),
+    _tech("mobile_warfare", 1936, 150, "basic_light_tank", breakthrough=0.1),
+    _tech("grand_battleplan", 1936, 150, "tech_support", defense=0.1, max_org=0.05),
+    _tech("industry", 1934, 100),
+    _tech("basic_machine_tools", 1936, 150, "industry", factory_output=0.1),
+    _tech("improved_machine_tools", 1939, 180, "basic_machine_tools", factory_output=0.1),
+    _tech("advanced_machine_tools", 1942, 200, "improved_machine_tools", factory_output=0.1),
+    _tech("construction1", 1936, 120, "industry", construction_speed=0.1),
+    _tech("construction2", 1939, 150, "construction1", construction_speed=0.1),
+    _tech("construction3", 1942, 180, "construction2", construction_speed=0.1),
+    _tech("electronic_mechanical_engineering", 1936, 150, "industry", research_speed=0.03),
+    _tech("radio", 1938, 150, "electronic_mechanical_engineering"),
+    _tech("radar", 1939, 160, "radio"),
+    _tech(
+        "computing_machine", 1940, 200, "electronic_mechanical_engineering",
+        research_speed=0.05,
+    ),
+)
+
+# Extra research time per year a tech is ahead of its historical year.
+AHEAD_OF_TIME_PENALTY = 2.0
+BASE_SLOTS = 2
+MAX_SLOTS = 5
+# One extra slot per this many civilian factories, up to MAX_SLOTS.
+FACTORIES_PER_SLOT = 15
+
+
+class TechTree:
+    """A validated tech tree, numbered in topological order."""
+
+    def __init__(self, techs: list[Technology]) -> None:
+        self.techs = techs
+        self.names = [tech.name for tech in techs]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.year = np.array([tech.year for tech in techs], dtype=np.float64)
+        self.days = np.array([tech.days for tech in techs], dtype=np.float64)
+        prerequisites = [[self.index[p] for p in tech.prerequisites] for tech in techs]
+        self.n_prerequisites = np.array([len(p) for p in prerequisites], dtype=np.int16)
+        self.prerequisite_start = np.concatenate(([0], np.cumsum(self.n_prerequisites)))
+        self.prerequisite_index = np.array(
+            [p for ps in prerequisites for p in ps], dtype=np.int32
+        )
+        dependents: list[list[int]] = [[] for _ in techs]
+        for tech, ps in enumerate(prerequisites):
+            for p in ps:
+                dependents[p].append(tech)
+        self.dependent_start = np.concatenate(([0], np.cumsum([len(d) for d in dependents])))
+        self.dependent_index = np.array([d for ds in dependents for d in ds], dtype=np.int32)
+        # The order idle slots pick techs in: earliest year first.
+        self.priority = np.lexsort((np.arange(len(techs)), self.year))
+
+    def __len__(self) -> int:
+        return len(self.techs)
+
+    @classmethod
+    def compile(cls, techs: tuple[Technology, ...] | list[Technology]) -> TechTree:
+        """Check names and prerequisites and sort ``techs`` topologically."""
+        by_name: dict[str, Technology] = {}
+        for tech in techs:
+            if tech.name in by_name:
+                raise ValueError(f"tech {tech.name!r} is defined twice")
+            by_name[tech.name] = tech
+        waiting = {}
+        dependents: dict[str, list[str]] = {name: [] for name in by_name}
+        for tech in techs:
+            if len(set(tech.prerequisites)) != len(tech.prerequisites):
+                raise ValueError(f"tech {tech.name!r} lists a prerequisite twice")
+            for p in tech.prerequisites:
+                if p not in by_name:
+                    raise ValueError(f"tech {tech.name!r} requires unknown tech {p!r}")
+                dependents[p].append(tech.name)
+            waiting[tech.name] = len(tech.prerequisites)
+        ready = deque(sorted(name for name, n in waiting.items() if n == 0))
+        order = []
+        while ready:
+            name = ready.popleft()
+            order.append(by_name[name])
+            unlocked = []
+            for d in dependents[name]:
+                waiting[d] -= 1
+                if waiting[d] == 0:
+                    unlocked.append(d)
+            ready.extend(sorted(unlocked))
+        if len(order) != len(by_name):
+            cycle = sorted(name for name, n in waiting.items() if n > 0)
+            raise ValueError(f"tech prerequisites form a cycle through {cycle}")
+        return cls(order)
+
+    def prerequisites_of(self, tech: int) -> np.ndarray:
+        start = self.prerequisite_start
+        return self.prerequisite_index[start[tech] : start[tech + 1]]
+
+    def dependents_of(self, tech: int) -> np.ndarray:
+        start = self.dependent_start
+        return self.dependent_index[start[tech] : start[tech + 1]]
+
+
+def fractional_year(when: datetime) -> float:
+    start = datetime(when.year, 1, 1)
+    return when.year + (when - start).total_seconds() / (
+        datetime(when.year + 1, 1, 1) - start
+    ).total_seconds()
+
+
+class ResearchTable:
+    """Every country's completed techs, research slots and available-tech cache."""
+
+    def __init__(self, tree: TechTree, n_countries: int, modifiers: ModifierEngine) -> None:
+        self.tree = tree
+        self.modifiers = modifiers
+        t = len(tree)
+        self.completed = np.zeros((n_countries, t), dtype=bool)
+        # Prerequisites each tech still lacks, per country.
+        self.missing = np.tile(tree.n_prerequisites, (n_countries, 1))
+        self.available = np.tile(tree.n_prerequisites == 0, (n_countries, 1))
+        self.slots = np.full(n_countries, BASE_SLOTS, dtype=np.int8)
+        self.slot_tech = np.full((n_countries, MAX_SLOTS), -1, dtype=np.int32)
+        self.slot_progress = np.zeros((n_countries, MAX_SLOTS), dtype=np.float64)
+        # (hour, country, tech name) of every completion, in order.
+        self.log: list[tuple[int, int, str]] = []
+
+    @classmethod
+    def starting(
+        cls,
+        n_countries: int,
+        modifiers: ModifierEngine,
+        civilian_factories: np.ndarray,
+        year: float,
+        tree: TechTree | None = None,
+    ) -> ResearchTable:
+        """Every tech from before ``year`` done, slots by civilian industry, slots busy."""
+        table = cls(tree or TechTree.compile(STANDARD_TECHS), n_countries, modifiers)
+        extra = np.asarray(civilian_factories) // FACTORIES_PER_SLOT
+        table.slots[:] = np.minimum(BASE_SLOTS + extra, MAX_SLOTS)
+        everyone = np.arange(n_countries)
+        for tech in np.flatnonzero(table.tree.year < int(year)).tolist():
+            table.complete(everyone, tech)
+        table.refill(np.arange(n_countries))
+        return table
+
+    # -- completion and slots ----------------------------------------------
+
+    def complete(self, countries: np.ndarray | int, tech: int) -> None:
+        """Mark ``tech`` done for ``countries``: apply its effects, unlock its dependents."""
+        countries = np.atleast_1d(np.asarray(countries, dtype=np.intp))
+        countries = countries[~self.completed[countries, tech]]
+        if not len(countries):
+            return
+        self.completed[countries, tech] = True
+        self.available[countries, tech] = False
+        cells = np.ix_(countries, self.tree.dependents_of(tech))
+        self.missing[cells] -= 1
+        self.available[cells] = (self.missing[cells] == 0) & ~self.completed[cells]
+        effects = self.tree.techs[tech].modifiers
+        if effects:
+            self.modifiers.add(
+                Scope.COUNTRY, countries, f"tech:{self.tree.names[tech]}", dict(effects)
+            )
+
+    def available_of(self, country: int) -> np.ndarray:
+        """Techs ``country`` could start now (including those in its slots)."""
+        return np.flatnonzero(self.available[country])
+
+    def assign(self, country: int, slot: int, tech: int) -> None:
+        """Put ``slot`` of ``country`` on ``tech``, dropping what it was researching."""
+        if not 0 <= slot < self.slots[country]:
+            raise ValueError(f"country {country} has no research slot {slot}")
+        if not self.available[country, tech]:
+            raise ValueError(f"{self.tree.names[tech]} is not available to country {country}")
+        if (self.slot_tech[country] == tech).any():
+            raise ValueError(f"{self.tree.names[tech]} is already being researched")
+        self.slot_tech[country, slot] = tech
+        self.slot_progress[country, slot] = 0.0
+
+    def refill(self, countries: np.ndarray) -> None:
+        """Give every idle slot of ``countries`` the earliest available tech."""
+        countries = np.asarray(countries, dtype=np.intp)
+        order = self.tree.priority
+        slot_tech = self.slot_tech[countries]
+        rows, slots = np.nonzero(slot_tech >= 0)
+        researching = np.zeros((len(countries), len(self.tree)), dtype=bool)
+        researching[rows, slot_tech[rows, slots]] = True
+        # Free techs in pick order, and idle slots, per country.
+        free = (self.available[countries] & ~researching)[:, order]
+        idle = (slot_tech < 0) & (np.arange(MAX_SLOTS) < self.slots[countries, None])
+        filled = np.minimum(free.sum(axis=1), idle.sum(axis=1))[:, None]
+        # Row-major nonzero pairs the n-th free tech with the n-th idle slot.
+        _, pick = np.nonzero(free & (np.cumsum(free, axis=1) <= filled))
+        rows, slots = np.nonzero(idle & (np.cumsum(idle, axis=1) <= filled))
+        self.slot_tech[countries[rows], slots] = order[pick]
+        self.slot_progress[countries[rows], slots] = 0.0
+
+    # -- daily step --------------------------------------------------------
+
+    def step(self, year: float, hour: int = 0, run: Runner | None = None) -> int:
+        """One day of research in every slot of every country; returns techs completed."""
+        tech = self.slot_tech
+        arrays = {
+            "slot_tech": tech,
+            "slot_progress": self.slot_progress,
+            "bonus": self.modifiers.column(Scope.COUNTRY, Modifier.RESEARCH_SPEED),
+            "tech_year": self.tree.year,
+            "tech_days": self.tree.days,
+            "year": np.array(year, dtype=np.float64),
+        }
+        done = np.zeros(tech.shape, dtype=bool)
+        run = run or serial(len(tech))
+        for countries, progress, finished in run("research", progress_kernel, arrays):
+            self.slot_progress[countries] = progress
+            done[countries] = finished
+        if not done.any():
+            return 0
+        countries, slots = np.nonzero(done)
+        finished = tech[countries, slots]
+        for country, t in zip(countries.tolist(), finished.tolist()):
+            self.log.append((hour, country, self.tree.names[t]))
+        # Countries finishing the same tech today take its effects in one update.
+        for t in np.unique(finished).tolist():
+            self.complete(countries[finished == t], t)
+        tech[done] = -1
+        self.slot_progress[done] = 0.0
+        self.refill(np.unique(countries))
+        return len(countries)
+
+    # -- persistence -------------------------------------------------------
+
+    def columns(self) -> dict[str, np.ndarray]:
+        return {
+            "completed": self.completed,
+            "slots": self.slots,
+            "slot_tech": self.slot_tech,
+            "slot_progress": self.slot_progress,
+        }
+
+    def restore(self, names: list[str], columns: dict[str, np.ndarray]) -> None:
+        """Load saved research whose techs were ``names``, matched to this tree by name.
+
+        Effects of completed techs are restored with the modifier engine.
+        """
+        unknown = [name for name in names if name not in self.tree.index]
+        if unknown:
+            raise ValueError(f"saved techs {unknown} are not in the tech tree")
+        position = np.array([self.tree.index[name] for name in names], dtype=np.int32)
+        self.completed[:] = False
+        self.completed[:, position] = columns["completed"]
+        slot_tech = np.asarray(columns["slot_tech"])
+        self.slot_tech[:] = np.where(slot_tech >= 0, position[np.maximum(slot_tech, 0)], -1)
+        self.slot_progress[:] = columns["slot_progress"]
+        self.slots[:] = columns["slots"]
+        done = self.completed.astype(np.int16)
+        tree = self.tree
+        met = np.zeros_like(self.missing)
+        for tech in range(len(tree)):
+            met[:, tech] = done[:, tree.prerequisites_of(tech)].sum(axis=1)
+        self.missing = tree.n_prerequisites[None, :] - met
+        self.available = (self.missing == 0) & ~self.completed
+
+
+def progress_kernel(
+    arrays: dict[str, np.ndarray], countries: np.ndarray, rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """A day of progress in the slots of ``countries``: the countries, new progress, done."""
+    tech = arrays["slot_tech"][countries]
+    busy = tech >= 0
+    t = np.where(busy, tech, 0)
+    ahead = np.maximum(arrays["tech_year"][t] - arrays["year"], 0.0)
+    bonus = arrays["bonus"][countries]
+    speed = np.maximum(1.0 + bonus, 0.0)[:, None] / (1.0 + AHEAD_OF_TIME_PENALTY * ahead)
+    progress = arrays["slot_progress"][countries] + np.where(busy, speed, 0.0)
+    return countries, progress, busy & (progress >= arrays["tech_days"][t])
+
+
+def research_system(world: World) -> None:
+    """Daily system: advance every research slot, complete techs, refill slots."""
+    clock = world.clock
+    world.research.step(fractional_year(clock.now), clock.hour, world.stepper.runner(world))
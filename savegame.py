@@ -0,0 +1,333 @@
+"""Versioned, chunked binary save games.
+
+Layout::
+
+    magic  b"HOI4CSAV"                       8 bytes
+    format version                           uint32 little-endian
+    header length                            uint32 little-endian
+    header                                   UTF-8 JSON
+    sections                                 raw array bytes, 64-byte aligned
+
+The header holds scalar world metadata and a table of sections, one per
+array column (``provinces/owner``, ``battles/org``, ...), each with its
+dtype, shape and byte offset.  Every column is stored contiguously in native
+NumPy layout, so :class:`SaveFile` maps sections straight from disk without
+copying and only touches the ones that are asked for.  :func:`load` hands
+the unmapped file to the restore, which maps each system's sections only
+when it gets to that system; province columns stay copy-on-write maps, so
+their pages are copied only when the simulation writes them.
+
+:data:`FORMAT_VERSION` changes with every change to the set or meaning of
+the sections, and files of any other version are refused with a
+:class:`SaveFormatError`.  Within a version every system's sections are
+still optional: a snapshot without them (a replay recorded before a system
+existed, say) leaves that system as a new world has it.
+
+:func:`save_in_background` copies the world's arrays on the calling thread
+(a memcpy of a few MB) and writes the file on a worker thread, so the
+simulation keeps running while the disk catches up.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator, Mapping
+
+import numpy as np
+
+from combat import BattleTable
+from divisions import DivisionStore
+from provinces import ProvinceStore
+from scheduler import GameClock
+from unitstats import DivisionStatCache
+
+if TYPE_CHECKING:
+    from world import World
+
+MAGIC = b"HOI4CSAV"
+# 2: production, research, navy, air, buildings, divisions and modifiers.
+# 3: division orders (destination, next_hop, move_left) and naval transit.
+# 4: equipment and doctrine stat sources live in the modifiers; unit_modifiers is gone.
+# 5: divisions/battle.
+# 6: supply/bombing.
+FORMAT_VERSION = 6
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+
+
+class SaveFormatError(ValueError):
+    """The file is not a save game this version can read."""
+
+
+def _snapshot(world: World, copy: bool = True) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    """Metadata and every array that makes up the world, as private copies by default.
+
+    With ``copy=False`` the arrays may be live views into the world.
+    """
+    take = np.copy if copy else np.asarray
+    meta = {
+        "hour": world.clock.hour,
+        "seed": world.seed,
+        "countries": world.n_countries,
+    }
+    arrays: dict[str, np.ndarray] = {"world/capitals": take(world.capitals)}
+    for name, array in world.provinces.columns().items():
+        arrays[f"provinces/{name}"] = take(array)
+    for name, array in world.battles.columns().items():
+        arrays[f"battles/{name}"] = take(array)
+    arrays["world/casualties"] = take(world.casualties)
+    arrays["fronts/hostile"] = take(world.fronts.hostile)
+    meta["modifiers"] = world.modifiers.to_meta()
+    for name, array in world.modifiers.columns().items():
+        arrays[f"modifiers/{name}"] = take(array)
+    for name, array in world.production.columns().items():
+        arrays[f"production/{name}"] = take(array)
+    meta["techs"] = world.research.tree.names
+    for name, array in world.research.columns().items():
+        arrays[f"research/{name}"] = take(array)
+    for name, array in world.navy.columns().items():
+        arrays[f"navy/{name}"] = take(array)
+    for name, array in world.air.columns().items():
+        arrays[f"air/{name}"] = take(array)
+    for name, array in world.buildings.columns().items():
+        arrays[f"buildings/{name}"] = take(array)
+    arrays["supply/bombing"] = take(world.supply.bombing)
+    meta["division_templates"] = world.divisions.template_meta()
+    for name, array in world.divisions.columns().items():
+        arrays[f"divisions/{name}"] = take(array)
+    names, result, fired = world.triggers.state()
+    if names:
+        meta["triggers"] = names
+        arrays["triggers/result"] = result
+        arrays["triggers/fired"] = fired
+    if world.territory:
+        arrays["territory/hours"] = np.array([h for h, _ in world.territory], dtype=np.int64)
+        arrays["territory/counts"] = np.stack([c for _, c in world.territory])
+    return meta, arrays
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _write(path: Path, meta: dict[str, Any], arrays: dict[str, np.ndarray]) -> Path:
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+            "nbytes": array.nbytes,
+        }
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({"meta": meta, "sections": sections}, separators=(",", ":")).encode()
+    data_start = _align(_PREAMBLE.size + len(header))
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + sections[name]["offset"])
+            f.write(np.ascontiguousarray(array).data)
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+    return path
+
+
+def save(world: World, path: str | os.PathLike) -> Path:
+    meta, arrays = _snapshot(world)
+    return _write(Path(path), meta, arrays)
+
+
+_writer: ThreadPoolExecutor | None = None
+
+
+def save_in_background(world: World, path: str | os.PathLike) -> Future[Path]:
+    """Snapshot now, write later; the future resolves to the finished path.
+
+    Saves are written one at a time in submission order.
+    """
+    global _writer
+    if _writer is None:
+        _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="savegame")
+    meta, arrays = _snapshot(world)
+    return _writer.submit(_write, Path(path), meta, arrays)
+
+
+class SaveFile(Mapping[str, np.ndarray]):
+    """Lazy reader: sections are memory-mapped on first access.
+
+    As a mapping, province columns are copy-on-write maps and every other
+    section a read-only one, which is how :func:`load` restores a world.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            preamble = f.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size:
+                raise SaveFormatError(f"{self.path}: truncated header")
+            magic, version, header_len = _PREAMBLE.unpack(preamble)
+            if magic != MAGIC:
+                raise SaveFormatError(f"{self.path}: not a save game")
+            if version != FORMAT_VERSION:
+                raise SaveFormatError(
+                    f"{self.path}: format version {version}, expected {FORMAT_VERSION}"
+                )
+            header = json.loads(f.read(header_len))
+        self.version = version
+        self.meta: dict[str, Any] = header["meta"]
+        self.sections: dict[str, dict[str, Any]] = header["sections"]
+        self._data_start = _align(_PREAMBLE.size + header_len)
+        self._cache: dict[str, np.ndarray] = {}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.sections
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.section(name, mode="c" if name.startswith("provinces/") else "r")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.sections)
+
+    def __len__(self) -> int:
+        return len(self.sections)
+
+    @property
+    def mapped(self) -> int:
+        """Sections mapped so far."""
+        return len(self._cache)
+
+    def section(self, name: str, mode: str = "r") -> np.ndarray:
+        """Map one section; ``mode="c"`` gives a copy-on-write array."""
+        key = f"{mode}:{name}"
+        if key not in self._cache:
+            info = self.sections[name]
+            shape = tuple(info["shape"])
+            if info["nbytes"] == 0:
+                array = np.zeros(shape, dtype=np.dtype(info["dtype"]))
+            else:
+                array = np.memmap(
+                    self.path,
+                    dtype=np.dtype(info["dtype"]),
+                    mode=mode,
+                    offset=self._data_start + info["offset"],
+                    shape=shape,
+                )
+            self._cache[key] = array
+        return self._cache[key]
+
+    def group(self, prefix: str, mode: str = "r") -> dict[str, np.ndarray]:
+        start = prefix + "/"
+        return {
+            name[len(start):]: self.section(name, mode)
+            for name in self.sections
+            if name.startswith(start)
+        }
+
+
+def _group(sections: Mapping[str, np.ndarray], prefix: str) -> dict[str, np.ndarray]:
+    """The sections under ``prefix/``; only these are read (or mapped) from ``sections``."""
+    start = prefix + "/"
+    return {name[len(start):]: sections[name] for name in sections if name.startswith(start)}
+
+
+def _restore(meta: dict[str, Any], sections: Mapping[str, np.ndarray]) -> World:
+    """Rebuild a world from snapshot metadata and arrays; province columns are wrapped as-is.
+
+    Sections are fetched system by system as the restore gets to them.
+    """
+    from world import World
+
+    provinces = ProvinceStore.from_columns(_group(sections, "provinces"))
+    battles = (
+        BattleTable.from_columns(_group(sections, "battles"))
+        if "battles/province" in sections
+        else BattleTable()
+    )
+    territory = []
+    if "territory/hours" in sections:
+        hours = sections["territory/hours"]
+        counts = np.array(sections["territory/counts"])
+        territory = [(int(h), counts[i]) for i, h in enumerate(hours)]
+    world = World(
+        provinces,
+        np.array(sections["world/capitals"]),
+        seed=meta["seed"],
+        clock=GameClock(meta["hour"]),
+        battles=battles,
+        territory=territory,
+    )
+    if "world/casualties" in sections:
+        world.casualties[:] = sections["world/casualties"]
+    if "modifiers" in meta:
+        world.modifiers.restore(meta["modifiers"], _group(sections, "modifiers"))
+    if "production/country" in sections:
+        world.production.restore(_group(sections, "production"))
+    if "techs" in meta:
+        world.research.restore(meta["techs"], _group(sections, "research"))
+    if "navy/country" in sections:
+        navy = world.navy
+        navy.restore(_group(sections, "navy"))
+        world.production.convoy_efficiency[:] = navy.convoy_efficiency
+        world.supply.set_port_efficiency(navy.convoy_efficiency)
+        world.supply.update()
+    if "air/country" in sections:
+        world.air.restore(_group(sections, "air"))
+    if "buildings/levels" in sections:
+        world.buildings.restore(_group(sections, "buildings"))
+        world.supply.update()
+    if "supply/bombing" in sections:
+        world.supply.set_bombing(sections["supply/bombing"])
+        world.supply.update()
+    if "division_templates" in meta:
+        world.divisions = DivisionStore.from_columns(
+            meta["division_templates"], _group(sections, "divisions")
+        )
+    world.division_stats = DivisionStatCache(world.divisions, world.modifiers)
+    if "fronts/hostile" in sections:
+        world.fronts.restore(sections["fronts/hostile"])
+    if "triggers" in meta:
+        # Applied when the game data registers the same triggers again.
+        world.triggers.restore(
+            meta["triggers"], sections["triggers/result"], sections["triggers/fired"]
+        )
+    return world
+
+
+def load(path: str | os.PathLike) -> World:
+    """Rebuild a world from a save; province columns stay memory-mapped."""
+    save_file = SaveFile(path)
+    return _restore(save_file.meta, save_file)
+
+
+class Autosaver:
+    """Monthly system that writes ``autosave-YYYY-MM-DD.hsav`` in the background."""
+
+    def __init__(self, directory: str | os.PathLike, keep: int = 3) -> None:
+        self.directory = Path(directory)
+        self.keep = keep
+        self.pending: Future[Path] | None = None
+        self._written: list[Path] = []
+
+    def __call__(self, world: World) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"autosave-{world.clock.now:%Y-%m-%d}.hsav"
+        self.pending = save_in_background(world, path)
+        self.pending.add_done_callback(self._rotate)
+
+    def _rotate(self, future: Future[Path]) -> None:
+        if future.exception() is not None:
+            return
+        self._written.append(future.result())
+        while len(self._written) > self.keep:
+            self._written.pop(0).unlink(missing_ok=True)
+
+    def wait(self) -> None:
+        if self.pending is not None:
+            self.pending.result()
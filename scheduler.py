@@ -0,0 +1,183 @@
+"""Fixed-timestep simulation scheduler.
+
+One tick is one in-game hour.  Systems register with a cadence and are only
+invoked on the ticks where that cadence is due, in registration order.  Every
+call is timed; a system that exceeds its budget is reported through the
+module logger so slow systems show up before they drag game speed down.
+When the :mod:`profiling` profiler is enabled, every tick and system call is
+also recorded as a trace span.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Any, Callable
+
+import profiling
+
+logger = logging.getLogger(__name__)
+
+START_DATE = datetime(1936, 1, 1)
+
+# Game speed 5 must sustain at least 24 in-game hours per real second.
+TICK_BUDGET_S = 1.0 / 24.0
+
+
+class Cadence(IntEnum):
+    HOURLY = 0
+    DAILY = 1
+    WEEKLY = 2
+    MONTHLY = 3
+
+
+class GameClock:
+    """In-game time as a count of elapsed hours since :data:`START_DATE`."""
+
+    __slots__ = ("hour",)
+
+    def __init__(self, hour: int = 0) -> None:
+        self.hour = hour
+
+    @property
+    def now(self) -> datetime:
+        return START_DATE + timedelta(hours=self.hour)
+
+    @property
+    def day(self) -> int:
+        return self.hour // 24
+
+    def due(self) -> tuple[bool, bool, bool, bool]:
+        """Which cadences fire at the current hour, indexed by :class:`Cadence`."""
+        if self.hour % 24:
+            return (True, False, False, False)
+        weekly = self.hour % (24 * 7) == 0
+        return (True, True, weekly, self.now.day == 1)
+
+    @staticmethod
+    def hours_until(date: datetime) -> int:
+        return int((date - START_DATE) // timedelta(hours=1))
+
+
+@dataclass(slots=True)
+class SystemStats:
+    calls: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+    overruns: int = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_s * 1000.0 / self.calls if self.calls else 0.0
+
+
+@dataclass(slots=True)
+class System:
+    name: str
+    fn: Callable[[Any], None]
+    cadence: Cadence
+    budget_s: float | None
+    stats: SystemStats = field(default_factory=SystemStats)
+
+
+class Scheduler:
+    """Runs registered systems against ``world`` as its clock advances."""
+
+    def __init__(self, world: Any, profiler: profiling.Profiler | None = None) -> None:
+        self.world = world
+        self.profiler = profiler if profiler is not None else profiling.profiler
+        self.clock: GameClock = world.clock
+        self.systems: list[System] = []
+        self._by_cadence: tuple[list[System], ...] = tuple([] for _ in Cadence)
+        self.tick_stats = SystemStats()
+
+    def register(
+        self,
+        name: str,
+        fn: Callable[[Any], None],
+        cadence: Cadence,
+        budget_ms: float | None = None,
+    ) -> System:
+        if any(system.name == name for system in self.systems):
+            raise ValueError(f"system {name!r} is already registered")
+        budget_s = None if budget_ms is None else budget_ms / 1000.0
+        system = System(name, fn, cadence, budget_s)
+        self.systems.append(system)
+        self._by_cadence[cadence].append(system)
+        return system
+
+    def _due_systems(self) -> list[System]:
+        due = self.clock.due()
+        if not due[Cadence.DAILY]:
+            return self._by_cadence[Cadence.HOURLY]
+        return [s for s in self.systems if due[s.cadence]]
+
+    def tick(self) -> None:
+        """Advance the clock one hour and run every system that is now due."""
+        self.clock.hour += 1
+        trace = self.profiler if self.profiler.enabled else None
+        if trace is not None:
+            trace.hour = self.clock.hour
+            trace.year = self.clock.now.year
+        perf = time.perf_counter_ns
+        tick_start = perf()
+        for system in self._due_systems():
+            start = perf()
+            system.fn(self.world)
+            elapsed_ns = perf() - start
+            if trace is not None:
+                trace.record(system.name, profiling.SYSTEM, start, elapsed_ns)
+            elapsed = elapsed_ns * 1e-9
+            stats = system.stats
+            stats.calls += 1
+            stats.total_s += elapsed
+            if elapsed > stats.max_s:
+                stats.max_s = elapsed
+            if system.budget_s is not None and elapsed > system.budget_s:
+                stats.overruns += 1
+                # Only report the 1st, 2nd, 4th, 8th... overrun to keep logs readable.
+                if stats.overruns & (stats.overruns - 1) == 0:
+                    logger.warning(
+                        "%s took %.2f ms (budget %.2f ms, %d overruns) at %s",
+                        system.name, elapsed * 1000.0, system.budget_s * 1000.0,
+                        stats.overruns, self.clock.now,
+                    )
+        elapsed_ns = perf() - tick_start
+        if trace is not None:
+            trace.record(profiling.TICK, profiling.TICK, tick_start, elapsed_ns)
+        elapsed = elapsed_ns * 1e-9
+        ticks = self.tick_stats
+        ticks.calls += 1
+        ticks.total_s += elapsed
+        if elapsed > ticks.max_s:
+            ticks.max_s = elapsed
+        if elapsed > TICK_BUDGET_S:
+            ticks.overruns += 1
+
+    def run(self, hours: int) -> None:
+        for _ in range(hours):
+            self.tick()
+
+    def run_until(self, date: datetime) -> None:
+        self.run(max(0, GameClock.hours_until(date) - self.clock.hour))
+
+    def hours_per_second(self) -> float:
+        total = self.tick_stats.total_s
+        return self.tick_stats.calls / total if total else float("inf")
+
+    def report(self) -> str:
+        lines = [f"{'system':<24}{'cadence':>9}{'calls':>9}{'mean ms':>10}{'max ms':>10}{'over':>6}"]
+        for system in self.systems:
+            s = system.stats
+            lines.append(
+                f"{system.name:<24}{system.cadence.name.lower():>9}{s.calls:>9}"
+                f"{s.mean_ms:>10.3f}{s.max_s * 1000.0:>10.3f}{s.overruns:>6}"
+            )
+        lines.append(
+            f"{self.tick_stats.calls} ticks, {self.hours_per_second():.0f} in-game hours/s, "
+            f"{self.tick_stats.overruns} ticks over the speed-5 budget"
+        )
+        return "\n".join(lines)
@@ -0,0 +1,278 @@
+"""Clausewitz-style script (``key = { ... }``) tokenizer, parser and cache.
+
+Scripts parse into :class:`Block` objects: lists of ``(key, op, value)``
+entries in source order, where duplicate keys are kept (``add_core_of`` may
+appear many times) and bare list items (``{ 1 2 3 }``) have key ``None``.
+Unquoted numbers become ``int``/``float`` and ``yes``/``no`` become
+``bool``; everything else, dates included, stays a string. A word directly
+followed by a block on the right of an operator (``color = rgb { 1 2 3 }``)
+is one typed value: a :class:`TypedBlock` whose ``kind`` is the word.
+
+:class:`ScriptCache` stores each parsed tree as a pickle named after the
+BLAKE2 hash of the source bytes and :data:`PARSER_VERSION`, plus an index of
+file size and mtime per path, so a warm start neither reparses nor even
+rereads unchanged files, and a parser change never serves trees in the old
+shape.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+Value = Union[str, int, float, bool, "Block"]
+
+_TOKEN = re.compile(
+    r"""
+    (?P<skip>\s+|\#[^\n]*)
+    |(?P<string>"(?:[^"\\]|\\.)*")
+    |(?P<op><=|>=|!=|\?=|==|=|<|>)
+    |(?P<open>\{)
+    |(?P<close>\})
+    |(?P<word>[^\s=<>!?{}"\#]+)
+    """,
+    re.VERBOSE,
+)
+# Bump whenever parse() output changes shape; cached trees of other versions are ignored.
+PARSER_VERSION = 2
+
+_INT = re.compile(r"[-+]?\d+\Z")
+_FLOAT = re.compile(r"[-+]?(?:\d+\.\d*|\.\d+)\Z")
+
+
+class ScriptSyntaxError(ValueError):
+    def __init__(self, message: str, source: str, position: int, path: str = "<script>") -> None:
+        line = source.count("\n", 0, position) + 1
+        super().__init__(f"{path}:{line}: {message}")
+        self.path = path
+        self.line = line
+
+
+class Block(list):
+    """Ordered ``(key, op, value)`` entries of one ``{ ... }`` scope."""
+
+    __slots__ = ()
+
+    def get(self, key: str, default: Value | None = None) -> Value | None:
+        """Value of the first ``key`` entry."""
+        for k, _, v in self:
+            if k == key:
+                return v
+        return default
+
+    def get_all(self, key: str) -> list[Value]:
+        return [v for k, _, v in self if k == key]
+
+    def keys(self) -> list[str]:
+        return list(dict.fromkeys(k for k, _, _ in self if k is not None))
+
+    def values(self) -> list[Value]:
+        """Bare list items, e.g. ``[1, 2, 3]`` for ``{ 1 2 3 }``."""
+        return [v for k, _, v in self if k is None]
+
+    def __contains__(self, key: object) -> bool:
+        return any(k == key for k, _, _ in self)
+
+    def __repr__(self) -> str:
+        return f"Block({list.__repr__(self)})"
+
+
+class TypedBlock(Block):
+    """Block tagged with the word in front of it, e.g. ``rgb`` in ``rgb { 1 2 3 }``."""
+
+    __slots__ = ("kind",)
+
+    def __init__(self, kind: str, entries: Iterable[tuple] = ()) -> None:
+        super().__init__(entries)
+        self.kind = kind
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, TypedBlock):
+            return self.kind == other.kind and list.__eq__(self, other)
+        return not isinstance(other, Block) and list.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __repr__(self) -> str:
+        return f"TypedBlock({self.kind!r}, {list.__repr__(self)})"
+
+
+def _scalar(kind: str, text: str) -> str | int | float | bool:
+    if kind == "string":
+        return text[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    if _INT.match(text):
+        return int(text)
+    if _FLOAT.match(text):
+        return float(text)
+    if text == "yes":
+        return True
+    if text == "no":
+        return False
+    return text
+
+
+def tokenize(source: str, path: str = "<script>") -> Iterator[tuple[str, str, int]]:
+    """``(kind, text, offset)`` for every significant token."""
+    pos = 0
+    end = len(source)
+    match = _TOKEN.match
+    while pos < end:
+        m = match(source, pos)
+        if m is None:
+            raise ScriptSyntaxError(f"unexpected character {source[pos]!r}", source, pos, path)
+        kind = m.lastgroup
+        if kind != "skip":
+            yield kind, m.group(), pos
+        pos = m.end()
+
+
+def parse(source: str, path: str = "<script>") -> Block:
+    root = Block()
+    stack = [root]
+    tokens = list(tokenize(source, path))
+    i = 0
+    n = len(tokens)
+    while i < n:
+        kind, text, pos = tokens[i]
+        block = stack[-1]
+        if kind == "close":
+            if len(stack) == 1:
+                raise ScriptSyntaxError("unmatched '}'", source, pos, path)
+            stack.pop()
+            i += 1
+        elif kind == "open":
+            child = Block()
+            block.append((None, "", child))
+            stack.append(child)
+            i += 1
+        elif kind == "op":
+            raise ScriptSyntaxError(f"operator {text!r} without a key", source, pos, path)
+        elif i + 1 < n and tokens[i + 1][0] == "op":
+            if i + 2 >= n:
+                raise ScriptSyntaxError(f"missing value for {text!r}", source, pos, path)
+            op = tokens[i + 1][1]
+            vkind, vtext, vpos = tokens[i + 2]
+            key = _scalar(kind, text) if kind == "string" else text
+            if vkind == "open":
+                child = Block()
+                block.append((key, op, child))
+                stack.append(child)
+            elif vkind == "word" and i + 3 < n and tokens[i + 3][0] == "open":
+                child = TypedBlock(vtext)
+                block.append((key, op, child))
+                stack.append(child)
+                i += 1
+            elif vkind in ("word", "string"):
+                block.append((key, op, _scalar(vkind, vtext)))
+            else:
+                raise ScriptSyntaxError(f"unexpected {vtext!r} after {op!r}", source, vpos, path)
+            i += 3
+        else:
+            block.append((None, "", _scalar(kind, text)))
+            i += 1
+    if len(stack) > 1:
+        raise ScriptSyntaxError("unclosed '{'", source, len(source), path)
+    return root
+
+
+def parse_file(path: str | os.PathLike) -> Block:
+    # Game files are commonly UTF-8 with a BOM; fall back to Windows-1252.
+    raw = Path(path).read_bytes()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = raw.decode("cp1252")
+    return parse(text, str(path))
+
+
+class ScriptCache:
+    """Parsed-tree cache keyed by source hash and parser version, with a stat index
+    to skip hashing."""
+
+    INDEX = "index.pickle"
+
+    def __init__(self, directory: str | os.PathLike) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.parsed = 0
+        self.reused = 0
+        self._index: dict[str, tuple[int, int, str]] = {}
+        self._index_dirty = False
+        index = self.directory / self.INDEX
+        if index.exists():
+            try:
+                self._index = pickle.loads(index.read_bytes())
+            except (pickle.UnpicklingError, EOFError):
+                self._index = {}
+
+    def load(self, path: str | os.PathLike) -> Block:
+        path = Path(path)
+        st = path.stat()
+        key = str(path.resolve())
+        entry = self._index.get(key)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            cached = self._pickle(entry[2])
+            try:
+                tree = pickle.loads(cached.read_bytes())
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                self.reused += 1
+                return tree
+        raw = path.read_bytes()
+        digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        cached = self._pickle(digest)
+        self._index[key] = (st.st_size, st.st_mtime_ns, digest)
+        self._index_dirty = True
+        if cached.exists():
+            # Touched but unchanged (e.g. a fresh checkout): reuse by content.
+            try:
+                tree = pickle.loads(cached.read_bytes())
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                self.reused += 1
+                return tree
+        tree = parse_file(path)
+        cached.write_bytes(pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL))
+        self.parsed += 1
+        return tree
+
+    def _pickle(self, digest: str) -> Path:
+        # The index stores the source hash only; the parser version lives in the
+        # file name, so an index entry written by an older parser simply misses.
+        return self.directory / f"{digest}.v{PARSER_VERSION}.pickle"
+
+    def flush(self) -> None:
+        if self._index_dirty:
+            tmp = self.directory / (self.INDEX + ".tmp")
+            tmp.write_bytes(pickle.dumps(self._index, protocol=pickle.HIGHEST_PROTOCOL))
+            os.replace(tmp, self.directory / self.INDEX)
+            self._index_dirty = False
+
+
+def load_definitions(
+    root: str | os.PathLike, cache: ScriptCache | None = None
+) -> dict[str, dict[str, Block]]:
+    """Parse every ``*.txt`` under ``root``, grouped by top-level directory.
+
+    ``common/technologies/infantry.txt`` lands in
+    ``result["common"]["technologies/infantry.txt"]``.
+    """
+    root = Path(root)
+    definitions: dict[str, dict[str, Block]] = {}
+    for path in sorted(root.rglob("*.txt")):
+        relative = path.relative_to(root)
+        group = relative.parts[0] if len(relative.parts) > 1 else ""
+        name = relative.relative_to(group).as_posix() if group else relative.as_posix()
+        tree = cache.load(path) if cache is not None else parse_file(path)
+        definitions.setdefault(group, {})[name] = tree
+    if cache is not None:
+        cache.flush()
+    return definitions
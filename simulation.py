@@ -0,0 +1,38 @@
+"""Game setup shared by interactive, headless and benchmark runs."""
+
+from __future__ import annotations
+
+from ai import ai_system
+from air import air_logistics_system, air_system
+from buildings import construction_system
+from combat import combat_system
+from divisions import movement_system, reinforcement_system
+from events import trigger_system
+from fronts import front_system
+from naval import convoy_system, naval_system
+from production import production_system
+from research import research_system
+from scheduler import Cadence, Scheduler
+from supply import supply_system
+from world import World, census
+
+
+def build_scheduler(world: World) -> Scheduler:
+    """Register every simulation system, in execution order, for ``world``."""
+    scheduler = Scheduler(world)
+    scheduler.register("air", air_system, Cadence.HOURLY, budget_ms=2.0)
+    scheduler.register("combat", combat_system, Cadence.HOURLY, budget_ms=10.0)
+    scheduler.register("naval", naval_system, Cadence.HOURLY, budget_ms=2.0)
+    scheduler.register("fronts", front_system, Cadence.HOURLY, budget_ms=5.0)
+    scheduler.register("ai", ai_system, Cadence.HOURLY, budget_ms=5.0)
+    scheduler.register("movement", movement_system, Cadence.HOURLY, budget_ms=2.0)
+    scheduler.register("convoys", convoy_system, Cadence.DAILY, budget_ms=1.0)
+    scheduler.register("supply", supply_system, Cadence.DAILY, budget_ms=20.0)
+    scheduler.register("air_logistics", air_logistics_system, Cadence.DAILY, budget_ms=1.0)
+    scheduler.register("production", production_system, Cadence.DAILY, budget_ms=1.0)
+    scheduler.register("construction", construction_system, Cadence.DAILY, budget_ms=1.0)
+    scheduler.register("research", research_system, Cadence.DAILY, budget_ms=1.0)
+    scheduler.register("reinforcement", reinforcement_system, Cadence.DAILY, budget_ms=1.0)
+    scheduler.register("triggers", trigger_system, Cadence.DAILY, budget_ms=5.0)
+    scheduler.register("census", census, Cadence.MONTHLY, budget_ms=5.0)
+    return scheduler
@@ -0,0 +1,149 @@
+"""Uniform-grid spatial index over province centroids.
+
+Province shapes are the Voronoi cells of their centroids (``x``/``y`` in km),
+so "which province is under this point" is a nearest-centroid query.  The
+index buckets centroids into square cells of :attr:`SpatialIndex.cell_km`,
+about twice the mean province spacing, and keeps the bucket contents both
+as a CSR permutation (for range queries, which take one contiguous slice
+per bucket row) and as a padded dense table (for vectorized picking of many
+points at once, e.g. a whole raster tile).
+
+Picking only inspects the 3×3 buckets around the point.  That is exact:
+if the nearest centroid found there is within ``cell_km``, nothing outside
+the block can be closer.  A point with no centroid within ``cell_km`` is off
+the map and picks ``-1``.
+
+Strategic-region membership comes from the ``region`` column:
+:meth:`SpatialIndex.regions_within` lists the regions with a province within
+a radius of a point, which is how :class:`air.AirTable` finds the regions
+each country's wings can reach from their base.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from provinces import ProvinceStore
+
+
+class SpatialIndex:
+    def __init__(self, provinces: ProvinceStore, cell_km: float | None = None) -> None:
+        x = provinces.x.astype(np.float64)
+        y = provinces.y.astype(np.float64)
+        self.x, self.y = x, y
+        self.region = provinces.region
+        self.x0, self.y0 = float(x.min()), float(y.min())
+        width = float(x.max()) - self.x0
+        height = float(y.max()) - self.y0
+        if cell_km is None:
+            spacing = math.sqrt(max(width * height, 1.0) / max(len(provinces), 1))
+            cell_km = 2.0 * max(spacing, 1.0)
+        self.cell_km = cell_km
+        self.nx = int(width // cell_km) + 1
+        self.ny = int(height // cell_km) + 1
+
+        bucket = self._bucket_of(x, y)
+        self.order = np.argsort(bucket, kind="stable").astype(np.int32)
+        self.starts = np.searchsorted(bucket[self.order], np.arange(self.nx * self.ny + 1))
+        counts = np.diff(self.starts)
+        # Dense (ny + 2, nx + 2, k) table padded with -1, including a ring of
+        # empty buckets so the 3×3 block around any on-grid bucket is in range.
+        k = int(counts.max()) if len(counts) else 1
+        dense = np.full(((self.ny + 2) * (self.nx + 2), k), -1, dtype=np.int32)
+        sorted_bucket = bucket[self.order]
+        slot = np.arange(len(self.order)) - self.starts[sorted_bucket]
+        by, bx = np.divmod(sorted_bucket, self.nx)
+        dense[(by + 1) * (self.nx + 2) + bx + 1, slot] = self.order
+        self.dense = dense.reshape(self.ny + 2, self.nx + 2, k)
+        self._buckets = [
+            self.order[self.starts[b] : self.starts[b + 1]].tolist()
+            for b in range(self.nx * self.ny)
+        ]
+        self._xs = x.tolist()
+        self._ys = y.tolist()
+
+
+    def _bucket_of(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        bx = np.clip(((x - self.x0) // self.cell_km).astype(np.int64), 0, self.nx - 1)
+        by = np.clip(((y - self.y0) // self.cell_km).astype(np.int64), 0, self.ny - 1)
+        return by * self.nx + bx
+
+    # -- picking -----------------------------------------------------------
+
+    def pick(self, x: float, y: float) -> int:
+        """Province whose cell contains ``(x, y)``, or -1 off the map."""
+        # Plain floats: NumPy scalar arithmetic would dominate the loop below.
+        x, y = float(x), float(y)
+        cell = self.cell_km
+        bx = int((x - self.x0) // cell)
+        by = int((y - self.y0) // cell)
+        if not (-1 <= bx <= self.nx and -1 <= by <= self.ny):
+            return -1
+        xs, ys, buckets, nx = self._xs, self._ys, self._buckets, self.nx
+        best, best_d2 = -1, cell * cell
+        for iy in range(max(by - 1, 0), min(by + 2, self.ny)):
+            row = iy * nx
+            for ix in range(max(bx - 1, 0), min(bx + 2, nx)):
+                for p in buckets[row + ix]:
+                    dx = xs[p] - x
+                    dy = ys[p] - y
+                    d2 = dx * dx + dy * dy
+                    if d2 <= best_d2:
+                        best, best_d2 = p, d2
+        return best
+
+    def pick_many(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Vectorized :meth:`pick` for arrays of points."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        shape = np.broadcast(x, y).shape
+        x, y = np.broadcast_to(x, shape).ravel(), np.broadcast_to(y, shape).ravel()
+        bx = np.floor((x - self.x0) / self.cell_km).astype(np.int64)
+        by = np.floor((y - self.y0) / self.cell_km).astype(np.int64)
+        on_grid = (bx >= -1) & (bx <= self.nx) & (by >= -1) & (by <= self.ny)
+        bx = np.clip(bx, -1, self.nx) + 1
+        by = np.clip(by, -1, self.ny) + 1
+        ox = np.array([-1, 0, 1] * 3)
+        oy = np.repeat([-1, 0, 1], 3)
+        cx = np.clip(bx[:, None] + ox, 0, self.nx + 1)
+        cy = np.clip(by[:, None] + oy, 0, self.ny + 1)
+        candidates = self.dense[cy, cx].reshape(len(x), -1)
+        valid = candidates >= 0
+        safe = np.where(valid, candidates, 0)
+        d2 = (self.x[safe] - x[:, None]) ** 2 + (self.y[safe] - y[:, None]) ** 2
+        d2[~valid] = np.inf
+        best = np.argmin(d2, axis=1)
+        rows = np.arange(len(x))
+        found = on_grid & (d2[rows, best] <= self.cell_km**2)
+        return np.where(found, candidates[rows, best], -1).astype(np.int32).reshape(shape)
+
+    # -- range queries -----------------------------------------------------
+
+    def within(self, x: float, y: float, radius_km: float) -> np.ndarray:
+        """Ids of provinces whose centroid lies within ``radius_km`` of ``(x, y)``."""
+        cell = self.cell_km
+        ix0 = max(int((x - radius_km - self.x0) // cell), 0)
+        ix1 = min(int((x + radius_km - self.x0) // cell), self.nx - 1)
+        iy0 = max(int((y - radius_km - self.y0) // cell), 0)
+        iy1 = min(int((y + radius_km - self.y0) // cell), self.ny - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.zeros(0, dtype=np.int32)
+        starts = self.starts
+        # Buckets are row-major, so each bucket row of the box is one slice.
+        candidates = np.concatenate(
+            [
+                self.order[starts[iy * self.nx + ix0] : starts[iy * self.nx + ix1 + 1]]
+                for iy in range(iy0, iy1 + 1)
+            ]
+        )
+        dx = self.x[candidates] - x
+        dy = self.y[candidates] - y
+        return np.sort(candidates[dx * dx + dy * dy <= radius_km * radius_km])
+
+    # -- strategic regions -------------------------------------------------
+
+    def regions_within(self, x: float, y: float, radius_km: float) -> np.ndarray:
+        """Regions with at least one province centroid within ``radius_km``."""
+        return np.unique(self.region[self.within(x, y, radius_km)])
@@ -0,0 +1,347 @@
+"""Supply network.
+
+Supply flows out of sources and loses a little with every province it
+enters.  Sources of country ``c``:
+
+* its capital, while ``c`` controls it;
+* supply hubs controlled by ``c`` that are linked to that capital by
+  undamaged railways running through ``c``-controlled provinces;
+* naval bases controlled by ``c`` (supplied by sea), at the share of
+  convoys that get through (:meth:`SupplyNetwork.set_port_efficiency`).
+
+Capital and hub output is scaled by the railway throughput of the
+province's state (:meth:`SupplyNetwork.set_throughput`), and every source's
+by the share that survives strategic bombing over its region
+(:meth:`SupplyNetwork.set_bombing`, from :attr:`air.AirTable.supply_modifier`
+once a day).
+
+A province's supply is the best ``strength - path cost`` over all sources of
+its controller, along paths that stay inside that controller's territory,
+clipped at zero.  Entering a province costs its terrain hop cost scaled down
+by infrastructure.
+
+:meth:`SupplyNetwork.full_recompute` solves the whole map with a vectorized
+Bellman-Ford relaxation over the CSR adjacency.  Day to day,
+:meth:`SupplyNetwork.update` is incremental: control, infrastructure, hub
+and railway changes mark provinces dirty, the subtrees of the supply tree
+hanging off them are invalidated, and a Dijkstra seeded from the intact
+boundary and from changed sources rebuilds only that subgraph.  With
+``debug=True`` every incremental update is checked against a full
+recompute.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from provinces import EDGE_RAIL_DAMAGED, EDGE_RAILWAY, ProvinceStore, Terrain
+
+if TYPE_CHECKING:
+    from world import World
+
+CAPITAL_SUPPLY = 12.0
+HUB_SUPPLY = 8.0
+PORT_SUPPLY = 6.0
+INFRASTRUCTURE_BONUS = 0.2
+# Port supply follows convoy efficiency in steps of this size, so small daily
+# changes in convoy losses do not re-solve the country's supply every day.
+PORT_EFFICIENCY_STEP = 0.1
+# Likewise for the share of supply that survives bombing, in finer steps:
+# bombing rarely takes more than a few percent off a region.
+BOMBING_STEP = 0.02
+
+# Cost of supply entering a province of each terrain, before infrastructure.
+HOP_COST = np.array([1.0, 1.5, 1.5, 2.5, 2.0, 2.0, 1.5, 1.0, np.inf], dtype=np.float64)
+assert len(HOP_COST) == len(Terrain)
+
+UNSUPPLIED = -np.inf
+
+
+class SupplyMismatch(AssertionError):
+    """Raised in debug mode when an incremental update disagrees with a full solve."""
+
+
+class SupplyNetwork:
+    def __init__(self, provinces: ProvinceStore, capitals: np.ndarray, debug: bool = False) -> None:
+        self.provinces = provinces
+        self.capitals = capitals
+        self.debug = debug
+        n = len(provinces)
+        self.value = np.full(n, UNSUPPLIED, dtype=np.float64)
+        self.parent = np.full(n, -1, dtype=np.int32)
+        self.sources: dict[int, float] = {}
+        self.port_efficiency = np.ones(len(capitals), dtype=np.float64)
+        # Capital and hub output multiplier per province, from built railways.
+        self.throughput = np.ones(n, dtype=np.float64)
+        # Share of each province's source output left by strategic bombing.
+        self.bombing = np.ones(n, dtype=np.float64)
+        self.last_recomputed = 0
+        self._dirty_provinces: set[int] = set()
+        self._dirty_countries: set[int] = set()
+        self._cost = self._hop_costs()
+        self._controller = provinces.controller.copy()
+        self._offsets = provinces.adj_offsets.tolist()
+        self._targets = provinces.adj_targets.tolist()
+        self._flags = provinces.adj_flags.tolist()
+
+        provinces.subscribe("controller", self._on_control_changed)
+        provinces.subscribe("infrastructure", self._on_infrastructure_changed)
+        provinces.subscribe("supply_hub", self._on_sources_changed)
+        provinces.subscribe("naval_base", self._on_sources_changed)
+        self.full_recompute()
+
+    # -- change tracking ---------------------------------------------------
+
+    def _hop_costs(self) -> np.ndarray:
+        p = self.provinces
+        return HOP_COST[p.terrain] / (1.0 + INFRASTRUCTURE_BONUS * p.infrastructure)
+
+    def _on_control_changed(self, ids: np.ndarray) -> None:
+        self._dirty_provinces.update(ids.tolist())
+        # Both the old and the new controller may gain or lose connected hubs.
+        self._dirty_countries.update(self._controller[ids].tolist())
+        self._controller[ids] = self.provinces.controller[ids]
+        self._dirty_countries.update(self._controller[ids].tolist())
+
+    def _on_infrastructure_changed(self, ids: np.ndarray) -> None:
+        self._cost[ids] = self._hop_costs()[ids]
+        self._dirty_provinces.update(ids.tolist())
+
+    def _on_sources_changed(self, ids: np.ndarray) -> None:
+        self._dirty_countries.update(self.provinces.controller[ids].tolist())
+
+    def set_railway(self, a: int, b: int, working: bool) -> None:
+        """Damage (``working=False``) or repair the railway between ``a`` and ``b``."""
+        self.provinces.set_edge_flag(a, b, EDGE_RAIL_DAMAGED, on=not working)
+        for u, v in ((a, b), (b, a)):
+            edge = self.provinces.edge_between(u, v)
+            self._flags[edge] = int(self.provinces.adj_flags[edge])
+        self._dirty_countries.update(self.provinces.controller[[a, b]].tolist())
+
+    def set_port_efficiency(self, efficiency: np.ndarray) -> None:
+        """Scale each country's port supply by the share of its convoys that arrive."""
+        stepped = np.round(np.asarray(efficiency) / PORT_EFFICIENCY_STEP) * PORT_EFFICIENCY_STEP
+        changed = np.flatnonzero(stepped != self.port_efficiency)
+        self.port_efficiency[changed] = stepped[changed]
+        self._dirty_countries.update(changed.tolist())
+
+    def set_throughput(self, ids: np.ndarray, throughput: np.ndarray) -> None:
+        """Scale capital and hub supply in provinces ``ids`` by ``throughput``."""
+        ids = np.asarray(ids, dtype=np.int64)
+        changed = ids[self.throughput[ids] != throughput]
+        self.throughput[ids] = throughput
+        sources = changed[self.provinces.supply_hub[changed] | np.isin(changed, self.capitals)]
+        self._dirty_countries.update(self.provinces.controller[sources].tolist())
+
+    def set_bombing(self, surviving: np.ndarray) -> None:
+        """Scale the supply sources in each province by the share that survives bombing."""
+        stepped = np.round(np.asarray(surviving) / BOMBING_STEP) * BOMBING_STEP
+        changed = np.flatnonzero(stepped != self.bombing)
+        self.bombing[changed] = stepped[changed]
+        p = self.provinces
+        sources = changed[
+            p.supply_hub[changed] | (p.naval_base[changed] > 0) | np.isin(changed, self.capitals)
+        ]
+        self._dirty_countries.update(p.controller[sources].tolist())
+
+    # -- sources -----------------------------------------------------------
+
+    def _sources_of(self, country: int) -> dict[int, float]:
+        p = self.provinces
+        controller = p.controller
+        sources: dict[int, float] = {}
+        bombing = self.bombing
+        port_supply = PORT_SUPPLY * float(self.port_efficiency[country])
+        if port_supply > 0.0:
+            for port in np.flatnonzero((controller == country) & (p.naval_base > 0)).tolist():
+                sources[port] = port_supply * float(bombing[port])
+        capital = int(self.capitals[country])
+        if controller[capital] != country:
+            return sources
+        throughput = self.throughput
+        sources[capital] = CAPITAL_SUPPLY * float(throughput[capital] * bombing[capital])
+        # Railway flood fill from the capital through country-held provinces.
+        flags, offsets, targets = self._flags, self._offsets, self._targets
+        hub = p.supply_hub
+        seen = {capital}
+        stack = [capital]
+        while stack:
+            u = stack.pop()
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                if v in seen or (flags[e] & (EDGE_RAILWAY | EDGE_RAIL_DAMAGED)) != EDGE_RAILWAY:
+                    continue
+                if controller[v] != country:
+                    continue
+                seen.add(v)
+                stack.append(v)
+                if hub[v]:
+                    strength = HUB_SUPPLY * float(throughput[v] * bombing[v])
+                    sources[v] = max(sources.get(v, 0.0), strength)
+        return sources
+
+    def _all_sources(self) -> dict[int, float]:
+        sources: dict[int, float] = {}
+        for country in range(len(self.capitals)):
+            sources.update(self._sources_of(country))
+        return sources
+
+    # -- solvers -----------------------------------------------------------
+
+    def solve_full(self, sources: dict[int, float] | None = None) -> np.ndarray:
+        """Vectorized whole-map solve; returns raw values without touching state."""
+        p = self.provinces
+        if sources is None:
+            sources = self._all_sources()
+        value = np.full(len(p), UNSUPPLIED, dtype=np.float64)
+        if sources:
+            value[list(sources)] = list(sources.values())
+        src, dst = p.adj_sources, p.adj_targets
+        same = (p.controller[src] == p.controller[dst]) & ~p.is_sea[src] & (p.controller[src] >= 0)
+        has_edges = np.diff(p.adj_offsets) > 0
+        starts = p.adj_offsets[:-1][has_edges]
+        while True:
+            incoming = np.where(same, value[dst], UNSUPPLIED)
+            best = np.full(len(p), UNSUPPLIED)
+            best[has_edges] = np.maximum.reduceat(incoming, starts)
+            candidate = best - self._cost
+            candidate[candidate <= 0.0] = UNSUPPLIED
+            improved = candidate > value
+            if not improved.any():
+                return value
+            value[improved] = candidate[improved]
+
+    def full_recompute(self) -> None:
+        p = self.provinces
+        self.sources = self._all_sources()
+        value = self.value
+        value[:] = self.solve_full(self.sources)
+        # Recover the supply tree: at the fixpoint every supplied non-source
+        # province equals (best neighbour - own cost) exactly.
+        src, dst = p.adj_sources, p.adj_targets
+        feeds = (
+            (p.controller[src] == p.controller[dst])
+            & (value[src] > 0.0)
+            & (value[dst] - self._cost[src] == value[src])
+        )
+        self.parent.fill(-1)
+        self.parent[src[feeds]] = dst[feeds]
+        for v, strength in self.sources.items():
+            if value[v] == strength:
+                self.parent[v] = v
+        self._dirty_provinces.clear()
+        self._dirty_countries.clear()
+        self.last_recomputed = len(self.provinces)
+        self._publish(np.arange(len(self.provinces)))
+
+    def update(self) -> None:
+        """Bring supply up to date with every change since the last update."""
+        if not self._dirty_provinces and not self._dirty_countries:
+            self.last_recomputed = 0
+            return
+        dirty = self._dirty_countries
+        controller = self.provinces.controller
+        old_sources = {v: s for v, s in self.sources.items() if controller[v] not in dirty}
+        new_sources = dict(old_sources)
+        for country in self._dirty_countries:
+            if country >= 0:
+                new_sources.update(self._sources_of(country))
+        lost = [v for v, s in self.sources.items() if new_sources.get(v, 0.0) < s]
+        gained = [(v, s) for v, s in new_sources.items() if s > self.sources.get(v, 0.0)]
+        self.sources = new_sources
+
+        invalid = self._invalidate(list(self._dirty_provinces) + lost)
+        seeds = [(-s, v, v) for v, s in gained]
+        seeds += [(-s, v, v) for v, s in new_sources.items() if v in invalid]
+        value = self.value
+        offsets, targets = self._offsets, self._targets
+        for u in invalid:
+            for w in targets[offsets[u] : offsets[u + 1]]:
+                if w not in invalid and value[w] > 0.0 and controller[w] == controller[u]:
+                    seeds.append((-value[w], w, int(self.parent[w])))
+        touched = self._dijkstra(seeds, reseed=True)
+        touched.update(invalid)
+        self._dirty_provinces.clear()
+        self._dirty_countries.clear()
+        self.last_recomputed = len(touched)
+        self._publish(np.fromiter(touched, dtype=np.int64, count=len(touched)))
+
+        if self.debug:
+            self.check()
+
+    def check(self) -> None:
+        reference = np.maximum(self.solve_full(), 0.0)
+        actual = np.maximum(self.value, 0.0)
+        if not np.allclose(actual, reference, rtol=0.0, atol=1e-9):
+            bad = np.flatnonzero(~np.isclose(actual, reference, rtol=0.0, atol=1e-9))
+            raise SupplyMismatch(
+                f"{len(bad)} provinces differ from a full recompute, e.g. province "
+                f"{bad[0]}: incremental {actual[bad[0]]}, full {reference[bad[0]]}"
+            )
+
+    def _invalidate(self, roots: list[int]) -> set[int]:
+        """Clear ``roots`` and every province whose supply was routed through them."""
+        value, parent = self.value, self.parent
+        offsets, targets = self._offsets, self._targets
+        invalid = set(roots)
+        stack = list(invalid)
+        while stack:
+            u = stack.pop()
+            for w in targets[offsets[u] : offsets[u + 1]]:
+                if w not in invalid and parent[w] == u:
+                    invalid.add(w)
+                    stack.append(w)
+        ids = list(invalid)
+        value[ids] = UNSUPPLIED
+        parent[ids] = -1
+        return invalid
+
+    def _dijkstra(self, seeds: list[tuple[float, int, int]], reseed: bool = False) -> set[int]:
+        """Max-value Dijkstra from ``(-value, province, parent)`` seeds.
+
+        With ``reseed`` the seeds are already-settled boundary provinces whose
+        values stand; only their improvements to neighbours are applied.
+        """
+        value, parent, cost = self.value, self.parent, self._cost
+        controller = self.provinces.controller.tolist()
+        sea = self.provinces.is_sea
+        offsets, targets = self._offsets, self._targets
+        touched: set[int] = set()
+        heap = []
+        for neg, v, par in seeds:
+            if -neg > value[v] or (reseed and -neg == value[v]):
+                if -neg > value[v]:
+                    value[v] = -neg
+                    parent[v] = par
+                    touched.add(v)
+                heap.append((neg, v))
+        heapq.heapify(heap)
+        while heap:
+            neg, u = heapq.heappop(heap)
+            val = -neg
+            if val < value[u]:
+                continue
+            owner = controller[u]
+            for w in targets[offsets[u] : offsets[u + 1]]:
+                if controller[w] != owner or sea[w]:
+                    continue
+                candidate = val - cost[w]
+                if candidate > 0.0 and candidate > value[w]:
+                    value[w] = candidate
+                    parent[w] = u
+                    touched.add(w)
+                    heapq.heappush(heap, (-candidate, w))
+        return touched
+
+    def _publish(self, ids: np.ndarray) -> None:
+        self.provinces.supply[ids] = np.maximum(self.value[ids], 0.0)
+
+
+def supply_system(world: World) -> None:
+    """Daily system: apply the day's bombing, then bring province supply up to date."""
+    supply = world.supply
+    supply.set_bombing(world.air.supply_at(np.arange(len(world.provinces))))
+    supply.update()
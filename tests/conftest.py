@@ -0,0 +1,12 @@
+"""Shared fixtures: small generated worlds that build in a few milliseconds."""
+
+from __future__ import annotations
+
+import pytest
+
+from world import World
+
+
+@pytest.fixture
+def world() -> World:
+    return World.generate(40, 30, 8, seed=3)
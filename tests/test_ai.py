@@ -0,0 +1,100 @@
+"""The strategic AI acting on its plans: threat-weighted deployment and attacks."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import numpy as np
+
+from ai import Plan
+from divisions import movement_system
+from headless import CampaignConfig, run_campaign
+from world import World
+
+
+def _war(world: World) -> tuple[int, int, int]:
+    """Put countries 0 and 2 at war; return an enemy front province, a neighbour of ours, and 2."""
+    world.fronts.declare_war(0, 2)
+    world.fronts.refresh()
+    provinces = world.provinces
+    target = int(world.fronts.front_provinces(2, 0)[0])
+    start, end = provinces.adj_offsets[target : target + 2]
+    neighbours = provinces.adj_targets[start:end]
+    ours = neighbours[(provinces.controller[neighbours] == 0) & ~provinces.is_sea[neighbours]]
+    return target, int(ours[0]), 2
+
+
+def _station(world: World, country: int, province: int) -> np.ndarray:
+    ids = world.divisions.ids_of(country)
+    world.divisions.location[ids] = province
+    return ids
+
+
+def test_an_undefended_target_is_taken_when_the_attackers_arrive(world: World) -> None:
+    target, border, enemy = _war(world)
+    attackers = _station(world, 0, border)
+    _station(world, enemy, int(world.capitals[enemy]))
+    assert world.ai.attack(Plan(0, 0, 0.0, [], target)) == len(attackers)
+    assert (world.divisions.destination[attackers] == target).all()
+    hours = 0
+    while (world.divisions.location[attackers] == border).all():
+        assert world.provinces.controller[target] == enemy
+        movement_system(world)
+        hours += 1
+        assert hours < 100
+    assert hours > 1
+    assert world.provinces.controller[target] == 0
+    assert (world.divisions.location[attackers] == target).all()
+    assert (world.divisions.destination[attackers] < 0).all()
+
+
+def test_defenders_arriving_first_are_fought(world: World) -> None:
+    target, border, enemy = _war(world)
+    attackers = _station(world, 0, border)
+    defenders = _station(world, enemy, int(world.capitals[enemy]))
+    world.ai.attack(Plan(0, 0, 0.0, [], target))
+    movement_system(world)
+    world.divisions.location[defenders] = target
+    for _ in range(100):
+        if target in world.battles.by_province:
+            break
+        assert world.provinces.controller[target] == enemy
+        movement_system(world)
+    assert world.provinces.controller[target] == enemy
+    assert (world.divisions.battle[attackers] == target).all()
+    assert (world.divisions.location[attackers] == border).all()
+
+
+def test_a_defended_target_is_attacked(world: World) -> None:
+    target, border, enemy = _war(world)
+    attackers = _station(world, 0, border)
+    defenders = _station(world, enemy, target)
+    assert world.ai.attack(Plan(0, 0, 0.0, [], target)) == len(attackers)
+    (row,) = world.battles.rows_of(np.array([target]))
+    assert world.battles.attacker_country[row] == 0
+    assert (world.divisions.battle[np.concatenate([attackers, defenders])] == target).all()
+    # A province already fought over is not attacked twice.
+    assert world.ai.attack(Plan(0, 0, 0.0, [], target)) == 0
+
+
+def test_divisions_deploy_where_the_threat_is(world: World) -> None:
+    world.fronts.declare_war(0, 2)
+    world.fronts.declare_war(0, 3)
+    world.fronts.refresh()
+    segments = world.fronts.segments(0)
+    threatened = int(segments[-1].provinces[0])
+    defend = [(threatened, 10.0)] + [(int(s.provinces[0]), 0.0) for s in segments[:-1]]
+    world.ai.plans[0] = Plan(0, 0, 10.0, defend, -1)
+    ids = world.divisions.ids_of(0)
+    world.fronts.deploy(0, world.divisions, world.ai.segment_weights(0))
+    assert np.isin(world.divisions.destination[ids], segments[-1].provinces).all()
+
+
+def test_headless_campaigns_declare_their_wars() -> None:
+    config = CampaignConfig(
+        seed=3, until=datetime(1936, 1, 20), width=40, height=30, countries=8
+    )
+    peace = run_campaign(config)
+    war = run_campaign(CampaignConfig(**{**vars(config), "wars": ((0, 2), (0, 3))}))
+    assert war["wars"] == ((0, 2), (0, 3))
+    assert war["final_territory"] != peace["final_territory"]
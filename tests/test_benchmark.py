@@ -0,0 +1,45 @@
+"""Benchmark offensives fight with real divisions and keep their armies at strength."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from benchmark import Offensive, belligerents, compare
+from world import World
+
+
+def test_offensive_commits_raised_divisions(world: World) -> None:
+    attacker, defender = belligerents(world, "border")
+    world.fronts.declare_war(attacker, defender)
+    before = world.divisions.counts(world.n_countries)
+    offensive = Offensive(world, attacker, defender, 12, 8, seed=1)
+    raised = world.divisions.counts(world.n_countries) - before
+    assert raised[attacker] == 12 and raised[defender] == 8
+    offensive(world)
+    assert offensive.started > 0
+    assert 0 < offensive.committed(world) <= 12
+    # Every battle is fought by divisions held in it.
+    for province in world.battles.province[: world.battles.count].tolist():
+        assert len(world.divisions.fighting(province)) > 0
+    # Divisions lost are raised again on the next day.
+    ids = world.divisions.ids_of(defender)
+    world.divisions.disband_many(ids[world.divisions.battle[ids] < 0][:3])
+    offensive(world)
+    assert world.divisions.counts(world.n_countries)[defender] == before[defender] + 8
+
+
+def _results(ticks: list[float], rss: float = 100.0) -> dict[str, Any]:
+    run = {"ticks_per_second": max(ticks), "runs": ticks, "peak_rss_mb": rss}
+    return {"scenarios": {"war": run}}
+
+
+def test_slowdowns_within_the_run_to_run_spread_pass() -> None:
+    baseline = _results([1000.0, 850.0, 900.0])
+    # 10% slower, but the baseline's own repeats spread by 15%.
+    assert compare(_results([900.0, 880.0, 890.0]), baseline, 0.05) == []
+    (regression,) = compare(_results([800.0, 790.0, 795.0]), baseline, 0.05)
+    assert "20.0% slower" in regression and "allowed 15.0%" in regression
+    # Steady repeats are held to the tolerance itself.
+    steady = _results([1000.0, 995.0, 990.0])
+    assert len(compare(_results([930.0, 925.0, 920.0]), steady, 0.05)) == 1
+    assert len(compare(_results([1000.0], rss=110.0), steady, 0.05)) == 1
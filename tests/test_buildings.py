@@ -0,0 +1,85 @@
+"""Construction queues: which projects get picked, and when queues are refilled."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from buildings import MAX_LEVEL, SHARED, SUPPORT, Building
+from simulation import build_scheduler
+from world import World
+
+
+def _only_support_left(world: World, country: int) -> np.ndarray:
+    """Fill the shared slots of the country's states and empty its queue; return its states."""
+    buildings = world.buildings
+    for row in buildings.queue_of(country)[::-1].tolist():
+        buildings.cancel(row)
+    mine = np.flatnonzero(buildings.controller == country)
+    buildings.slots[mine] = buildings.levels[mine][:, SHARED].sum(axis=1)
+    return mine
+
+
+def test_factories_go_where_most_slots_are_free(world: World) -> None:
+    buildings = world.buildings
+    for row in buildings.queue_of(0)[::-1].tolist():
+        buildings.cancel(row)
+    mine = np.flatnonzero(buildings.controller == 0)
+    free = buildings.free_slots(mine)
+    buildings.fill_queues()
+    (row,) = buildings.queue_of(0)
+    assert buildings.state[row] == mine[np.argmax(free)]
+    assert buildings.building[row] in (Building.CIVILIAN_FACTORY, Building.MILITARY_FACTORY)
+
+
+def test_support_buildings_go_to_the_lowest_level_first(world: World) -> None:
+    buildings = world.buildings
+    mine = _only_support_left(world, 0)
+    buildings.levels[mine, Building.RAILWAY] = 1
+    buildings.levels[mine[1], Building.INFRASTRUCTURE] = 0
+    front = np.zeros(len(world.provinces), dtype=bool)
+    front[buildings.seat[mine[2]]] = True
+    buildings.production.civilian_factories[0] = 60
+    buildings.fill_queues(front)
+    picked = [
+        (int(buildings.state[row]), Building(buildings.building[row]))
+        for row in buildings.queue_of(0)
+    ]
+    # Everything at level zero, in SUPPORT order: the one front state's fort,
+    # the one state without infrastructure, then anti-air by state.
+    assert picked == [
+        (int(mine[2]), Building.LAND_FORT),
+        (int(mine[1]), Building.INFRASTRUCTURE),
+        (int(mine[0]), Building.ANTI_AIR),
+        (int(mine[1]), Building.ANTI_AIR),
+    ]
+
+
+def test_full_queues_are_not_searched_again_until_something_changes(world: World) -> None:
+    buildings = world.buildings
+    mine = _only_support_left(world, 0)
+    for building in SUPPORT:
+        buildings.levels[mine, building] = MAX_LEVEL[building]
+    buildings.fill_queues()
+    refills = buildings.refills
+    assert len(buildings.queue_of(0)) == 0
+    buildings.fill_queues()
+    assert buildings.refills == refills
+    # A state changing hands is worth another look.
+    state = int(np.flatnonzero(buildings.controller == 1)[0])
+    seat = np.array([buildings.seat[state]])
+    world.provinces.update("controller", seat, np.array([0], dtype=np.int16))
+    buildings.fill_queues()
+    assert buildings.refills == refills + 1
+    assert set(buildings.state[buildings.queue_of(0)].tolist()) == {state}
+
+
+def test_forts_are_built_on_the_front(world: World) -> None:
+    world.fronts.declare_war(0, 2)
+    world.fronts.declare_war(0, 3)
+    build_scheduler(world).run(24 * 30)
+    buildings = world.buildings
+    forts = buildings.state[: buildings.count][
+        buildings.building[: buildings.count] == Building.LAND_FORT
+    ]
+    front = np.unique(world.provinces.state[world.fronts.front_mask()])
+    assert np.isin(forts, front).all()
@@ -0,0 +1,179 @@
+"""The vectorized battle step against the scalar reference, and battles between divisions."""
+
+from __future__ import annotations
+
+import numpy as np
+
+import pytest
+
+from combat import (
+    ATTACKER_WON,
+    DEFENDER_WON,
+    BattleSide,
+    BattleTable,
+    combat_system,
+    engage,
+    resolve_battle,
+)
+from modifiers import Modifier, Scope
+from provinces import Terrain
+from world import World
+
+
+def _side(rng: np.random.Generator) -> BattleSide:
+    divisions = int(rng.integers(1, 6))
+    armor_share = float(rng.random() * 0.3)
+    return BattleSide(
+        soft_attack=divisions * float(rng.uniform(150, 300)),
+        hard_attack=divisions * float(rng.uniform(10, 60)),
+        defense=divisions * float(rng.uniform(200, 400)),
+        breakthrough=divisions * float(rng.uniform(40, 120)),
+        hardness=armor_share,
+        armor=armor_share * 60.0,
+        piercing=float(rng.uniform(5, 60)),
+        width=divisions * 20.0,
+        org=divisions * 60.0,
+        strength=divisions * 25.0,
+    )
+
+
+def test_vectorized_matches_scalar_reference() -> None:
+    rng = np.random.default_rng(7)
+    table = BattleTable(capacity=4)  # grows while battles are added
+    reference = []
+    for province in range(200):
+        attacker, defender = _side(rng), _side(rng)
+        terrain = int(rng.integers(0, Terrain.OCEAN))
+        river = bool(rng.random() < 0.3)
+        table.start(province, 0, 1, attacker, defender, terrain, river)
+        # The table copies the sides; the reference works on these objects in place.
+        reference.append((attacker, defender, terrain, river))
+    outcomes = set()
+    for _ in range(48):
+        air = rng.uniform(0.5, 1.5, size=(table.count, 2))
+        outcome = table.resolve_hour(air)
+        for row, (attacker, defender, terrain, river) in enumerate(reference):
+            expected = resolve_battle(
+                attacker, defender, terrain, river, (air[row, 0], air[row, 1])
+            )
+            assert outcome[row] == expected
+            # Bit-identical, not merely close.
+            assert table.side(row, 0) == attacker
+            assert table.side(row, 1) == defender
+        outcomes.update(outcome.tolist())
+    assert {ATTACKER_WON, DEFENDER_WON} <= outcomes
+
+
+def test_end_moves_last_row_into_the_gap() -> None:
+    rng = np.random.default_rng(1)
+    table = BattleTable()
+    sides = {}
+    for province in (10, 20, 30):
+        sides[province] = (_side(rng), _side(rng))
+        table.start(province, 0, 1, *sides[province], Terrain.PLAINS)
+    table.end(table.by_province[10])
+    assert table.count == 2
+    assert sorted(table.by_province) == [20, 30]
+    for province, row in table.by_province.items():
+        assert int(table.province[row]) == province
+        assert table.side(row, 0) == sides[province][0]
+
+
+def _border(world: World) -> tuple[int, int]:
+    provinces = world.provinces
+    edge = int(np.flatnonzero(provinces.contested_edges())[0])
+    return int(provinces.adj_sources[edge]), int(provinces.adj_targets[edge])
+
+
+def test_engage_builds_sides_from_effective_division_stats(world: World) -> None:
+    src, dst = _border(world)
+    divisions = world.divisions
+    controller = world.provinces.controller
+    attackers = divisions.spawn_many(int(controller[src]), 2, np.full(3, src, dtype=np.int32))
+    defenders = divisions.spawn_many(int(controller[dst]), 0, np.full(2, dst, dtype=np.int32))
+    world.modifiers.add(
+        Scope.COUNTRY, int(controller[src]), "equipment:tank_2", {Modifier.ARMOR: 0.2}
+    )
+    row = engage(world, dst, attackers, defenders)
+    assert world.battles.side(row, 0) == world.division_stats.side(attackers)
+    assert world.battles.side(row, 1) == world.division_stats.side(defenders)
+    assert set(divisions.fighting(dst).tolist()) == {*attackers.tolist(), *defenders.tolist()}
+    with pytest.raises(ValueError, match="both sides"):
+        engage(world, src, attackers, defenders[:0])
+
+
+def test_divisions_are_held_until_the_battle_ends(world: World) -> None:
+    src, dst = _border(world)
+    divisions = world.divisions
+    controller = world.provinces.controller
+    attackers = divisions.spawn_many(int(controller[src]), 2, np.full(5, src, dtype=np.int32))
+    defenders = divisions.spawn_many(int(controller[dst]), 0, np.full(1, dst, dtype=np.int32))
+    engage(world, dst, attackers, defenders)
+    divisions.move(attackers, int(world.capitals[controller[src]]))
+    assert len(divisions.moving()) == 0
+    for _ in range(1000):
+        combat_system(world)
+        if dst not in world.battles.by_province:
+            break
+    assert len(divisions.fighting(dst)) == 0
+    assert len(divisions.moving()) == len(attackers)
+
+
+def _one_sided_battle(world: World) -> tuple[int, int, np.ndarray, np.ndarray]:
+    """Five armored divisions against one exhausted infantry division."""
+    src, dst = _border(world)
+    divisions = world.divisions
+    controller = world.provinces.controller
+    attackers = divisions.spawn_many(int(controller[src]), 2, np.full(5, src, dtype=np.int32))
+    defenders = divisions.spawn_many(int(controller[dst]), 0, np.full(1, dst, dtype=np.int32))
+    divisions.org[defenders] = 2.0
+    engage(world, dst, attackers, defenders)
+    return src, dst, attackers, defenders
+
+
+def test_losses_are_written_back_to_the_divisions(world: World) -> None:
+    src, dst = _border(world)
+    divisions = world.divisions
+    controller = world.provinces.controller
+    attackers = divisions.spawn_many(int(controller[src]), 0, np.full(3, src, dtype=np.int32))
+    defenders = divisions.spawn_many(int(controller[dst]), 0, np.full(3, dst, dtype=np.int32))
+    row = engage(world, dst, attackers, defenders)
+    for _ in range(3):
+        combat_system(world)
+    for s, ids in enumerate((attackers, defenders)):
+        side = world.battles.side(row, s)
+        assert divisions.strength[ids].sum() == pytest.approx(side.strength, rel=1e-5)
+        assert divisions.org[ids].sum() == pytest.approx(side.org, rel=1e-5)
+        assert (divisions.equipment_fill[ids] < 1.0).all()
+
+
+def test_winners_advance_and_the_beaten_fall_back(world: World) -> None:
+    src, dst, attackers, defenders = _one_sided_battle(world)
+    divisions = world.divisions
+    attacker, defender = int(divisions.country[attackers[0]]), int(divisions.country[defenders[0]])
+    bystander = divisions.spawn(defender, 0, dst)
+    for _ in range(100):
+        combat_system(world)
+        if dst not in world.battles.by_province:
+            break
+    assert world.provinces.controller[dst] == attacker
+    assert (divisions.location[attackers] == dst).all()
+    for division in (*defenders.tolist(), bystander):
+        if divisions.alive[division]:
+            fallback = int(divisions.location[division])
+            assert fallback in world.provinces.neighbors(dst).tolist()
+            assert world.provinces.controller[fallback] == defender
+    assert len(divisions.in_battle()) == 0
+
+
+def test_reinforcement_skips_divisions_in_battle(world: World) -> None:
+    _, _, attackers, _ = _one_sided_battle(world)
+    divisions = world.divisions
+    idle = int(divisions.ids_of(int(divisions.country[attackers[0]]))[0])
+    divisions.strength[[idle, attackers[0]]] = 1.0
+    divisions.equipment_fill[[idle, attackers[0]]] = 0.2
+    world.production.stockpile[:] = 1e6
+    divisions.reinforce(world.production.stockpile)
+    assert divisions.strength[attackers[0]] == 1.0
+    assert divisions.equipment_fill[attackers[0]] == pytest.approx(0.2)
+    assert divisions.equipment_fill[idle] > 0.2
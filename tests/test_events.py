@@ -0,0 +1,75 @@
+"""Compiled triggers: operators, dirty-flag re-evaluation and date conditions."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from events import TriggerSyntaxError, compile_trigger
+from script import parse
+from world import World
+
+
+def _holds(world: World, source: str, country: int = 0) -> bool:
+    return compile_trigger(parse(source)).predicate(world, country)
+
+
+def test_numeric_operators(world: World) -> None:
+    held = int(world.triggers.territory[0])
+    assert _holds(world, f"num_of_controlled_provinces = {held}")
+    assert _holds(world, f"num_of_controlled_provinces >= {held}")
+    assert not _holds(world, f"num_of_controlled_provinces > {held}")
+    assert _holds(world, f"num_of_controlled_provinces < {held + 1}")
+    assert _holds(world, f"num_of_controlled_provinces <= {held}")
+    assert not _holds(world, f"num_of_controlled_provinces != {held}")
+    assert _holds(world, "NOT = { casualties > 0 }")
+    assert _holds(world, "OR = { tag = 1 tag = 0 }") and not _holds(world, "tag = 0 tag = 1")
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "tag < 3",
+        "always > yes",
+        "has_capital != yes",
+        "controls_province > 5",
+        "controls_state <= 2",
+        "num_of_controlled_provinces ?= 3",
+        "no_such_condition = yes",
+        "AND = yes",
+    ],
+)
+def test_bad_triggers_do_not_compile(source: str) -> None:
+    with pytest.raises(TriggerSyntaxError):
+        compile_trigger(parse(source))
+
+
+def test_only_triggers_reading_a_change_are_checked_again(world: World) -> None:
+    triggers, provinces = world.triggers, world.provinces
+    province = int(np.flatnonzero(provinces.controller == 1)[0])
+    triggers.add("takes", parse(f"controls_province = {province}"))
+    triggers.add("rich", parse("casualties > 1000"))
+    assert triggers.update() == [("takes", 1)]
+    checks = triggers.checks
+    assert triggers.update() == [] and triggers.checks == checks
+    provinces.update("controller", np.array([province]), np.array([0], dtype=np.int16))
+    assert triggers.update() == [("takes", 0)]
+    # Every country's answer to the province trigger, and nothing else.
+    assert triggers.checks == checks + world.n_countries
+    world.casualties[2] = 5000.0
+    checks = triggers.checks
+    assert triggers.update() == [("rich", 2)]
+    assert triggers.checks == checks + 1
+
+
+def test_dates_fire_on_their_day(world: World) -> None:
+    triggers, clock = world.triggers, world.clock
+    triggers.add("war", parse("date = 1936.1.4 tag = 0"))
+    triggers.add("before", parse("date < 1936.1.3 tag = 0"))
+    fired = {}
+    for day in range(6):
+        clock.hour = 24 * day
+        for name, _ in triggers.update():
+            fired[name] = day
+    assert fired == {"before": 0, "war": 3}
+    assert not triggers.result[1, 0]  # expired on 1936.1.3
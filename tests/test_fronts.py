@@ -0,0 +1,51 @@
+"""Front segments and the deployment of divisions along them."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from simulation import build_scheduler
+from world import World
+
+
+def _at_war(world: World) -> World:
+    world.fronts.declare_war(0, 2)
+    world.fronts.declare_war(0, 3)
+    world.fronts.refresh()
+    return world
+
+
+def test_rebalance_follows_the_weights(world: World) -> None:
+    fronts = _at_war(world).fronts
+    segments = fronts.segments(0)
+    assert len(segments) > 1
+    weights = np.zeros(len(segments))
+    weights[-1] = 1.0
+    capital = np.full(6, world.capitals[0])
+    assert fronts.rebalance(0, capital, weights).tolist() == [len(segments) - 1] * 6
+    plan = fronts.allocate(0, 6, weights)
+    assert [target for _, target in plan] == [0] * (len(segments) - 1) + [6]
+
+
+def test_divisions_already_on_a_segment_stay(world: World) -> None:
+    fronts = _at_war(world).fronts
+    segments = fronts.segments(0)
+    placed = np.array([segment.provinces[0] for segment in segments])
+    assert fronts.rebalance(0, placed).tolist() == list(range(len(segments)))
+
+
+def test_front_system_marches_divisions_to_the_front(world: World) -> None:
+    divisions, fronts = _at_war(world).divisions, world.fronts
+    ids = divisions.ids_of(0)
+    front = np.concatenate([segment.provinces for segment in fronts.segments(0)])
+    assert not np.isin(divisions.location[ids], front).all()
+    scheduler = build_scheduler(world)
+    scheduler.run(23)
+    assert (divisions.destination[ids] < 0).all()
+    scheduler.run(1)
+    assert np.isin(divisions.destination[ids], front).all()
+    # A second deployment with nothing changed gives no new orders.
+    assert fronts.deploy(0, divisions) == 0
+    for _ in range(24 * 10):
+        divisions.advance(world.pathfinder, world.provinces.controller)
+    assert np.isin(divisions.location[ids], front).all()
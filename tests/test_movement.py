@@ -0,0 +1,143 @@
+"""Division marches and fleet passages routed by the pathfinder."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import savegame
+from naval import Mission
+from pathfinding import MovementClass, Pathfinder
+from simulation import build_scheduler
+from world import World
+
+
+def _far_province(world: World, country: int) -> tuple[int, tuple[int, ...]]:
+    """The province of ``country`` farthest (by route) from its capital, and the route."""
+    capital = int(world.capitals[country])
+    own = np.flatnonzero(world.provinces.controller == country)
+    routes = [(world.pathfinder.route(capital, int(p)), int(p)) for p in own if p != capital]
+    route, goal = max(
+        ((r, g) for r, g in routes if r is not None), key=lambda item: len(item[0])
+    )
+    return goal, route
+
+
+def test_division_marches_along_its_route(world: World) -> None:
+    divisions, pathfinder = world.divisions, world.pathfinder
+    goal, _ = _far_province(world, 0)
+    (division,) = divisions.ids_of(0)[:1]
+    (route,) = pathfinder.routes([int(divisions.location[division])], goal)
+    divisions.move([division], goal)
+    visited = [int(divisions.location[division])]
+    hours = 0
+    misses = pathfinder.misses
+    while divisions.destination[division] >= 0:
+        divisions.advance(pathfinder, world.provinces.controller)
+        hours += 1
+        if divisions.location[division] != visited[-1]:
+            visited.append(int(divisions.location[division]))
+        assert hours < 10_000
+    assert tuple(visited) == route
+    # The route was found before the march and walked without another search.
+    assert pathfinder.misses == misses
+    speed = divisions.stat("speed", division)
+    assert hours == pytest.approx(pathfinder.length(route) / speed, abs=len(route))
+
+
+def test_orders_to_one_goal_are_routed_in_one_search(
+    world: World, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    divisions, pathfinder = world.divisions, world.pathfinder
+    searches = []
+    search_back = pathfinder._search_back
+    monkeypatch.setattr(
+        pathfinder, "_search_back", lambda *args: searches.append(args) or search_back(*args)
+    )
+    goal, _ = _far_province(world, 0)
+    own = np.flatnonzero(world.provinces.controller == 0)
+    starts = own[own != goal][:6].astype(np.int32)
+    ids = divisions.spawn_many(0, 0, starts)
+    divisions.move(ids, goal)
+    misses = pathfinder.misses
+    divisions.advance(pathfinder, world.provinces.controller)
+    assert pathfinder.misses == misses + len(starts) and len(searches) == 1
+    assert (divisions.next_hop[ids] >= 0).all()
+    for _ in range(24 * 5):
+        divisions.advance(pathfinder, world.provinces.controller)
+    assert pathfinder.misses == misses + len(starts) and len(searches) == 1
+
+
+def test_the_rest_of_a_route_is_routed_the_same(world: World) -> None:
+    goal, _ = _far_province(world, 0)
+    capital = int(world.capitals[0])
+    (route,) = world.pathfinder.routes([capital], goal)
+    for leg in range(len(route) - 1):
+        fresh = Pathfinder(world.provinces)
+        assert fresh.routes([route[leg]], goal) == [route[leg:]]
+
+
+def test_division_routes_around_a_lost_province(world: World) -> None:
+    divisions = world.divisions
+    goal, route = _far_province(world, 0)
+    (division,) = divisions.ids_of(0)[:1]
+    divisions.move([division], goal)
+    divisions.advance(world.pathfinder, world.provinces.controller)
+    ahead = int(divisions.next_hop[division])
+    world.provinces.update("controller", np.array([ahead]), np.array([1], dtype=np.int16))
+    for _ in range(5_000):
+        divisions.advance(world.pathfinder, world.provinces.controller)
+        assert divisions.location[division] != ahead
+        if divisions.destination[division] < 0:
+            break
+    controller = world.provinces.controller
+    assert controller[divisions.location[division]] == 0
+
+
+def test_cached_routes_match_a_fresh_search(world: World) -> None:
+    rng = np.random.default_rng(7)
+    provinces = world.provinces
+    land = np.flatnonzero(~provinces.is_sea)
+    pairs = [tuple(rng.choice(land, 2)) for _ in range(300)]
+    for start, goal in pairs:
+        world.pathfinder.route(int(start), int(goal))
+    contested = np.flatnonzero(provinces.contested_edges())
+    taken = provinces.adj_targets[rng.choice(contested, 40, replace=False)]
+    provinces.update("controller", taken, provinces.controller[provinces.adj_sources[0]])
+    fresh = Pathfinder(provinces)
+    for start, goal in pairs:
+        assert world.pathfinder.route(int(start), int(goal)) == fresh.route(int(start), int(goal))
+
+
+def test_fleets_sail_between_regions(world: World) -> None:
+    navy = world.navy
+    row = int(np.flatnonzero(navy.mission[: navy.count] == Mission.CONVOY_RAIDING)[0])
+    here = int(navy.region[row])
+    reachable = [
+        r for r in range(len(navy.sea_regions)) if r != here and navy.passage(here, r) > 0
+    ]
+    goal = max(reachable, key=lambda r: navy.passage(here, r))
+    hours = navy.passage(here, goal)
+    route = world.pathfinder.route(
+        int(navy.anchor[here]), int(navy.anchor[goal]), MovementClass.NAVAL
+    )
+    assert all(world.provinces.is_sea[list(route)])
+    assert navy.assign(row, Mission.CONVOY_RAIDING, goal)
+    assert navy.region[row] == goal and navy.transit[row] == hours
+    for _ in range(hours):
+        navy.step(world.fronts.hostile)
+        assert navy.contact[row] == 0.0
+    assert navy.transit[row] == 0
+
+
+def test_march_continues_identically_after_load(world: World, tmp_path: Path) -> None:
+    goal, _ = _far_province(world, 0)
+    world.divisions.move(world.divisions.ids_of(0), goal)
+    build_scheduler(world).run(30)
+    assert world.divisions.next_hop[world.divisions.ids_of(0)].max() >= 0
+    loaded = savegame.load(savegame.save(world, tmp_path / "march.hsav"))
+    build_scheduler(world).run(200)
+    build_scheduler(loaded).run(200)
+    assert loaded.digest() == world.digest()
@@ -0,0 +1,34 @@
+"""Per-country systems on the parallel stepper: the worker count never changes a run."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from combat import seed_border_battles
+from parallel import PARTITIONS, ParallelStepper, partition_countries
+from simulation import build_scheduler
+from world import World
+
+
+def _campaign_digest(workers: int) -> str:
+    world = World.generate(40, 30, 8, seed=3)
+    world.stepper = ParallelStepper(workers)
+    try:
+        world.fronts.declare_war(0, 2)
+        world.fronts.declare_war(4, 7)
+        seed_border_battles(world, 6, np.random.default_rng(2))
+        build_scheduler(world).run(24 * 15)
+    finally:
+        world.stepper.close()
+    return world.digest()
+
+
+def test_partitions_cover_every_country_once(world: World) -> None:
+    partitions = partition_countries(world, PARTITIONS)
+    assert sorted(np.concatenate(partitions).tolist()) == list(range(world.n_countries))
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_worker_count_does_not_change_the_digest(workers: int) -> None:
+    assert _campaign_digest(workers) == _campaign_digest(1)
@@ -0,0 +1,67 @@
+"""A day of trade, shortages and output for every production line at once."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from modifiers import Modifier, Scope
+from production import (
+    EFFICIENCY_CAP,
+    EFFICIENCY_GAIN,
+    OUTPUT_PER_FACTORY,
+    RESOURCE_PENALTY,
+    START_EFFICIENCY,
+    UNIT_COST,
+    Equipment,
+    ProductionTable,
+    Resource,
+)
+from world import World
+
+
+def _steel_trade(world: World) -> ProductionTable:
+    """Country 0 makes artillery without steel; countries 1 and 2 have 30 and 10 to spare."""
+    table = ProductionTable(world.provinces, world.n_countries, world.modifiers)
+    table.resources[:] = 0.0
+    table.resources[1, Resource.STEEL] = 30.0
+    table.resources[2, Resource.STEEL] = 10.0
+    table.military_factories[0] = 10
+    table.civilian_factories[0] = 10
+    table.add_line(0, Equipment.ARTILLERY, 10)
+    return table
+
+
+def test_trade_balances_and_convoy_losses_only_cut_what_arrives(world: World) -> None:
+    table = _steel_trade(world)
+    table.convoy_efficiency[0] = 0.5
+    table.step()
+    steel = Resource.STEEL
+    # Ten artillery factories need 20 steel, all of it bought, pro rata to surplus.
+    assert table.imports[0, steel] == pytest.approx(20.0)
+    assert table.exports[1:3, steel] == pytest.approx([15.0, 5.0])
+    np.testing.assert_allclose(table.imports.sum(axis=0), table.exports.sum(axis=0))
+    assert table.trade_factories.sum() == pytest.approx(0.0)
+    assert table.trade_factories[0] == pytest.approx(-2.5)
+
+    # Half the steel arrived, so each factory lacks one of its two units.
+    output = 1.0 + world.modifiers.column(Scope.COUNTRY, Modifier.FACTORY_OUTPUT)[0]
+    ic = 10 * OUTPUT_PER_FACTORY * START_EFFICIENCY * (1.0 - RESOURCE_PENALTY) * output
+    built = np.floor(ic / UNIT_COST[Equipment.ARTILLERY])
+    assert table.stockpile[0, Equipment.ARTILLERY] == built
+    assert table.progress[0] == pytest.approx(ic - built * UNIT_COST[Equipment.ARTILLERY])
+    grown = START_EFFICIENCY + EFFICIENCY_GAIN * EFFICIENCY_CAP**2 / START_EFFICIENCY
+    assert table.efficiency[0] == pytest.approx(grown)
+
+
+def test_convoys_do_not_change_the_trade(world: World) -> None:
+    safe, raided = _steel_trade(world), _steel_trade(world)
+    raided.convoy_efficiency[0] = 0.25
+    safe.step()
+    raided.step()
+    np.testing.assert_array_equal(raided.imports, safe.imports)
+    np.testing.assert_array_equal(raided.trade_factories, safe.trade_factories)
+    cost = UNIT_COST[Equipment.ARTILLERY]
+    safe_ic = safe.stockpile[0, Equipment.ARTILLERY] * cost + safe.progress[0]
+    raided_ic = raided.stockpile[0, Equipment.ARTILLERY] * cost + raided.progress[0]
+    assert raided_ic < safe_ic
@@ -0,0 +1,78 @@
+"""Recording a run and seeking back into it: keyframes, deltas and the file header."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pytest
+
+from combat import seed_border_battles
+from replay import Replay, ReplayFormatError, ReplayRecorder
+from scheduler import Cadence
+from simulation import build_scheduler
+from world import World
+
+
+def _record(
+    path: Path,
+    world: World,
+    hours: int,
+    at: dict[int, Callable[[World], None]] | None = None,
+) -> dict[int, str]:
+    """Run ``world`` for ``hours`` while recording; ``at`` maps an hour to a callback."""
+    scheduler = build_scheduler(world)
+    recorder = ReplayRecorder(path)
+    scheduler.register("replay", recorder, Cadence.HOURLY)
+    recorder(world)
+    digests = {}
+    try:
+        for hour, action in sorted((at or {}).items()):
+            scheduler.run(hour - world.clock.hour)
+            action(world)
+            digests[world.clock.hour] = world.digest()
+        scheduler.run(hours - world.clock.hour)
+    finally:
+        recorder.close()
+    return digests
+
+
+def test_seek_matches_the_live_world(tmp_path: Path) -> None:
+    world = World.generate(40, 30, 8, seed=3)
+    seed_border_battles(world, 10, np.random.default_rng(1))
+    path = tmp_path / "run.replay"
+    _record(path, world, 800)
+    replay = Replay(path)
+    assert replay.last_hour == world.clock.hour
+    assert replay.seek(replay.last_hour).digest() == world.digest()
+
+
+def test_resize_before_a_keyframe_does_not_leak_into_base_refs(tmp_path: Path) -> None:
+    # Battles start late in January and are all over before March: the March
+    # keyframe's empty battle arrays equal the first keyframe and are stored as
+    # "base" references, which must resolve to hour 0, not to the January resize.
+    world = World.generate(40, 30, 8, seed=3)
+    assert len(world.battles) == 0
+
+    def start(world: World) -> None:
+        assert seed_border_battles(world, 12, np.random.default_rng(5)) > 0
+
+    def end_all(world: World) -> None:
+        for row in range(len(world.battles) - 1, -1, -1):
+            world.battles.end(row)
+
+    path = tmp_path / "run.replay"
+    digests = _record(path, world, 1463, at={740: start, 1000: end_all})
+    replay = Replay(path)
+    assert len(replay.chunks) == 3
+    assert replay.seek(1463).digest() == world.digest()
+    assert replay.seek(1000).digest() == digests[1000]
+    assert len(replay.seek(741).battles) > 0
+
+
+def test_rejects_files_that_are_not_replays(tmp_path: Path) -> None:
+    path = tmp_path / "junk.replay"
+    path.write_bytes(b"not a replay at all")
+    with pytest.raises(ReplayFormatError, match="not a replay"):
+        Replay(path)
@@ -0,0 +1,64 @@
+"""Tech tree compilation and the batched research step."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from research import STANDARD_TECHS, ResearchTable, Technology, TechTree
+
+
+def test_standard_tree_is_topologically_ordered() -> None:
+    tree = TechTree.compile(STANDARD_TECHS)
+    assert len(tree) == len(STANDARD_TECHS)
+    for tech in range(len(tree)):
+        assert (tree.prerequisites_of(tech) < tech).all()
+        for dependent in tree.dependents_of(tech).tolist():
+            assert tech in tree.prerequisites_of(dependent)
+
+
+def test_cycle_is_rejected() -> None:
+    techs = [
+        Technology("a", 1936, 10),
+        Technology("b", 1936, 10, ("a", "d")),
+        Technology("c", 1936, 10, ("b",)),
+        Technology("d", 1936, 10, ("c",)),
+    ]
+    with pytest.raises(ValueError, match="cycle through \\['b', 'c', 'd'\\]"):
+        TechTree.compile(techs)
+
+
+def test_self_prerequisite_is_a_cycle() -> None:
+    with pytest.raises(ValueError, match="cycle"):
+        TechTree.compile([Technology("a", 1936, 10, ("a",))])
+
+
+@pytest.mark.parametrize(
+    ("techs", "message"),
+    [
+        ([Technology("a", 1936, 10), Technology("a", 1937, 10)], "defined twice"),
+        ([Technology("a", 1936, 10, ("b",))], "unknown tech 'b'"),
+        ([Technology("b", 1936, 10), Technology("a", 1936, 10, ("b", "b"))], "twice"),
+    ],
+)
+def test_malformed_trees_are_rejected(techs: list[Technology], message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        TechTree.compile(techs)
+
+
+def test_completion_unlocks_dependents(world) -> None:
+    tree = TechTree.compile(
+        [
+            Technology("a", 1936, 2),
+            Technology("b", 1936, 2),
+            Technology("c", 1936, 2, ("a", "b")),
+        ]
+    )
+    table = ResearchTable(tree, 2, world.modifiers)
+    a, b, c = (tree.index[name] for name in "abc")
+    assert table.available[:, c].tolist() == [False, False]
+    table.complete(np.array([0]), a)
+    assert not table.available[0, c]
+    table.complete(np.array([0, 1]), b)
+    assert table.available[:, c].tolist() == [True, False]
+    assert not table.available[0, a] and not table.available[0, b]
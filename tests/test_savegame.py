@@ -0,0 +1,78 @@
+"""Save games: bit-identical round trips, lazy sections and version checks."""
+
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import savegame
+from combat import seed_border_battles
+from simulation import build_scheduler
+from world import World
+
+
+@pytest.fixture
+def campaign(world: World) -> World:
+    world.fronts.declare_war(0, 1)
+    world.fronts.declare_war(2, 3)
+    seed_border_battles(world, 12, np.random.default_rng(1))
+    build_scheduler(world).run(24 * 12)
+    return world
+
+
+def test_round_trip_is_bit_identical(campaign: World, tmp_path: Path) -> None:
+    path = savegame.save(campaign, tmp_path / "a.hsav")
+    loaded = savegame.load(path)
+    assert loaded.clock.hour == campaign.clock.hour
+    assert loaded.digest() == campaign.digest()
+    # Saving the loaded world writes the same file again.
+    again = savegame.save(loaded, tmp_path / "b.hsav")
+    assert again.read_bytes() == path.read_bytes()
+
+
+def test_loaded_world_runs_on_identically(campaign: World, tmp_path: Path) -> None:
+    loaded = savegame.load(savegame.save(campaign, tmp_path / "a.hsav"))
+    build_scheduler(campaign).run(24 * 5)
+    build_scheduler(loaded).run(24 * 5)
+    assert loaded.digest() == campaign.digest()
+
+
+def test_background_save_matches(campaign: World, tmp_path: Path) -> None:
+    future = savegame.save_in_background(campaign, tmp_path / "bg.hsav")
+    digest = campaign.digest()
+    assert savegame.load(future.result()).digest() == digest
+
+
+def test_sections_are_mapped_on_demand(campaign: World, tmp_path: Path) -> None:
+    save_file = savegame.SaveFile(savegame.save(campaign, tmp_path / "a.hsav"))
+    assert save_file.mapped == 0
+    owner = save_file["provinces/owner"]
+    np.testing.assert_array_equal(owner, campaign.provinces.owner)
+    assert save_file.mapped == 1
+    savegame._restore(save_file.meta, save_file)
+    assert save_file.mapped == len(save_file)
+
+
+def test_other_versions_are_refused(campaign: World, tmp_path: Path) -> None:
+    path = savegame.save(campaign, tmp_path / "a.hsav")
+    data = bytearray(path.read_bytes())
+    struct.pack_into("<I", data, 8, savegame.FORMAT_VERSION - 1)
+    old = tmp_path / "old.hsav"
+    old.write_bytes(bytes(data))
+    with pytest.raises(savegame.SaveFormatError, match="format version"):
+        savegame.load(old)
+    (tmp_path / "junk.hsav").write_bytes(b"not a save game at all")
+    with pytest.raises(savegame.SaveFormatError, match="not a save game"):
+        savegame.load(tmp_path / "junk.hsav")
+
+
+def test_missing_systems_start_fresh(campaign: World) -> None:
+    meta, arrays = savegame._snapshot(campaign)
+    arrays = {name: array for name, array in arrays.items() if not name.startswith("air/")}
+    restored = savegame._restore(meta, arrays)
+    fresh = World(restored.provinces, restored.capitals)
+    assert restored.air.count == fresh.air.count
+    assert restored.production.count == campaign.production.count
@@ -0,0 +1,137 @@
+import pickle
+
+import pytest
+
+import script
+from script import Block, ScriptCache, ScriptSyntaxError, TypedBlock, parse
+
+
+def test_scalars_duplicates_and_bare_lists():
+    tree = parse(
+        """
+        # comment
+        capital = 64
+        stability = 0.65
+        major = yes
+        puppet = no
+        start = 1936.1.1
+        name = "The \\"Old\\" Guard"
+        add_core_of = FRA
+        add_core_of = BEL
+        provinces = { 1 2 3 }
+        """
+    )
+    assert tree.get("capital") == 64
+    assert tree.get("stability") == 0.65
+    assert tree.get("major") is True and tree.get("puppet") is False
+    assert tree.get("start") == "1936.1.1"
+    assert tree.get("name") == 'The "Old" Guard'
+    assert tree.get_all("add_core_of") == ["FRA", "BEL"]
+    assert tree.get("provinces").values() == [1, 2, 3]
+    assert tree.keys()[:2] == ["capital", "stability"]
+
+
+def test_comparison_operators_are_kept():
+    tree = parse("trigger = { manpower > 1000 stability <= 0.5 tag != GER }")
+    assert list(tree.get("trigger")) == [
+        ("manpower", ">", 1000),
+        ("stability", "<=", 0.5),
+        ("tag", "!=", "GER"),
+    ]
+
+
+def test_typed_block_is_one_value():
+    tree = parse("color = rgb { 10 20 30 }\nui = { color = hsv { 0.1 0.2 0.3 } }\nnext = 1")
+    color = tree.get("color")
+    assert isinstance(color, TypedBlock)
+    assert color.kind == "rgb"
+    assert color.values() == [10, 20, 30]
+    nested = tree.get("ui").get("color")
+    assert nested.kind == "hsv" and nested.values() == [0.1, 0.2, 0.3]
+    assert tree.keys() == ["color", "ui", "next"]
+    assert len(tree) == 3
+
+
+def test_typed_block_equality_includes_the_kind():
+    rgb = parse("c = rgb { 1 2 3 }").get("c")
+    assert rgb == parse("c = rgb { 1 2 3 }").get("c")
+    assert rgb != parse("c = hsv { 1 2 3 }").get("c")
+    assert rgb != parse("c = { 1 2 3 }").get("c")
+
+
+def test_typed_block_survives_pickling():
+    tree = parse("color = rgb { 1 2 3 }")
+    copy = pickle.loads(pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL))
+    assert copy == tree
+    assert copy.get("color").kind == "rgb"
+
+
+@pytest.mark.parametrize(
+    "source, message",
+    [
+        ("a = { b = 1", "unclosed"),
+        ("a = 1 }", "unmatched"),
+        ("= 1", "without a key"),
+        ("a =", "missing value"),
+        ("a = = 1", "unexpected"),
+        ('a = "open', "unexpected character"),
+    ],
+)
+def test_syntax_errors(source, message):
+    with pytest.raises(ScriptSyntaxError, match=message):
+        parse(source)
+
+
+def test_syntax_error_reports_the_line():
+    with pytest.raises(ScriptSyntaxError) as info:
+        parse("a = 1\nb = { c = 2\n}\n}", "common/x.txt")
+    assert info.value.line == 4
+    assert str(info.value).startswith("common/x.txt:4:")
+
+
+def test_cache_reuses_and_reparses_on_change(tmp_path):
+    source = tmp_path / "flags.txt"
+    source.write_text("color = rgb { 1 2 3 }")
+    cache = ScriptCache(tmp_path / "cache")
+    first = cache.load(source)
+    cache.flush()
+    warm = ScriptCache(tmp_path / "cache")
+    assert warm.load(source) == first
+    assert (warm.parsed, warm.reused) == (0, 1)
+    source.write_text("color = rgb { 4 5 6 }")
+    assert warm.load(source).get("color").values() == [4, 5, 6]
+    assert warm.parsed == 1
+
+
+def test_cache_ignores_trees_from_another_parser_version(tmp_path, monkeypatch):
+    source = tmp_path / "flags.txt"
+    source.write_text("color = rgb { 1 2 3 }")
+    monkeypatch.setattr(script, "PARSER_VERSION", script.PARSER_VERSION - 1)
+    old = ScriptCache(tmp_path / "cache")
+    old.load(source)
+    old.flush()
+    # Plant an old-shape tree under the old version's name.
+    stale = Block([("color", "=", "rgb"), (None, "", Block([(None, "", 1)]))])
+    (stale_path,) = (tmp_path / "cache").glob("*.v*.pickle")
+    stale_path.write_bytes(pickle.dumps(stale))
+    monkeypatch.undo()
+    cache = ScriptCache(tmp_path / "cache")
+    tree = cache.load(source)
+    assert cache.parsed == 1
+    assert tree.get("color").kind == "rgb"
+
+
+def test_cache_reparses_a_truncated_tree(tmp_path):
+    source = tmp_path / "flags.txt"
+    source.write_text("color = rgb { 1 2 3 }")
+    ScriptCache(tmp_path / "cache").load(source)
+    # No index was flushed, so the next load finds the tree by content hash.
+    (cached,) = (tmp_path / "cache").glob("*.v*.pickle")
+    cached.write_bytes(cached.read_bytes()[:10])
+    cache = ScriptCache(tmp_path / "cache")
+    assert cache.load(source).get("color").values() == [1, 2, 3]
+    assert (cache.parsed, cache.reused) == (1, 0)
+    cached.write_bytes(b"")
+    cache = ScriptCache(tmp_path / "cache")
+    assert cache.load(source).get("color").kind == "rgb"
+    assert cache.parsed == 1
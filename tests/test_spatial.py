@@ -0,0 +1,71 @@
+"""The grid index against brute-force scans, and the air range it feeds."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from air import RANGE_KM, AirMission, WingType
+from world import World
+
+
+def _points(world: World, count: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Random points over the map and a margin around it."""
+    spatial = world.spatial
+    rng = np.random.default_rng(seed)
+    margin = 2.0 * spatial.cell_km
+    x = rng.uniform(spatial.x0 - margin, float(spatial.x.max()) + margin, count)
+    y = rng.uniform(spatial.y0 - margin, float(spatial.y.max()) + margin, count)
+    return x, y
+
+
+def test_pick_finds_the_nearest_centroid(world: World) -> None:
+    spatial = world.spatial
+    x, y = _points(world, 500, seed=1)
+    d2 = (spatial.x[None, :] - x[:, None]) ** 2 + (spatial.y[None, :] - y[:, None]) ** 2
+    nearest = d2.min(axis=1)
+    on_map = nearest <= spatial.cell_km**2
+    many = spatial.pick_many(x, y)
+    for i, (px, py) in enumerate(zip(x.tolist(), y.tolist())):
+        picked = spatial.pick(px, py)
+        if not on_map[i]:
+            assert picked == -1 and many[i] == -1
+            continue
+        # Ties between equidistant centroids may go either way.
+        assert d2[i, picked] == nearest[i]
+        assert d2[i, many[i]] == nearest[i]
+    assert on_map.any() and not on_map.all()
+
+
+def test_within_matches_a_scan_of_every_centroid(world: World) -> None:
+    spatial = world.spatial
+    x, y = _points(world, 100, seed=2)
+    radii = np.random.default_rng(3).uniform(0.0, 10.0 * spatial.cell_km, len(x))
+    for px, py, radius in zip(x.tolist(), y.tolist(), radii.tolist()):
+        d2 = (spatial.x - px) ** 2 + (spatial.y - py) ** 2
+        expected = np.flatnonzero(d2 <= radius * radius)
+        np.testing.assert_array_equal(spatial.within(px, py, radius), expected)
+        np.testing.assert_array_equal(
+            spatial.regions_within(px, py, radius), np.unique(world.provinces.region[expected])
+        )
+
+
+def test_wings_out_of_range_stay_grounded(world: World) -> None:
+    air, provinces = world.air, world.provinces
+    capital = int(world.capitals[0])
+    distance = np.hypot(provinces.x - provinces.x[capital], provinces.y - provinces.y[capital])
+    closest = np.full(air.n_regions, np.inf)
+    np.minimum.at(closest, provinces.region, distance)
+    reach = air.reach[0, WingType.FIGHTER]
+    np.testing.assert_array_equal(reach, closest <= RANGE_KM[WingType.FIGHTER])
+    # The test map is small enough for fighters to reach everywhere from most
+    # capitals, so take a region out of range by hand.
+    far = int(np.argmax(closest))
+    reach[far] = False
+    world.fronts.declare_war(0, 2)
+    air.region[air.wings_of(2)] = far
+    air.region[air.wings_of(0)] = far
+    air.add(0, far, AirMission.SUPERIORITY, WingType.FIGHTER)
+    air.add(2, far, AirMission.SUPERIORITY, WingType.FIGHTER)
+    air.step(world.fronts.hostile)
+    assert air.superiority[far, 0] == 0.0
+    assert air.planes_lost[0] == 0.0
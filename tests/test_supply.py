@@ -0,0 +1,78 @@
+"""Incremental supply repair against a full solve of the whole map."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from air import AirMission, WingType
+from provinces import EDGE_RAILWAY
+from supply import supply_system
+from world import World
+
+
+def _assert_matches_full_solve(world: World) -> None:
+    supply = world.supply
+    full = np.maximum(supply.solve_full(), 0.0)
+    np.testing.assert_array_equal(np.maximum(supply.value, 0.0), full)
+
+
+def test_captures_match_full_solve(world: World) -> None:
+    provinces = world.provinces
+    rng = np.random.default_rng(11)
+    for _ in range(20):
+        contested = np.flatnonzero(provinces.contested_edges())
+        edges = rng.choice(contested, size=min(15, len(contested)), replace=False)
+        src, dst = provinces.adj_sources[edges], provinces.adj_targets[edges]
+        provinces.update("controller", dst, provinces.controller[src])
+        world.supply.update()
+        assert 0 < world.supply.last_recomputed < len(provinces)
+        _assert_matches_full_solve(world)
+
+
+def test_capital_loss_and_recapture(world: World) -> None:
+    provinces = world.provinces
+    capital = int(world.capitals[0])
+    provinces.update("controller", capital, 1)
+    world.supply.update()
+    _assert_matches_full_solve(world)
+    provinces.update("controller", capital, 0)
+    world.supply.update()
+    _assert_matches_full_solve(world)
+
+
+def test_infrastructure_and_railways_match_full_solve(world: World) -> None:
+    provinces = world.provinces
+    land = np.flatnonzero(~provinces.is_sea)
+    rng = np.random.default_rng(5)
+    ids = rng.choice(land, size=60, replace=False)
+    provinces.update("infrastructure", ids, rng.integers(0, 6, size=60))
+    world.supply.update()
+    _assert_matches_full_solve(world)
+
+    rails = np.flatnonzero(provinces.adj_flags & EDGE_RAILWAY)
+    for edge in rng.choice(rails, size=10, replace=False).tolist():
+        a, b = int(provinces.adj_sources[edge]), int(provinces.adj_targets[edge])
+        world.supply.set_railway(a, b, working=False)
+    world.supply.update()
+    _assert_matches_full_solve(world)
+
+
+def test_enemy_air_superiority_lowers_delivered_supply(world: World) -> None:
+    provinces, air = world.provinces, world.air
+    world.fronts.declare_war(2, 0)
+    capital = int(world.capitals[0])
+    region = int(provinces.region[capital])
+    home = np.flatnonzero(provinces.controller == 0)
+    before = provinces.supply[home].copy()
+    # Country 0's planes are elsewhere; 2's fighters own the sky over its capital.
+    air.region[air.wings_of(0)] = (region + 1) % air.n_regions
+    for _ in range(4):
+        air.add(2, region, AirMission.SUPERIORITY, WingType.FIGHTER)
+        air.add(2, region, AirMission.STRATEGIC_BOMBING, WingType.BOMBER)
+    air.step(world.fronts.hostile)
+    assert air.superiority[region, 2] == 1.0
+    supply_system(world)
+    assert world.supply.bombing[capital] < 1.0
+    after = provinces.supply[home]
+    assert (after <= before).all() and after[home == capital] < before[home == capital]
+    _assert_matches_full_solve(world)
@@ -0,0 +1,76 @@
+"""Effective division stats: one additive stacking rule and the per-country memo."""
+
+from __future__ import annotations
+
+import pytest
+
+from modifiers import Modifier, Scope
+from world import World
+
+
+def _infantry(world: World, country: int = 0) -> int:
+    return int(world.divisions.ids_of(country)[0])
+
+
+def test_country_and_unit_sources_add_up(world: World) -> None:
+    engine, cache = world.modifiers, world.division_stats
+    division = _infantry(world)
+    base = world.divisions.stat("soft_attack", division)
+    engine.add(Scope.COUNTRY, 0, "equipment:infantry_equipment_2", {Modifier.SOFT_ATTACK: 0.2})
+    engine.add(Scope.COUNTRY, 0, "doctrine:mobile_warfare", {Modifier.SOFT_ATTACK: 0.1})
+    engine.add(Scope.UNIT, division, "spirit:veterans", {Modifier.SOFT_ATTACK: 0.3})
+    national = engine.get(Scope.COUNTRY, 0, Modifier.SOFT_ATTACK)
+    assert national >= 0.3
+    (row,) = cache.rows([division])
+    assert row[0] == pytest.approx(base * (1.3 + national))
+    # A division of the same template and country without unit sources.
+    other = int(world.divisions.ids_of(0)[1])
+    assert cache.rows([other])[0][0] == pytest.approx(base * (1.0 + national))
+
+
+def test_penalties_never_go_below_zero(world: World) -> None:
+    engine = world.modifiers
+    division = _infantry(world)
+    engine.add(Scope.COUNTRY, 0, "doctrine:broken", {Modifier.DEFENSE: -0.8})
+    engine.add(Scope.UNIT, division, "spirit:routed", {Modifier.DEFENSE: -0.5})
+    (row,) = world.division_stats.rows([division])
+    assert row[2] == 0.0
+
+
+def test_armor_and_piercing_reach_the_battle_side(world: World) -> None:
+    ids = world.divisions.ids_of(0)
+    before = world.division_stats.side(ids)
+    world.modifiers.add(Scope.COUNTRY, 0, "equipment:ap_rounds", {Modifier.PIERCING: 0.5})
+    after = world.division_stats.side(ids)
+    assert after.piercing == pytest.approx(before.piercing * 1.5)
+    assert after.armor == before.armor
+
+
+def test_entries_are_recomputed_only_after_stat_modifiers_change(world: World) -> None:
+    cache = world.division_stats
+    a, b = _infantry(world, 0), _infantry(world, 1)
+    cache.rows([a, b])
+    misses = cache.misses
+    # An economic law leaves every division stat, and the cache, alone.
+    world.modifiers.add(Scope.COUNTRY, 1, "law:war_economy", {Modifier.FACTORY_OUTPUT: 0.1})
+    cache.rows([a, b])
+    assert cache.misses == misses
+    world.modifiers.add(Scope.COUNTRY, 1, "doctrine:grand_battleplan", {Modifier.DEFENSE: 0.1})
+    cache.rows([a, b])
+    assert cache.misses == misses + 1
+    cache.rows([a, b])
+    assert cache.misses == misses + 1
+
+
+def test_disbanded_units_lose_their_modifiers(world: World) -> None:
+    division = _infantry(world)
+    world.modifiers.add(Scope.UNIT, division, "spirit:veterans", {Modifier.DEFENSE: 0.5})
+    world.divisions.disband(division)
+    assert world.modifiers.sources_of(Scope.UNIT, division) == {}
+
+
+def test_stat_modifiers_are_division_scoped(world: World) -> None:
+    with pytest.raises(ValueError, match="cannot be given at STATE scope"):
+        world.modifiers.add(Scope.STATE, 0, "equipment:x", {Modifier.ARMOR: 0.1})
+    with pytest.raises(ValueError, match="is not one of"):
+        world.modifiers.add(Scope.COUNTRY, 0, "variant:x", {Modifier.ARMOR: 0.1})
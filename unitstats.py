@@ -0,0 +1,110 @@
+"""Effective division stats from the modifier engine, memoized per template and country.
+
+A division's effective stats are its template's base stats changed by
+everything its country and the division itself have.  All of it --
+national spirits, laws, advisors, techs, and the equipment variants and
+doctrines that change single stats in detail -- is a source in the
+:class:`modifiers.ModifierEngine`, at country scope or, for one division,
+at unit scope.  There is one stacking rule, the engine's: every modifier is
+a percentage, percentages add up, and a stat is
+``base * max(1 + country total + unit total, 0)``.
+
+Combat reads these whenever a battle starts, so :class:`DivisionStatCache`
+keeps the scaled stats of each (template, country) pair with the version of
+the country's division-stat modifiers they were computed for
+(:meth:`modifiers.ModifierEngine.keys_version`), and recomputes an entry
+only after one of those changed -- not after a law, tech or building that
+touches only the economy.  Templates are immutable (a changed
+design is a new template), so the template half of the key never goes
+stale.  Divisions with unit-scope sources of their own are scaled from the
+base stats row by row.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from combat import BattleSide
+from divisions import STAT_FIELDS, DivisionStore
+from modifiers import Modifier, ModifierEngine, Scope
+
+_STAT = {name: i for i, name in enumerate(STAT_FIELDS)}
+
+# Engine modifiers that scale a division stat, and the stat's column.
+ENGINE_STATS = {
+    Modifier.SOFT_ATTACK: _STAT["soft_attack"],
+    Modifier.HARD_ATTACK: _STAT["hard_attack"],
+    Modifier.DEFENSE: _STAT["defense"],
+    Modifier.BREAKTHROUGH: _STAT["breakthrough"],
+    Modifier.ARMOR: _STAT["armor"],
+    Modifier.PIERCING: _STAT["piercing"],
+    Modifier.MAX_ORG: _STAT["max_org"],
+}
+_ENGINE_KEYS = np.array(list(ENGINE_STATS), dtype=np.intp)
+_ENGINE_COLUMNS = np.array(list(ENGINE_STATS.values()), dtype=np.intp)
+
+
+def scale(base: np.ndarray, percent: np.ndarray) -> np.ndarray:
+    """``base`` stats (rows of :data:`divisions.STAT_FIELDS`) with summed engine ``percent``.
+
+    ``percent`` holds one column per :data:`ENGINE_STATS` key.
+    """
+    stats = np.array(base, dtype=np.float64)
+    stats[..., _ENGINE_COLUMNS] *= np.maximum(1.0 + percent, 0.0)
+    return stats
+
+
+class DivisionStatCache:
+    """Memoized effective stats per (template, country), recomputed only when stale."""
+
+    def __init__(self, divisions: DivisionStore, engine: ModifierEngine) -> None:
+        self.divisions = divisions
+        self.engine = engine
+        # (template, country) -> (stat-modifier version computed for, stat row)
+        self._entries: dict[tuple[int, int], tuple[int, np.ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+        # A freed ID is handed to the next division raised, without its modifiers.
+        divisions.subscribe(lambda ids: engine.clear(Scope.UNIT, ids))
+
+    def stats(self, template: int, country: int) -> np.ndarray:
+        """Effective stats of ``template`` for ``country``; do not modify the returned row."""
+        key = (template, country)
+        version = self.engine.keys_version(Scope.COUNTRY, country, _ENGINE_KEYS)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        national = self.engine.totals[Scope.COUNTRY][country, _ENGINE_KEYS]
+        row = scale(self.divisions.template_stats[template], national)
+        row.flags.writeable = False
+        self._entries[key] = (version, row)
+        return row
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """Effective stats of each division in ``ids``, one row each."""
+        ids = np.asarray(ids, dtype=np.int32)
+        divisions = self.divisions
+        template = divisions.template[ids]
+        country = divisions.country[ids]
+        pairs, inverse = np.unique(
+            template.astype(np.int64) * 65536 + country.astype(np.int64), return_inverse=True
+        )
+        table = np.stack([self.stats(int(p) // 65536, int(p) % 65536) for p in pairs.tolist()])
+        rows = table[inverse.reshape(-1)]
+        if self.engine.has_any(Scope.UNIT):
+            local = self.engine.gather(Scope.UNIT, ids, _ENGINE_KEYS)
+            own = np.flatnonzero(local.any(axis=1))
+            if len(own):
+                national = self.engine.totals[Scope.COUNTRY][country[own]][:, _ENGINE_KEYS]
+                base = divisions.template_stats[template[own]]
+                rows[own] = scale(base, national + local[own])
+        return rows
+
+    def side(self, ids: np.ndarray) -> BattleSide:
+        """Battle stats of ``ids`` with every modifier applied."""
+        return self.divisions.side(ids, self.rows(ids))
+
+    def __len__(self) -> int:
+        return len(self._entries)
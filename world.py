@@ -0,0 +1,138 @@
+"""Top-level world state shared by every simulation system."""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from ai import StrategicAI
+from air import AirTable
+from buildings import BuildingTable
+from combat import BattleTable
+from divisions import DivisionStore
+from events import TriggerEngine
+from fronts import FrontEngine
+from mapgen import generate_map
+from modifiers import ModifierEngine
+from naval import NavalTable
+from parallel import ParallelStepper
+from pathfinding import Pathfinder
+from production import ProductionTable
+from provinces import ProvinceStore
+from research import ResearchTable, fractional_year
+from scheduler import GameClock
+from spatial import SpatialIndex
+from supply import SupplyNetwork
+from unitstats import DivisionStatCache
+
+
+@dataclass
+class World:
+    provinces: ProvinceStore
+    capitals: np.ndarray
+    seed: int = 0
+    clock: GameClock = field(default_factory=GameClock)
+    battles: BattleTable = field(default_factory=BattleTable)
+    # Monthly (hour, provinces controlled per country) samples.
+    territory: list[tuple[int, np.ndarray]] = field(default_factory=list)
+    supply_debug: bool = False
+    stepper: ParallelStepper = field(default_factory=ParallelStepper, repr=False)
+    pathfinder: Pathfinder = field(init=False)
+    spatial: SpatialIndex = field(init=False, repr=False)
+    supply: SupplyNetwork = field(init=False)
+    # Strength lost in combat per country.
+    casualties: np.ndarray = field(init=False)
+    triggers: TriggerEngine = field(init=False, repr=False)
+    modifiers: ModifierEngine = field(init=False, repr=False)
+    production: ProductionTable = field(init=False, repr=False)
+    research: ResearchTable = field(init=False, repr=False)
+    navy: NavalTable = field(init=False, repr=False)
+    air: AirTable = field(init=False, repr=False)
+    buildings: BuildingTable = field(init=False, repr=False)
+    divisions: DivisionStore = field(init=False, repr=False)
+    # Derived from divisions and modifiers; rebuilt, never saved.
+    division_stats: DivisionStatCache = field(init=False, repr=False)
+    fronts: FrontEngine = field(init=False, repr=False)
+    ai: StrategicAI = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.casualties = np.zeros(self.n_countries, dtype=np.float64)
+        self.pathfinder = Pathfinder(self.provinces)
+        self.spatial = SpatialIndex(self.provinces)
+        self.supply = SupplyNetwork(self.provinces, self.capitals, debug=self.supply_debug)
+        self.triggers = TriggerEngine(self)
+        self.modifiers = ModifierEngine(self.provinces, self.n_countries)
+        self.production = ProductionTable.starting(
+            self.provinces, self.n_countries, self.modifiers
+        )
+        self.research = ResearchTable.starting(
+            self.n_countries,
+            self.modifiers,
+            self.production.civilian_factories,
+            fractional_year(self.clock.now),
+        )
+        self.navy = NavalTable.starting(self.provinces, self.n_countries, self.pathfinder)
+        self.air = AirTable.starting(
+            self.provinces, self.spatial, self.capitals, self.production.military_factories
+        )
+        self.buildings = BuildingTable.starting(
+            self.provinces, self.n_countries, self.modifiers, self.production, self.supply, self.air
+        )
+        self.divisions = DivisionStore.starting(self.capitals, self.production.military_factories)
+        self.division_stats = DivisionStatCache(self.divisions, self.modifiers)
+        self.fronts = FrontEngine(self.provinces, self.n_countries)
+        self.ai = StrategicAI(self)
+
+    @property
+    def n_countries(self) -> int:
+        return len(self.capitals)
+
+    def digest(self) -> str:
+        """SHA-256 over the simulation state, for determinism checks."""
+        h = hashlib.sha256()
+        h.update(self.clock.hour.to_bytes(8, "little"))
+        for array in self.provinces.columns().values():
+            h.update(np.ascontiguousarray(array).tobytes())
+        battles = self.battles
+        h.update(battles.count.to_bytes(8, "little"))
+        h.update(battles.province[: battles.count].tobytes())
+        h.update(battles.org[: battles.count].tobytes())
+        h.update(battles.strength[: battles.count].tobytes())
+        h.update(self.supply.value.tobytes())
+        h.update(self.casualties.tobytes())
+        h.update(self.fronts.hostile.tobytes())
+        for array in self.production.columns().values():
+            h.update(np.ascontiguousarray(array).tobytes())
+        for array in self.research.columns().values():
+            h.update(np.ascontiguousarray(array).tobytes())
+        for array in self.navy.columns().values():
+            h.update(np.ascontiguousarray(array).tobytes())
+        for array in self.air.columns().values():
+            h.update(np.ascontiguousarray(array).tobytes())
+        for array in self.buildings.columns().values():
+            h.update(np.ascontiguousarray(array).tobytes())
+        for array in self.divisions.columns().values():
+            h.update(np.ascontiguousarray(array).tobytes())
+        for array in self.modifiers.columns().values():
+            h.update(array.tobytes())
+        return h.hexdigest()
+
+    @classmethod
+    def generate(
+        cls,
+        width: int = 150,
+        height: int = 100,
+        n_countries: int = 60,
+        seed: int = 0,
+        supply_debug: bool = False,
+    ) -> World:
+        generated = generate_map(width, height, n_countries, seed)
+        return cls(generated.provinces, generated.capitals, seed=seed, supply_debug=supply_debug)
+
+
+def census(world: World) -> None:
+    """Record how many provinces each country controls."""
+    counts = world.provinces.province_counts(world.n_countries, controlled=True)
+    world.territory.append((world.clock.hour, counts))